@@ -109,7 +109,8 @@ class CompanyController extends Controller
     public function edit(Company $company)
     {
         return Inertia::render('Companies/Edit', [
-            'company' => $company
+            'company' => $company,
+            'imap' => $company->imapSettings(),
         ]);
     }
 
@@ -131,9 +132,17 @@ class CompanyController extends Controller
             'max_users' => 'required|integer|min:1|max:1000',
             'max_cases' => 'required|integer|min:1|max:10000',
             'is_active' => 'boolean',
+            'imap_host' => 'nullable|string|max:255',
+            'imap_port' => 'nullable|integer|min:1|max:65535',
+            'imap_username' => 'nullable|string|max:255|required_with:imap_host',
+            'imap_password' => 'nullable|string|max:255',
+            'imap_mailbox' => 'nullable|string|max:255',
+            'imap_ssl' => 'boolean',
         ]);
 
-        $company->update($request->all());
+        $company->fill($request->all());
+        $company->settings = $this->imapSettings($request, $company->settings ?? []);
+        $company->save();
 
         return redirect()->route('companies.index')
             ->with('success', 'Empresa atualizada com sucesso!');
@@ -156,6 +165,32 @@ class CompanyController extends Controller
             ->with('success', 'Empresa excluída com sucesso!');
     }
 
+    /**
+     * Merge the INSS mailbox into settings['imap'] (read by process_inss_emails.py --empresas)
+     */
+    private function imapSettings(Request $request, array $settings): array
+    {
+        if (!$request->filled('imap_host')) {
+            unset($settings['imap']);
+            return $settings;
+        }
+
+        $ssl = $request->boolean('imap_ssl', true);
+        $settings['imap'] = [
+            'host' => $request->imap_host,
+            'port' => (int) ($request->imap_port ?: ($ssl ? 993 : 143)),
+            'username' => $request->imap_username,
+            // Senha em branco mantém a atual (o formulário não a recebe de volta)
+            'password' => $request->filled('imap_password')
+                ? $request->imap_password
+                : ($settings['imap']['password'] ?? null),
+            'mailbox' => $request->imap_mailbox ?: 'INBOX',
+            'ssl' => $ssl,
+        ];
+
+        return $settings;
+    }
+
     /**
      * Toggle company status (activate/deactivate)
      */
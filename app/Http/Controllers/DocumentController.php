@@ -5,6 +5,7 @@ namespace App\Http\Controllers;
 use App\Models\Document;
 use App\Models\LegalCase;
 use App\Services\DocumentProcessingService;
+use App\Services\PythonCNISExtractorService;
 use Illuminate\Http\Request;
 use Inertia\Inertia;
 use Illuminate\Support\Facades\Storage;
@@ -147,9 +148,12 @@ class DocumentController extends Controller
 
     public function destroy(Document $document)
     {
-        // Remove o arquivo físico
+        // Remove o arquivo físico e o texto extraído pelo extrator CNIS
         if (Storage::disk('public')->exists($document->file_path)) {
-            Storage::disk('public')->delete($document->file_path);
+            Storage::disk('public')->delete([
+                $document->file_path,
+                $document->file_path . PythonCNISExtractorService::TEXT_ARTIFACT_SUFFIX,
+            ]);
         }
 
         $document->delete();
@@ -275,9 +279,12 @@ class DocumentController extends Controller
             return response()->json(['error' => 'Sem permissão para deletar este documento'], 403);
         }
 
-        // Remove o arquivo físico
+        // Remove o arquivo físico e o texto extraído pelo extrator CNIS
         if (Storage::disk('public')->exists($document->file_path)) {
-            Storage::disk('public')->delete($document->file_path);
+            Storage::disk('public')->delete([
+                $document->file_path,
+                $document->file_path . PythonCNISExtractorService::TEXT_ARTIFACT_SUFFIX,
+            ]);
         }
 
         $document->delete();
@@ -21,8 +21,14 @@ class Company extends Model
         'is_active',
     ];
 
+    // settings guarda credenciais (ex.: a caixa IMAP do INSS) e não vai para o front
+    protected $hidden = [
+        'settings',
+    ];
+
     protected $casts = [
         'is_active' => 'boolean',
+        'settings' => 'array',
     ];
 
     public function users(): HasMany
@@ -34,4 +40,19 @@ class Company extends Model
     {
         return $this->hasMany(Processo::class);
     }
+
+    // Caixa IMAP lida por scripts/process_inss_emails.py --empresas, sem a senha
+    public function imapSettings(): array
+    {
+        $imap = $this->settings['imap'] ?? [];
+
+        return [
+            'imap_host' => $imap['host'] ?? '',
+            'imap_port' => $imap['port'] ?? 993,
+            'imap_username' => $imap['username'] ?? '',
+            'imap_mailbox' => $imap['mailbox'] ?? 'INBOX',
+            'imap_ssl' => $imap['ssl'] ?? true,
+            'imap_has_password' => !empty($imap['password']),
+        ];
+    }
 }
\ No newline at end of file
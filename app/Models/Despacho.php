@@ -13,10 +13,17 @@ class Despacho extends Model
         'protocolo',
         'conteudo',
         'data_email',
+        'servico',
+        'data_protocolo',
+        'status_atual',
+        'classificacao',
+        'prazo',
     ];
 
     protected $casts = [
         'data_email' => 'datetime',
+        'data_protocolo' => 'date',
+        'prazo' => 'date',
     ];
 
     public function company()
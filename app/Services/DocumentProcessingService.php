@@ -31,19 +31,47 @@ class DocumentProcessingService
                 throw new \Exception('Arquivo não encontrado: ' . $filePath);
             }
 
-            $content = $this->extractTextFromFile($filePath, $document->mime_type);
+            $type = $document->type;
+            $suggestedType = null;
+
+            // O CNIS é verificado pelo próprio extrator (processCNIS). Para os demais tipos
+            // o pre-flight só sugere um tipo: roda para documentos genéricos ou quando o
+            // servidor de extração está disponível, sem abrir um processo Python por upload
+            if ($type !== 'cnis' && str_contains($document->mime_type, 'pdf')
+                && ($type === 'other' || $this->pythonCNISExtractorService->usesDaemon())) {
+                $preflight = $this->pythonCNISExtractorService->preflight($filePath);
+                $detectedType = $preflight['document_type'] ?? 'other';
+
+                if ($detectedType !== 'other' && $detectedType !== $type) {
+                    Log::info('Tipo sugerido pelo pre-flight', [
+                        'document_id' => $document->id,
+                        'type' => $type,
+                        'detected_type' => $detectedType,
+                    ]);
+                    $suggestedType = $detectedType;
+                }
+            }
 
-            switch ($document->type) {
+            switch ($type) {
                 case 'cnis':
-                    return $this->processCNIS($content, $document);
+                    // O texto só é extraído em PHP se o extrator Python precisar de fallback
+                    $result = $this->processCNIS($filePath, $document);
+                    break;
                 
                 case 'medical_report':
-                    return $this->processMedicalReport($content, $document);
+                    $result = $this->processMedicalReport($this->extractTextFromFile($filePath, $document->mime_type), $document);
+                    break;
                 
                 default:
-                    return $this->processGenericDocument($content, $document);
+                    $result = $this->processGenericDocument($this->extractTextFromFile($filePath, $document->mime_type), $document);
+            }
+
+            if ($suggestedType) {
+                $result['suggested_type'] = $suggestedType;
             }
 
+            return $result;
+
         } catch (\Exception $e) {
             Log::error('Erro no processamento do documento', [
                 'document_id' => $document->id,
@@ -58,6 +86,17 @@ class DocumentProcessingService
         }
     }
 
+    private function preflightError(string $status): string
+    {
+        return match ($status) {
+            'not_pdf' => 'O arquivo não é um PDF válido',
+            'corrupt' => 'O PDF está corrompido ou incompleto',
+            'encrypted' => 'O PDF está protegido por senha',
+            'no_text' => 'O PDF não contém texto (documento digitalizado como imagem)',
+            default => 'O PDF não pôde ser lido',
+        };
+    }
+
     private function extractTextFromFile(string $filePath, string $mimeType): string
     {
         Log::info('Extraindo texto do arquivo', ['file' => $filePath, 'mime' => $mimeType]);
@@ -79,6 +118,12 @@ class DocumentProcessingService
 
     private function extractTextFromPDF(string $filePath): string
     {
+        // Reaproveita o texto já extraído pelo extrator Python
+        $text = $this->pythonCNISExtractorService->readTextArtifact($filePath);
+        if ($text !== null) {
+            return $text;
+        }
+
         try {
             $pdf = $this->pdfParser->parseFile($filePath);
             $text = $pdf->getText();
@@ -96,15 +141,20 @@ class DocumentProcessingService
         }
     }
 
-    private function processCNIS(string $content, Document $document): array
+    private function processCNIS(string $filePath, Document $document): array
     {
-        Log::info('Processando CNIS', ['content_preview' => substr($content, 0, 500)]);
-
-        $filePath = Storage::disk('public')->path($document->file_path);
+        Log::info('Processando CNIS', ['file' => $filePath]);
         
         // Tenta primeiro com Python
         $pythonResult = $this->pythonCNISExtractorService->processCNIS($filePath);
         
+        // Texto para os métodos tradicionais, extraído só quando necessário
+        // (lido do artefato gravado pelo Python quando disponível)
+        $content = null;
+        $loadContent = function () use (&$content, $filePath, $document): string {
+            return $content ??= $this->extractTextFromFile($filePath, $document->mime_type);
+        };
+        
         if ($pythonResult['success']) {
             Log::info('Python CNIS Extractor processou com sucesso', ['data' => $pythonResult['data']]);
             
@@ -113,18 +163,44 @@ class DocumentProcessingService
             // Validação e fallback para vínculos empregatícios
             if (empty($extractedData['vinculos_empregaticios'])) {
                 Log::info('Python não extraiu vínculos, usando método tradicional');
-                $extractedData['vinculos_empregaticios'] = $this->extractEmploymentDataImproved($content);
+                $extractedData['vinculos_empregaticios'] = $this->extractEmploymentDataImproved($loadContent());
+                // O tempo calculado pelo Python não cobre os vínculos do método tradicional
+                unset($extractedData['tempo_contribuicao']);
             }
             
             // Validação e fallback para dados pessoais
             if (empty($extractedData['client_name']) && empty($extractedData['dados_pessoais'])) {
                 Log::info('Python não extraiu dados pessoais, usando método tradicional');
-                $extractedData['dados_pessoais'] = $this->extractPersonalDataImproved($content);
+                $extractedData['dados_pessoais'] = $this->extractPersonalDataImproved($loadContent());
             }
+        } elseif (!empty($pythonResult['preflight'])) {
+            $preflight = $pythonResult['preflight'];
+
+            // Recusado no pre-flight: laudo médico enviado como CNIS segue como laudo
+            if (!empty($preflight['valid'])) {
+                Log::info('Documento enviado como CNIS detectado como laudo no pre-flight', [
+                    'document_id' => $document->id,
+                    'detected_type' => $preflight['document_type'] ?? null,
+                ]);
+
+                return $this->processMedicalReport($loadContent(), $document);
+            }
+
+            Log::warning('Documento rejeitado no pre-flight', [
+                'document_id' => $document->id,
+                'status' => $preflight['status'],
+            ]);
+
+            return [
+                'success' => false,
+                'error' => $this->preflightError($preflight['status']),
+                'preflight' => $preflight,
+            ];
         } else {
             Log::warning('Python CNIS Extractor falhou, usando método tradicional', ['error' => $pythonResult['error']]);
             
             // Fallback direto para método tradicional (sem Google Cloud)
+            $content = $loadContent();
             $extractedData = [
                 'dados_pessoais' => $this->extractPersonalDataImproved($content),
                 'vinculos_empregaticios' => $this->extractEmploymentDataImproved($content),
@@ -149,7 +225,11 @@ class DocumentProcessingService
             'data' => [
                 'client_name' => $extractedData['client_name'] ?? $extractedData['dados_pessoais']['nome'] ?? '',
                 'client_cpf' => $extractedData['client_cpf'] ?? $extractedData['dados_pessoais']['cpf'] ?? '',
-                'benefit_type' => $this->suggestBenefitType(['vinculos_empregaticios' => $extractedData['vinculos_empregaticios']]),
+                'benefit_type' => $this->suggestBenefitType([
+                    'vinculos_empregaticios' => $extractedData['vinculos_empregaticios'],
+                    'tempo_contribuicao' => $extractedData['tempo_contribuicao'] ?? null,
+                ]),
+                'tempo_contribuicao' => $extractedData['tempo_contribuicao'] ?? null,
                 'vinculos_empregaticios' => $extractedData['vinculos_empregaticios'],
             ],
             'employment_relationships_created' => !empty($extractedData['vinculos_empregaticios']),
@@ -453,6 +533,12 @@ class DocumentProcessingService
         $hasSpecialActivity = false;
         $totalYears = 0;
         
+        // Tempo já unificado pelo extrator Python (sem contar períodos concomitantes em dobro)
+        $precomputedDays = $data['tempo_contribuicao']['total_dias'] ?? null;
+        if ($precomputedDays !== null) {
+            $totalYears = $precomputedDays / 365;
+        }
+        
         foreach ($employments as $employment) {
             $tipoVinculo = $employment['tipo_vinculo'] ?? '';
             
@@ -462,7 +548,7 @@ class DocumentProcessingService
             }
             
             // Calcula anos de contribuição (simplificado)
-            if (!empty($employment['data_inicio'])) {
+            if ($precomputedDays === null && !empty($employment['data_inicio'])) {
                 $inicio = strtotime($employment['data_inicio']);
                 $fim = !empty($employment['data_fim']) ? strtotime($employment['data_fim']) : time();
                 $years = ($fim - $inicio) / (365 * 24 * 3600);
@@ -201,8 +201,12 @@ class EmailService
 
             if ($protocolo && $conteudoDespacho) {
                 try {
-                    // Verifica se já existe um despacho com este email_id
-                    $despachoExistente = \App\Models\Despacho::where('email_id', $messageId)->first();
+                    // Um despacho por protocolo em cada empresa (índice único): verifica se já existe
+                    $despachoExistente = \App\Models\Despacho::where('id_empresa', $this->company->id)
+                        ->where('protocolo', $protocolo)
+                        ->first();
+                    $dataEmail = Carbon::createFromTimestamp(strtotime($header->date));
+                    $conteudoHash = hash('sha256', $conteudoDespacho);
                     
                     if (!$despachoExistente) {
                         Log::info('Tentando salvar despacho', [
@@ -220,7 +224,8 @@ class EmailService
                         $despacho->protocolo = $protocolo;
                         $despacho->servico = $servico;
                         $despacho->conteudo = $conteudoDespacho;
-                        $despacho->data_email = Carbon::createFromTimestamp(strtotime($header->date));
+                        $despacho->conteudo_hash = $conteudoHash;
+                        $despacho->data_email = $dataEmail;
                         $despacho->save();
 
                         Log::info('Despacho salvo com sucesso', [
@@ -228,6 +233,21 @@ class EmailService
                             'protocolo' => $protocolo,
                             'message_id' => $messageId
                         ]);
+                    } elseif ($despachoExistente->conteudo_hash !== $conteudoHash
+                        && $dataEmail->greaterThanOrEqualTo($despachoExistente->data_email)) {
+                        // Novo despacho para o mesmo protocolo
+                        $despachoExistente->email_id = $messageId;
+                        $despachoExistente->servico = $servico;
+                        $despachoExistente->conteudo = $conteudoDespacho;
+                        $despachoExistente->conteudo_hash = $conteudoHash;
+                        $despachoExistente->data_email = $dataEmail;
+                        $despachoExistente->save();
+
+                        Log::info('Despacho atualizado', [
+                            'despacho_id' => $despachoExistente->id,
+                            'protocolo' => $protocolo,
+                            'message_id' => $messageId
+                        ]);
                     } else {
                         Log::info('Despacho já existe no banco', [
                             'email_id' => $messageId,
@@ -7,13 +7,32 @@ use Illuminate\Support\Facades\Config;
 
 class PythonCNISExtractorService
 {
+    // Sufixo do artefato de texto gravado pelo extrator ao lado do PDF
+    public const TEXT_ARTIFACT_SUFFIX = '.cnistext.gz';
+
     private string $pythonScriptPath;
     private string $pythonExecutable;
+    private ?string $daemonSocket;
+    private int $daemonTimeout;
+    private ?string $cachePath;
+    private bool $collectMetrics;
+    private ?float $timeBudget;
+    private ?int $pageBudget;
+    private bool $textArtifact;
+    private ?string $pdfEngine;
 
     public function __construct()
     {
         $this->pythonScriptPath = base_path('simple_cnis_extractor.py');
         $this->pythonExecutable = Config::get('python.executable', 'python');
+        $this->daemonSocket = Config::get('python.cnis_daemon.socket');
+        $this->daemonTimeout = (int) Config::get('python.cnis_daemon.timeout', 120);
+        $this->cachePath = Config::get('python.cnis_cache');
+        $this->collectMetrics = (bool) Config::get('python.cnis_metrics', false);
+        $this->timeBudget = Config::get('python.cnis_budget.time') ? (float) Config::get('python.cnis_budget.time') : null;
+        $this->pageBudget = Config::get('python.cnis_budget.pages') ? (int) Config::get('python.cnis_budget.pages') : null;
+        $this->textArtifact = (bool) Config::get('python.cnis_text_artifact', true);
+        $this->pdfEngine = Config::get('python.cnis_pdf_engine') ?: null;
     }
 
     public function processCNIS(string $filePath): array
@@ -31,8 +50,8 @@ class PythonCNISExtractorService
                 throw new \Exception('Script Python não encontrado: ' . $this->pythonScriptPath);
             }
 
-            // Executa o script Python
-            $result = $this->executePythonScript($filePath);
+            // Executa o script Python; o pre-flight roda no mesmo processo, antes da extração
+            $result = $this->executePythonScript($filePath, 'extract_preflight');
 
             if (!$result['success']) {
                 Log::error('Erro na execução do script Python', ['error' => $result['error']]);
@@ -42,22 +61,39 @@ class PythonCNISExtractorService
                 ];
             }
 
-            // Decodifica o resultado JSON
-            // Limpa a saída para pegar apenas o JSON
-            if (preg_match('/({.*})/s', $result['output'], $matches)) {
-                $json = $matches[1];
-            } else {
-                $json = $result['output'];
-            }
-            $extractedData = json_decode($json, true);
+            // Decodifica o resultado JSON (o stdout do script contém apenas o JSON)
+            $extractedData = json_decode($result['output'], true);
 
             if (json_last_error() !== JSON_ERROR_NONE) {
                 throw new \Exception('Erro ao decodificar JSON: ' . json_last_error_msg() . ' | Saída: ' . $result['output']);
             }
 
+            if (empty($extractedData['success'])) {
+                Log::error('Python CNIS Extractor não conseguiu processar o documento', [
+                    'error' => $extractedData['error'] ?? null,
+                    'preflight' => $extractedData['preflight'] ?? null,
+                    'metrics' => $extractedData['metrics'] ?? null,
+                ]);
+                return [
+                    'success' => false,
+                    'error' => 'Erro no Python CNIS Extractor: ' . ($extractedData['error'] ?? 'resultado sem dados'),
+                    // Presente quando o PDF foi recusado no pre-flight (status e document_type)
+                    'preflight' => $extractedData['preflight'] ?? null,
+                ];
+            }
+
+            if (!empty($extractedData['partial'])) {
+                Log::warning('Python CNIS Extractor interrompido pelo orçamento, resultado parcial', [
+                    'file' => $filePath,
+                    'reason' => $extractedData['partial_reason'] ?? null,
+                    'pages_processed' => $extractedData['pages_processed'] ?? null,
+                ]);
+            }
+
             Log::info('Processamento Python concluído com sucesso', [
                 'vinculos_count' => count($extractedData['data']['vinculos_empregaticios'] ?? []),
                 'text_length' => $extractedData['text_length'] ?? 0,
+                'metrics' => $extractedData['metrics'] ?? null,
             ]);
 
             return [
@@ -66,6 +102,9 @@ class PythonCNISExtractorService
                 'metadata' => [
                     'text_length' => $extractedData['text_length'] ?? 0,
                     'method' => 'python_extractor',
+                    'metrics' => $extractedData['metrics'] ?? null,
+                    'partial' => !empty($extractedData['partial']),
+                    'partial_reason' => $extractedData['partial_reason'] ?? null,
                 ],
             ];
 
@@ -82,33 +121,190 @@ class PythonCNISExtractorService
         }
     }
 
-    private function executePythonScript(string $filePath): array
+    // Texto gravado pelo extrator ao lado do PDF; null se não existir ou for de outra versão do arquivo
+    public function readTextArtifact(string $filePath): ?string
+    {
+        $artifactPath = $filePath . self::TEXT_ARTIFACT_SUFFIX;
+
+        if (!$this->textArtifact || !is_file($artifactPath)) {
+            return null;
+        }
+
+        $compressed = file_get_contents($artifactPath);
+        $json = $compressed !== false ? gzdecode($compressed) : false;
+        $artifact = $json !== false ? json_decode($json, true) : null;
+
+        if (!is_array($artifact) || !isset($artifact['text'])) {
+            Log::warning('Artefato de texto do CNIS ilegível', ['file' => $artifactPath]);
+            return null;
+        }
+
+        if (($artifact['sha256'] ?? null) !== hash_file('sha256', $filePath)) {
+            Log::info('Artefato de texto do CNIS desatualizado', ['file' => $artifactPath]);
+            return null;
+        }
+
+        Log::info('Texto lido do artefato do extrator', [
+            'file' => $artifactPath,
+            'pages' => $artifact['pages'] ?? null,
+            'length' => strlen($artifact['text']),
+        ]);
+
+        return $artifact['text'];
+    }
+
+    // Indica se o servidor de extração está configurado e disponível (sem novo processo Python)
+    public function usesDaemon(): bool
+    {
+        return $this->daemonSocket && file_exists($this->daemonSocket);
+    }
+
+    // Verificação prévia do PDF: estrutura, criptografia, presença de texto e
+    // tipo do documento pela primeira página. Retorna null se não puder rodar.
+    public function preflight(string $filePath): ?array
     {
+        try {
+            $result = $this->executePythonScript($filePath, 'preflight');
+
+            if (!$result['success']) {
+                throw new \Exception($result['error']);
+            }
+
+            $preflight = json_decode($result['output'], true);
+
+            if (!is_array($preflight) || empty($preflight['success'])) {
+                throw new \Exception($preflight['error'] ?? 'Resposta inválida: ' . $result['output']);
+            }
+
+            Log::info('Pre-flight do PDF concluído', [
+                'file' => $filePath,
+                'status' => $preflight['status'],
+                'document_type' => $preflight['document_type'] ?? null,
+                'elapsed' => $preflight['elapsed'] ?? null,
+            ]);
+
+            return $preflight;
+        } catch (\Exception $e) {
+            Log::warning('Pre-flight do PDF indisponível', [
+                'file' => $filePath,
+                'error' => $e->getMessage(),
+            ]);
+
+            return null;
+        }
+    }
+
+    private function executePythonScript(string $filePath, string $action = 'extract'): array
+    {
+        // Usa o servidor de extração persistente quando configurado
+        if ($this->usesDaemon()) {
+            $daemonResult = $this->executeViaDaemon($filePath, $action);
+            if ($daemonResult['success']) {
+                return $daemonResult;
+            }
+
+            Log::warning('Servidor CNIS indisponível, executando script diretamente', [
+                'socket' => $this->daemonSocket,
+                'error' => $daemonResult['error'],
+            ]);
+        }
+
         // Escapa o caminho do arquivo para segurança
         $escapedFilePath = escapeshellarg($filePath);
         $escapedScriptPath = escapeshellarg($this->pythonScriptPath);
 
         // Comando para executar o script Python
-        $command = "{$this->pythonExecutable} {$escapedScriptPath} {$escapedFilePath} 2>&1";
+        $command = "{$this->pythonExecutable} {$escapedScriptPath} {$escapedFilePath}";
+
+        if ($action === 'preflight') {
+            $command .= ' --preflight';
+        } else {
+            if ($action === 'extract_preflight') {
+                $command .= ' --with-preflight';
+            }
+
+            if ($this->textArtifact) {
+                $command .= ' --text-artifact';
+            }
+        }
+
+        if ($this->pdfEngine) {
+            $command .= ' --engine ' . escapeshellarg($this->pdfEngine);
+        }
+
+        if ($this->cachePath) {
+            $command .= ' --cache ' . escapeshellarg($this->cachePath);
+        }
+
+        if ($this->collectMetrics) {
+            $command .= ' --metrics';
+        }
+
+        if ($this->timeBudget) {
+            $command .= ' --time-budget ' . escapeshellarg((string) $this->timeBudget);
+        }
+
+        if ($this->pageBudget) {
+            $command .= ' --page-budget ' . escapeshellarg((string) $this->pageBudget);
+        }
 
         Log::info('Executando comando Python', ['command' => $command]);
 
-        // Executa o comando
-        $output = [];
-        $returnCode = 0;
-        exec($command, $output, $returnCode);
+        // Executa o comando com stdout (JSON) e stderr (logs) separados
+        $process = proc_open($command, [
+            1 => ['pipe', 'w'],
+            2 => ['pipe', 'w'],
+        ], $pipes);
+
+        if (!is_resource($process)) {
+            return [
+                'success' => false,
+                'error' => 'Não foi possível iniciar o processo Python',
+            ];
+        }
+
+        // Lê os dois fluxos alternadamente para nenhum deles encher o buffer do pipe
+        stream_set_blocking($pipes[1], false);
+        stream_set_blocking($pipes[2], false);
+        $outputString = '';
+        $logString = '';
+
+        while (!feof($pipes[1]) || !feof($pipes[2])) {
+            $read = array_filter([$pipes[1], $pipes[2]], fn ($pipe) => !feof($pipe));
+            $write = null;
+            $except = null;
+
+            if (stream_select($read, $write, $except, 1) === false) {
+                break;
+            }
+
+            foreach ($read as $pipe) {
+                $chunk = fread($pipe, 8192);
+                if ($pipe === $pipes[1]) {
+                    $outputString .= $chunk;
+                } else {
+                    $logString .= $chunk;
+                }
+            }
+        }
 
-        $outputString = implode("\n", $output);
+        fclose($pipes[1]);
+        fclose($pipes[2]);
+        $returnCode = proc_close($process);
 
         Log::info('Resultado da execução Python', [
             'return_code' => $returnCode,
             'output_length' => strlen($outputString),
         ]);
 
+        if ($logString !== '') {
+            Log::debug('Log do Python CNIS Extractor', ['stderr' => $logString]);
+        }
+
         if ($returnCode !== 0) {
             return [
                 'success' => false,
-                'error' => "Erro na execução (código {$returnCode}): {$outputString}",
+                'error' => "Erro na execução (código {$returnCode}): " . ($logString ?: $outputString),
             ];
         }
 
@@ -118,6 +314,62 @@ class PythonCNISExtractorService
         ];
     }
 
+    private function executeViaDaemon(string $filePath, string $action = 'extract'): array
+    {
+        $socket = @stream_socket_client('unix://' . $this->daemonSocket, $errno, $errstr, 5);
+
+        if ($socket === false) {
+            return [
+                'success' => false,
+                'error' => "Falha ao conectar ao socket ({$errno}): {$errstr}",
+            ];
+        }
+
+        try {
+            stream_set_timeout($socket, $this->daemonTimeout);
+
+            $request = json_encode([
+                'id' => uniqid('cnis_', true),
+                'action' => $action,
+                'pdf_path' => realpath($filePath) ?: $filePath,
+            ], JSON_UNESCAPED_UNICODE | JSON_UNESCAPED_SLASHES);
+
+            fwrite($socket, $request . "\n");
+
+            // O servidor responde com exatamente uma linha JSON por requisição
+            $line = fgets($socket);
+
+            if ($line === false) {
+                $meta = stream_get_meta_data($socket);
+                return [
+                    'success' => false,
+                    'error' => $meta['timed_out'] ? 'Tempo esgotado aguardando o servidor' : 'Conexão encerrada pelo servidor',
+                ];
+            }
+
+            $response = json_decode($line, true);
+
+            if (!is_array($response) || !isset($response['result'])) {
+                return [
+                    'success' => false,
+                    'error' => 'Resposta inválida do servidor: ' . $line,
+                ];
+            }
+
+            Log::info('Resultado do servidor CNIS', [
+                'socket' => $this->daemonSocket,
+                'output_length' => strlen($line),
+            ]);
+
+            return [
+                'success' => true,
+                'output' => json_encode($response['result'], JSON_UNESCAPED_UNICODE),
+            ];
+        } finally {
+            fclose($socket);
+        }
+    }
+
     public function checkPythonEnvironment(): array
     {
         $checks = [
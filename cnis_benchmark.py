@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos extratores do CNIS
+Gera extratos sintéticos (texto e PDF) com páginas, vínculos, variantes de CNPJ e
+remunerações configuráveis, mede cada etapa dos três extratores e compara a vazão
+e o pico de memória com a linha de base gravada
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import inspect
+import argparse
+import platform
+import importlib
+import tracemalloc
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Linha de base da máquina (como o perfil de motores de PDF, não vai para o repositório)
+BASELINE_PATH = os.getenv(
+    'CNIS_BENCHMARK_BASELINE',
+    str(Path(__file__).resolve().parent / 'storage' / 'app' / 'cnis_benchmark_baseline.json')
+)
+FIXTURES_DIR = str(Path(__file__).resolve().parent / 'storage' / 'app' / 'cnis_benchmark')
+
+# Piora relativa (tempo ou memória) a partir da qual uma medida é regressão
+DEFAULT_TOLERANCE = 0.25
+# Diferença de tempo abaixo da qual a piora é tratada como ruído de medida
+MIN_DELTA_SECONDS = 0.005
+
+# Variantes do cabeçalho de vínculo (mesmos nomes de simple_cnis_extractor)
+VARIANTES = ('cnpj', 'cnpj_raiz', 'indeterminado', 'agrupamento')
+
+# Cenários padrão: (vínculos, remunerações por vínculo, páginas; 0 = automático)
+CENARIOS = {
+    'pequeno': (10, 12, 0),
+    'medio': (40, 36, 0),
+    'grande': (150, 120, 0),
+}
+
+# Extratores medidos: módulo -> classe
+EXTRATORES = {
+    'simple_cnis_extractor': 'CNISExtractorSimple',
+    'python_cnis_extractor_simple': 'CNISExtractorSimple',
+    'python_cnis_extractor': 'CNISExtractor',
+}
+
+# Linhas de texto por página do extrato sintético (sem o cabeçalho)
+LINHAS_POR_PAGINA = 40
+
+# Fuzz de pior caso: tamanho dos textos patológicos (caracteres), tempo máximo por
+# texto e razão máxima de tempo ao quadruplicar o texto (linear ~4, quadrático ~16)
+FUZZ_TAMANHO = 20000
+FUZZ_LIMITE_SEGUNDOS = 0.5
+FUZZ_RAZAO_MAXIMA = 8.0
+
+_EMPRESAS = ('COMERCIO', 'INDUSTRIA', 'SERVICOS', 'TRANSPORTES', 'CONSTRUTORA', 'REFRIGERACAO',
+             'TECNOLOGIA', 'ALIMENTOS', 'METALURGICA', 'DISTRIBUIDORA')
+_SOBRENOMES = ('SILVA', 'SANTOS', 'OLIVEIRA', 'SOUZA', 'PEREIRA', 'LIMA', 'CARVALHO', 'RIBEIRO')
+_CABECALHO_VINCULO = (
+    'Código Emp. Origem do VínculoTipo Filiado no',
+    'Vínculo Data Início Data Fim Últ. Remun. Seq. NITMatrícula do',
+    'Trabalhador',
+)
+_RODAPE = 'Relações Previdenciárias'
+_NIT = '126.05717.50-1'
+
+def _valor(valor: float) -> str:
+    """Formata um valor no padrão 1.234,56"""
+    return f"{valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+def _cnpj(rng: random.Random, completo: bool = True) -> str:
+    raiz = f"{rng.randint(0, 99):02d}.{rng.randint(0, 999):03d}.{rng.randint(0, 999):03d}"
+    if not completo:
+        return raiz
+    return f"{raiz}/{rng.randint(1, 9):04d}-{rng.randint(0, 99):02d}"
+
+def _competencias(inicio: date, quantidade: int) -> List[str]:
+    mes = inicio.year * 12 + inicio.month - 1
+    return [f"{(m % 12) + 1:02d}/{m // 12}" for m in range(mes, mes + quantidade)]
+
+def _vinculo(seq: int, variante: str, inicio: date, remuneracoes: int, rng: random.Random) -> Tuple[List[List[str]], Dict[str, str]]:
+    """Blocos de linhas de um vínculo e o resultado esperado da extração
+
+    O primeiro bloco (cabeçalho, datas e títulos da tabela) não é dividido entre
+    páginas; cada linha de remunerações é um bloco.
+    """
+    competencias = _competencias(inicio, remuneracoes)
+    fim_mes, fim_ano = (int(parte) for parte in competencias[-1].split('/'))
+    ultimo_dia = (date(fim_ano + fim_mes // 12, fim_mes % 12 + 1, 1).toordinal() - 1)
+    inicio_txt = inicio.strftime('%d/%m/%Y')
+    fim_txt = date.fromordinal(ultimo_dia).strftime('%d/%m/%Y')
+    nome = f"{rng.choice(_EMPRESAS)} {rng.choice(_SOBRENOMES)} {rng.choice(('LTDA', 'S/A', 'EIRELI', 'ME'))}"
+    salario = rng.uniform(1000, 9000)
+
+    linhas = list(_CABECALHO_VINCULO)
+    if variante == 'agrupamento':
+        cnpj = _cnpj(rng)
+        linhas.append(f"{seq} AGRUPAMENTO DE CONTRATANTES/COOPERATIVAS Contribuinte Individual "
+                      f"{inicio_txt} {fim_txt} {_NIT}")
+        linhas.append('Competência Contrat. Estabelecimento Tomador Forma Prestação Serviço Remuneração '
+                      'IndicadoresRemunerações')
+        blocos = [linhas] + [[f"{competencia} {cnpj} {cnpj} Normal {_valor(salario)}"]
+                             for competencia in competencias]
+        esperado = {'empregador': 'AGRUPAMENTO DE CONTRATANTES', 'cnpj': cnpj}
+    else:
+        if variante == 'indeterminado':
+            cnpj = 'Indeterminado'
+            linhas.append(f"{seq} Indeterminado {nome} Contribuinte Individual")
+            linhas.append(f"{inicio_txt} {fim_txt} {_NIT}")
+        else:
+            cnpj = _cnpj(rng, completo=variante == 'cnpj')
+            linhas.append(f"{seq} {cnpj} {nome}Empregado ou Agente")
+            linhas.append(f"Público{inicio_txt} {fim_txt} {competencias[-1]} {_NIT}")
+        linhas.append('Competência Remuneração Indicadores Competência Remuneração Indicadores '
+                      'Competência Remuneração IndicadoresRemunerações')
+        # Três competências por linha, como na tabela do empregado
+        blocos = [linhas] + [[' '.join(f"{competencia} {_valor(salario + indice)}"
+                                       for competencia in competencias[indice:indice + 3])]
+                             for indice in range(0, len(competencias), 3)]
+        esperado = {'empregador': nome, 'cnpj': cnpj}
+
+    esperado.update({'data_inicio': inicio_txt, 'data_fim': fim_txt})
+    return blocos, esperado
+
+def generate_cnis(vinculos: int = 20, remuneracoes: int = 24, paginas: int = 0,
+                  variantes: Tuple[str, ...] = VARIANTES, seed: int = 0) -> Dict[str, Any]:
+    """Gera um extrato CNIS sintético no layout do texto extraído do PDF real
+
+    Os vínculos alternam entre as variantes pedidas e se espalham por `paginas`
+    páginas (0: LINHAS_POR_PAGINA linhas por página). Retorna {'paginas': [texto],
+    'vinculos': [resultado esperado], 'parametros': {...}}.
+    """
+    rng = random.Random(seed)
+    corpo: List[List[str]] = []
+    esperados = []
+    inicio = date(1980, 1, 1)
+    for seq in range(1, vinculos + 1):
+        blocos, esperado = _vinculo(seq, variantes[(seq - 1) % len(variantes)], inicio, remuneracoes, rng)
+        corpo.extend(blocos)
+        esperados.append(esperado)
+        # Próximo vínculo começa no mês seguinte ao fim deste; quando passaria da
+        # emissão do extrato recomeça em 1980 (vínculos concomitantes)
+        fim = datetime.strptime(esperado['data_fim'], '%d/%m/%Y').date()
+        inicio = date(fim.year + fim.month // 12, fim.month % 12 + 1, 1)
+        if inicio.year * 12 + inicio.month + remuneracoes > 2025 * 12 + 5:
+            inicio = date(1980, rng.randint(1, 12), 1)
+
+    # Distribui os blocos pelas páginas sem separar o cabeçalho das datas do vínculo
+    total_linhas = sum(len(bloco) for bloco in corpo)
+    por_pagina = -(-total_linhas // paginas) if paginas else LINHAS_POR_PAGINA
+    paginas_corpo: List[List[str]] = [[]]
+    for bloco in corpo:
+        if paginas_corpo[-1] and len(paginas_corpo[-1]) + len(bloco) > por_pagina:
+            paginas_corpo.append([])
+        paginas_corpo[-1].extend(bloco)
+    total = len(paginas_corpo)
+    textos = []
+    for numero, bloco in enumerate(paginas_corpo, 1):
+        cabecalho = [
+            'INSS',
+            'CNIS - Cadastro Nacional de Informações Sociais',
+            'Extrato Previdenciário',
+            '11/06/2025 10:32:51',
+            f"NIT: {_NIT} CPF: 005.369.489-92 Nome: JOSE CARLOS DOS SANTOS",
+            f"Data de nascimento: 15/02/1970 Nome da mãe: MARIA DAS DORES SILVAPágina {numero} de {total}",
+            'Identificação do Filiado',
+        ]
+        textos.append('\n'.join(cabecalho + bloco + [_RODAPE]))
+
+    return {
+        'paginas': textos,
+        'vinculos': esperados,
+        'parametros': {'vinculos': vinculos, 'remuneracoes': remuneracoes, 'paginas': total,
+                       'variantes': list(variantes), 'seed': seed},
+    }
+
+def _pdf_string(texto: str) -> bytes:
+    dados = texto.encode('cp1252', 'replace')
+    return b'(' + dados.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+def write_pdf(paginas: List[str], caminho: str) -> None:
+    """Grava as páginas como um PDF de texto simples (Helvetica, WinAnsiEncoding)"""
+    objetos: List[bytes] = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'',  # Pages, preenchido depois de conhecer as páginas
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    ]
+    kids = []
+    for texto in paginas:
+        conteudo = [b'BT /F1 6 Tf 8 TL 20 820 Td']
+        for linha in texto.split('\n'):
+            conteudo.append(_pdf_string(linha) + b' Tj T*')
+        conteudo.append(b'ET')
+        stream = b'\n'.join(conteudo)
+        objetos.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        objetos.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objetos))
+        kids.append(b'%d 0 R' % len(objetos))
+    objetos[1] = b'<< /Type /Pages /Kids [' + b' '.join(kids) + b'] /Count %d >>' % len(kids)
+
+    saida = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    posicoes = []
+    for numero, objeto in enumerate(objetos, 1):
+        posicoes.append(len(saida))
+        saida += b'%d 0 obj\n' % numero + objeto + b'\nendobj\n'
+    xref = len(saida)
+    saida += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objetos) + 1)
+    for posicao in posicoes:
+        saida += b'%010d 00000 n \n' % posicao
+    saida += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objetos) + 1, xref)
+
+    Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, 'wb') as f:
+        f.write(saida)
+
+def write_fixtures(nome: str, cnis: Dict[str, Any], diretorio: str = FIXTURES_DIR) -> Dict[str, str]:
+    """Grava o texto, o PDF e o resultado esperado de um extrato sintético"""
+    base = Path(diretorio) / nome
+    base.parent.mkdir(parents=True, exist_ok=True)
+    arquivos = {'texto': f"{base}.txt", 'pdf': f"{base}.pdf", 'esperado': f"{base}.json"}
+    with open(arquivos['texto'], 'w', encoding='utf-8') as f:
+        f.write(''.join(pagina + '\n' for pagina in cnis['paginas']))
+    write_pdf(cnis['paginas'], arquivos['pdf'])
+    with open(arquivos['esperado'], 'w', encoding='utf-8') as f:
+        json.dump({'parametros': cnis['parametros'], 'vinculos': cnis['vinculos']}, f, ensure_ascii=False, indent=2)
+    return arquivos
+
+def _measure(func: Callable[[], Any], rodadas: int) -> Tuple[Any, float, int]:
+    """Executa func `rodadas` vezes; retorna (resultado, melhor tempo, pico de memória)"""
+    melhor = None
+    resultado = None
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        resultado = func()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+
+    # Memória medida numa execução à parte: o tracemalloc deixa o código mais lento
+    tracemalloc.start()
+    try:
+        func()
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return resultado, melhor, pico
+
+def _stage(tempo: float, pico: int, unidades: int, unidade: str) -> Dict[str, Any]:
+    return {
+        'segundos': round(tempo, 6),
+        'vazao': round(unidades / tempo, 2) if tempo > 0 else None,
+        'unidade': f"{unidade}/s",
+        'pico_memoria_bytes': pico,
+    }
+
+def _load_extractor(modulo: str):
+    classe = getattr(importlib.import_module(modulo), EXTRATORES[modulo])
+    if modulo == 'simple_cnis_extractor':
+        # Sem processos auxiliares, cache ou métricas: mede apenas o extrator
+        return classe(parallel_workers=1, metrics=False)
+    return classe()
+
+def benchmark_extractor(modulo: str, arquivos: Dict[str, str], cnis: Dict[str, Any], rodadas: int = 3) -> Dict[str, Any]:
+    """Mede extract_text_from_pdf, split_into_employment_sections,
+    extract_employment_from_section e process_cnis de um extrator"""
+    extractor = _load_extractor(modulo)
+    paginas = cnis['parametros']['paginas']
+    with open(arquivos['texto'], encoding='utf-8') as f:
+        texto = f.read()
+
+    etapas = {}
+    _, tempo, pico = _measure(lambda: extractor.extract_text_from_pdf(arquivos['pdf']), rodadas)
+    etapas['extract_text_from_pdf'] = _stage(tempo, pico, paginas, 'paginas')
+
+    secoes, tempo, pico = _measure(lambda: extractor.split_into_employment_sections(texto), rodadas)
+    etapas['split_into_employment_sections'] = _stage(tempo, pico, len(texto) / 1e6, 'MB')
+
+    # A versão atual recebe as datas a excluir (nascimento, emissão) já calculadas
+    parametros = inspect.signature(extractor.extract_employment_from_section).parameters
+    if 'exclude_dates' in parametros:
+        exclude_dates = set()
+        extractor.find_excluded_dates(texto, exclude_dates)
+        extrair = lambda secao: extractor.extract_employment_from_section(secao, exclude_dates)
+    else:
+        extrair = extractor.extract_employment_from_section
+    _, tempo, pico = _measure(lambda: [extrair(secao) for secao in secoes], rodadas)
+    etapas['extract_employment_from_section'] = _stage(tempo, pico, len(secoes), 'secoes')
+
+    resultado, tempo, pico = _measure(lambda: extractor.process_cnis(arquivos['pdf']), rodadas)
+    etapas['process_cnis'] = _stage(tempo, pico, paginas, 'paginas')
+
+    vinculos = (resultado.get('data') or {}).get('vinculos_empregaticios') or []
+    campos = ('empregador', 'cnpj', 'data_inicio', 'data_fim')
+    obtidos = [{campo: vinculo.get(campo) for campo in campos} for vinculo in vinculos]
+    return {
+        'etapas': etapas,
+        'secoes': len(secoes),
+        'vinculos': len(vinculos),
+        # confere: igual ao esperado pelo gerador; assinatura: detecta mudança de resultado
+        'confere': obtidos == cnis['vinculos'],
+        'assinatura': hashlib.sha256(
+            json.dumps(resultado.get('data'), sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+        ).hexdigest(),
+    }
+
+def run_benchmark(cenarios: Dict[str, Tuple[int, int, int]], modulos: List[str], rodadas: int = 3,
+                  diretorio: str = FIXTURES_DIR, seed: int = 0) -> Dict[str, Any]:
+    """Gera os extratos de cada cenário e mede todos os extratores"""
+    from cnis_pdf_engines import select_engine
+
+    relatorio = {
+        'ambiente': {
+            'python': platform.python_version(),
+            'maquina': platform.node(),
+            'motor_pdf': select_engine().name,
+        },
+        'rodadas': rodadas,
+        'registrado_em': datetime.now().isoformat(timespec='seconds'),
+        'cenarios': {},
+    }
+    for nome, (vinculos, remuneracoes, paginas) in cenarios.items():
+        cnis = generate_cnis(vinculos, remuneracoes, paginas, seed=seed)
+        arquivos = write_fixtures(nome, cnis, diretorio)
+        logger.info(f"Cenário {nome}: {cnis['parametros']['paginas']} páginas, {vinculos} vínculos")
+        cenario = {'parametros': cnis['parametros'], 'extratores': {}}
+        for modulo in modulos:
+            try:
+                cenario['extratores'][modulo] = benchmark_extractor(modulo, arquivos, cnis, rodadas)
+            except Exception as e:
+                logger.warning(f"{modulo} falhou no cenário {nome}: {e}")
+                cenario['extratores'][modulo] = {'erro': str(e)}
+        relatorio['cenarios'][nome] = cenario
+    return relatorio
+
+# Textos patológicos para os padrões do extrator: recebem o tamanho e geram uma página
+_CABECALHO_NOME = f"NIT: {_NIT} CPF: 005.369.489-92 Nome: "
+FUZZ_CASOS: Dict[str, Callable[[int], str]] = {
+    # Nome seguido de espaços ou letras sem "Data de nascimento"
+    'nome_espacos': lambda n: _CABECALHO_NOME + 'JOSE' + ' ' * n + '1',
+    'nome_letras': lambda n: _CABECALHO_NOME + 'JOSE DA SILVA ' * (n // 14) + '1',
+    'nome_rotulos': lambda n: _CABECALHO_NOME + 'JOSE Data de ' * (n // 13) + '1',
+    # Cabeçalho de vínculo sem a categoria (Empregado/Contribuinte) no fim
+    'categoria_espacos': lambda n: '1 12.345.678/0001-90' + ' ' * n + 'EMPRESA' * (n // 7),
+    'indeterminado_espacos': lambda n: '1 Indeterminado' + ' ' * n + 'NOME' * (n // 4),
+    # Linha de remunerações de um vínculo com indicador longo que não termina em separador
+    'indicadores': lambda n: ('1 12.345.678/0001-90 COMERCIO LTDAEmpregado ou Agente\n'
+                              'Público01/01/2019 31/12/2020\n01/2020 1.000,00 ' + 'A' * n + 'a'),
+    'datas_incompletas': lambda n: '12/' * (n // 3),
+    'digitos': lambda n: '1' * n + ' x',
+    'espacos': lambda n: ' ' * n + 'x',
+}
+
+def _processar_texto(extractor, texto: str) -> None:
+    extractor.extract_personal_data(texto)
+    extractor.extract_employment_data(texto)
+
+def _tempo(func: Callable[[], Any], rodadas: int = 2) -> float:
+    melhor = None
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        func()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor
+
+def _mutate(texto: str, rng: random.Random) -> str:
+    """Insere trechos aleatórios (espaços, letras, dígitos, rótulos) em posições aleatórias"""
+    trechos = (' ' * 500, '\t' * 50, 'A' * 800, 'x' * 300, '9' * 400, '12/' * 200, 'Data de ', 'Empregado',
+               'Contribuinte', 'Nome: ', 'CPF: 005.369.489-92 ', '01/2020 ', '1.000,00 ', 'IREM-', '\n')
+    partes = list(texto)
+    for _ in range(rng.randint(1, 20)):
+        partes.insert(rng.randint(0, len(partes)), rng.choice(trechos))
+    return ''.join(partes)
+
+def fuzz_extractor(modulo: str, tamanho: int = FUZZ_TAMANHO, casos: int = 200, seed: int = 0,
+                   limite: float = FUZZ_LIMITE_SEGUNDOS, diretorio: str = FIXTURES_DIR) -> Dict[str, Any]:
+    """Fixa o tempo de pior caso do extrator em textos patológicos e aleatórios
+
+    Cada caso de FUZZ_CASOS é medido com `tamanho` e 4 x `tamanho` caracteres: falha
+    se passar de `limite` segundos ou crescer mais que FUZZ_RAZAO_MAXIMA vezes
+    (retrocesso superlinear). `casos` páginas sintéticas com trechos aleatórios
+    inseridos também precisam terminar dentro do limite. No extrator com orçamento,
+    confere o resultado parcial de process_cnis com orçamento de páginas.
+    """
+    extractor = _load_extractor(modulo)
+    resultado: Dict[str, Any] = {'casos': {}, 'falhas': []}
+
+    for nome, gerar in FUZZ_CASOS.items():
+        pequeno = _tempo(lambda: _processar_texto(extractor, gerar(tamanho)))
+        grande = _tempo(lambda: _processar_texto(extractor, gerar(tamanho * 4)))
+        razao = grande / pequeno if pequeno > 0 else None
+        resultado['casos'][nome] = {'segundos': round(pequeno, 6), 'segundos_4x': round(grande, 6),
+                                    'razao': round(razao, 2) if razao else None}
+        # Abaixo de MIN_DELTA_SECONDS a razão é só ruído de medida
+        if grande > limite or (razao and razao > FUZZ_RAZAO_MAXIMA and grande > MIN_DELTA_SECONDS):
+            resultado['falhas'].append(nome)
+
+    rng = random.Random(seed)
+    paginas = generate_cnis(8, 24, seed=seed)['paginas']
+    pior = 0.0
+    for indice in range(casos):
+        texto = _mutate(rng.choice(paginas), rng)
+        decorrido = _tempo(lambda: _processar_texto(extractor, texto), rodadas=1)
+        if decorrido > limite:
+            resultado['falhas'].append(f"aleatorio_{indice}")
+        pior = max(pior, decorrido)
+    resultado['aleatorio'] = {'casos': casos, 'max_segundos': round(pior, 6)}
+
+    if hasattr(extractor, 'page_budget'):
+        cnis = generate_cnis(12, 24, paginas=4, seed=seed)
+        arquivos = write_fixtures('fuzz_orcamento', cnis, diretorio)
+        extractor.page_budget = 2
+        try:
+            parcial = extractor.process_cnis(arquivos['pdf'])
+        finally:
+            extractor.page_budget = 0
+        resultado['orcamento'] = {campo: parcial.get(campo) for campo in ('success', 'partial', 'partial_reason',
+                                                                          'pages_processed')}
+        if not (parcial.get('partial') and parcial.get('pages_processed') == 2):
+            resultado['falhas'].append('orcamento_paginas')
+    return resultado
+
+def compare_with_baseline(relatorio: Dict[str, Any], baseline: Dict[str, Any],
+                          tolerancia: float = DEFAULT_TOLERANCE) -> List[Dict[str, Any]]:
+    """Compara tempo e memória de cada etapa com a linha de base
+
+    Acrescenta ao relatório a razão atual/base de cada medida e retorna a lista de
+    regressões: medidas que pioraram mais que `tolerancia` e resultados de
+    process_cnis diferentes dos da linha de base. Cenários com parâmetros
+    diferentes dos da linha de base não são comparados.
+    """
+    regressoes = []
+    for nome, cenario in relatorio['cenarios'].items():
+        base_cenario = baseline.get('cenarios', {}).get(nome)
+        if not base_cenario or base_cenario.get('parametros') != cenario['parametros']:
+            continue
+        for modulo, resultado in cenario['extratores'].items():
+            base = base_cenario['extratores'].get(modulo, {})
+            for etapa, medida in resultado.get('etapas', {}).items():
+                base_medida = base.get('etapas', {}).get(etapa)
+                if not base_medida:
+                    continue
+                for campo in ('segundos', 'pico_memoria_bytes'):
+                    if not base_medida.get(campo):
+                        continue
+                    razao = medida[campo] / base_medida[campo]
+                    medida[f"razao_{campo}"] = round(razao, 3)
+                    if campo == 'segundos' and medida[campo] - base_medida[campo] < MIN_DELTA_SECONDS:
+                        continue
+                    if razao > 1 + tolerancia:
+                        regressoes.append({'cenario': nome, 'extrator': modulo, 'etapa': etapa,
+                                           'medida': campo, 'razao': round(razao, 3)})
+            if base.get('assinatura') and resultado.get('assinatura') != base['assinatura']:
+                regressoes.append({'cenario': nome, 'extrator': modulo, 'etapa': 'process_cnis',
+                                   'medida': 'resultado', 'razao': None})
+    return regressoes
+
+def load_baseline(caminho: str = BASELINE_PATH) -> Optional[Dict[str, Any]]:
+    """Lê a linha de base gravada, se existir"""
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_baseline(relatorio: Dict[str, Any], caminho: str = BASELINE_PATH) -> None:
+    """Grava o relatório como nova linha de base"""
+    Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    logger.info(f"Linha de base gravada em {caminho}")
+
+def main():
+    """Função principal: gera os extratos, mede os extratores e compara com a linha de base"""
+    parser = argparse.ArgumentParser(description='Benchmark dos extratores do CNIS com extratos sintéticos')
+    parser.add_argument('--cenario', action='append', choices=sorted(CENARIOS),
+                        help='Cenário padrão a medir (repetível; padrão: todos)')
+    parser.add_argument('--vinculos', type=int, help='Cenário personalizado: número de vínculos')
+    parser.add_argument('--remuneracoes', type=int, default=24, help='Cenário personalizado: competências por vínculo')
+    parser.add_argument('--paginas', type=int, default=0, help='Cenário personalizado: páginas (0: automático)')
+    parser.add_argument('--extrator', action='append', choices=sorted(EXTRATORES),
+                        help='Extrator a medir (repetível; padrão: todos)')
+    parser.add_argument('--rodadas', type=int, default=3, help='Execuções por medida (vale a mais rápida)')
+    parser.add_argument('--seed', type=int, default=0, help='Semente do gerador de extratos')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Diretório dos extratos gerados (texto, PDF, esperado)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Arquivo da linha de base')
+    parser.add_argument('--salvar-baseline', action='store_true', help='Grava este resultado como linha de base')
+    parser.add_argument('--tolerancia', type=float, default=DEFAULT_TOLERANCE,
+                        help='Piora relativa tolerada antes de acusar regressão (padrão: 0.25)')
+    parser.add_argument('--output', help='Arquivo de saída JSON do relatório (padrão: stdout)')
+    parser.add_argument('--fuzz', action='store_true',
+                        help='Em vez do benchmark, fixa o tempo de pior caso com textos patológicos e aleatórios')
+    parser.add_argument('--fuzz-casos', type=int, default=200, help='Páginas aleatórias no fuzz')
+    parser.add_argument('--fuzz-tamanho', type=int, default=FUZZ_TAMANHO, help='Tamanho dos textos patológicos')
+    parser.add_argument('--fuzz-limite', type=float, default=FUZZ_LIMITE_SEGUNDOS,
+                        help='Tempo máximo por texto no fuzz (segundos)')
+    args = parser.parse_args()
+
+    if args.vinculos:
+        cenarios = {f"v{args.vinculos}_r{args.remuneracoes}_p{args.paginas}":
+                    (args.vinculos, args.remuneracoes, args.paginas)}
+    else:
+        cenarios = {nome: CENARIOS[nome] for nome in (args.cenario or CENARIOS)}
+
+    # Os extratores registram cada documento em INFO; no benchmark só interessam avisos
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    if args.fuzz:
+        # Padrão: o extrator usado em produção (os demais não têm orçamento por documento)
+        relatorio = {modulo: fuzz_extractor(modulo, args.fuzz_tamanho, args.fuzz_casos, args.seed,
+                                            args.fuzz_limite, args.fixtures)
+                     for modulo in args.extrator or ['simple_cnis_extractor']}
+        print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+        falhas = [f"{modulo}.{falha}" for modulo, resultado in relatorio.items() for falha in resultado['falhas']]
+        for falha in falhas:
+            logger.warning(f"Pior caso acima do limite: {falha}")
+        sys.exit(1 if falhas else 0)
+
+    relatorio = run_benchmark(cenarios, args.extrator or list(EXTRATORES), args.rodadas, args.fixtures, args.seed)
+
+    regressoes = []
+    baseline = load_baseline(args.baseline)
+    if baseline and not args.salvar_baseline:
+        regressoes = compare_with_baseline(relatorio, baseline, args.tolerancia)
+        relatorio['baseline'] = {'arquivo': args.baseline, 'registrado_em': baseline.get('registrado_em'),
+                                 'tolerancia': args.tolerancia, 'regressoes': regressoes}
+    elif not baseline:
+        logger.info(f"Sem linha de base em {args.baseline}; use --salvar-baseline para gravar uma")
+
+    if args.salvar_baseline:
+        save_baseline(relatorio, args.baseline)
+
+    saida = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(saida)
+    else:
+        print(saida)
+
+    for regressao in regressoes:
+        logger.warning(f"Regressão: {regressao['extrator']}.{regressao['etapa']} ({regressao['cenario']}) "
+                       f"{regressao['medida']} x{regressao['razao']}")
+    sys.exit(1 if regressoes else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Cache de resultados da extração do CNIS
+Armazena em SQLite o resultado de process_cnis indexado pelo SHA-256 do PDF,
+pela versão do extrator, pelo motor de PDF e pela versão da normalização do
+texto, com descarte LRU por tamanho e idade
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+from typing import Dict, Any, Optional
+
+from cnis_pdf_engines import NORMALIZATION_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Limites padrão do cache (podem ser alterados por variáveis de ambiente)
+DEFAULT_MAX_BYTES = int(os.getenv('CNIS_CACHE_MAX_MB', 512)) * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = int(os.getenv('CNIS_CACHE_MAX_AGE_DAYS', 90))
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Calcula o SHA-256 do arquivo lendo em blocos"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class CNISResultCache:
+    """Cache em disco (SQLite) de resultados de extração do CNIS"""
+
+    def __init__(self, db_path: str, extractor_version: str,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_age_days: int = DEFAULT_MAX_AGE_DAYS):
+        """Inicializa o cache no arquivo SQLite informado"""
+        self.db_path = db_path
+        self.extractor_version = extractor_version
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self._conn = None
+        self._conn_pid = None
+
+    def connection(self) -> sqlite3.Connection:
+        """Retorna a conexão do processo atual (conexões não são compartilhadas após fork)"""
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute("""CREATE TABLE IF NOT EXISTS resultados (
+                                chave TEXT PRIMARY KEY,
+                                versao TEXT NOT NULL,
+                                resultado TEXT NOT NULL,
+                                tamanho INTEGER NOT NULL,
+                                criado_em REAL NOT NULL,
+                                acessado_em REAL NOT NULL
+                            )""")
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_resultados_acesso ON resultados (acessado_em)')
+            conn.execute("""CREATE TABLE IF NOT EXISTS contadores (
+                                nome TEXT PRIMARY KEY,
+                                valor INTEGER NOT NULL DEFAULT 0
+                            )""")
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def key_for(self, digest: str, engine: str) -> str:
+        """Monta a chave com o hash do PDF, a versão do extrator, o motor e a normalização
+
+        Motores diferentes podem produzir textos diferentes para o mesmo PDF: o
+        resultado de um motor não é servido para outro.
+        """
+        return f"{digest}:{self.extractor_version}:{engine}:n{NORMALIZATION_VERSION}"
+
+    def _increment(self, counter: str) -> None:
+        self.connection().execute(
+            'INSERT INTO contadores (nome, valor) VALUES (?, 1) '
+            'ON CONFLICT(nome) DO UPDATE SET valor = valor + 1',
+            (counter,)
+        )
+
+    def get(self, digest: str, engine: str) -> Optional[Dict[str, Any]]:
+        """Busca um resultado pelo hash do PDF e motor; retorna None em caso de falta"""
+        try:
+            conn = self.connection()
+            key = self.key_for(digest, engine)
+            row = conn.execute(
+                'SELECT resultado, acessado_em FROM resultados WHERE chave = ?', (key,)
+            ).fetchone()
+            now = time.time()
+
+            if row is None or now - row[1] > self.max_age:
+                self._increment('misses')
+                return None
+
+            conn.execute('UPDATE resultados SET acessado_em = ? WHERE chave = ?', (now, key))
+            self._increment('hits')
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Erro ao consultar cache do CNIS: {e}")
+            return None
+
+    def put(self, digest: str, engine: str, result: Dict[str, Any]) -> None:
+        """Armazena um resultado e aplica o descarte por tamanho e idade"""
+        try:
+            payload = json.dumps(result, ensure_ascii=False, separators=(',', ':'))
+            now = time.time()
+            conn = self.connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO resultados (chave, versao, resultado, tamanho, criado_em, acessado_em) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (self.key_for(digest, engine), self.extractor_version, payload, len(payload.encode('utf-8')), now, now)
+            )
+            self.evict()
+        except sqlite3.Error as e:
+            logger.warning(f"Erro ao gravar cache do CNIS: {e}")
+
+    def evict(self) -> int:
+        """Remove entradas expiradas e, se necessário, as menos usadas até caber no limite"""
+        conn = self.connection()
+        removed = conn.execute(
+            'DELETE FROM resultados WHERE acessado_em < ?', (time.time() - self.max_age,)
+        ).rowcount
+
+        total = conn.execute('SELECT COALESCE(SUM(tamanho), 0) FROM resultados').fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            freed = 0
+            victims = []
+            for key, size in conn.execute('SELECT chave, tamanho FROM resultados ORDER BY acessado_em'):
+                victims.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            conn.executemany('DELETE FROM resultados WHERE chave = ?', victims)
+            removed += len(victims)
+
+        if removed:
+            conn.execute(
+                'INSERT INTO contadores (nome, valor) VALUES (?, ?) '
+                'ON CONFLICT(nome) DO UPDATE SET valor = valor + excluded.valor',
+                ('evictions', removed)
+            )
+            logger.info(f"Cache do CNIS: {removed} entradas descartadas")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna contadores de acertos/faltas e ocupação do cache"""
+        conn = self.connection()
+        counters = dict(conn.execute('SELECT nome, valor FROM contadores').fetchall())
+        entries, size = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM resultados'
+        ).fetchone()
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'evictions': counters.get('evictions', 0),
+            'entries': entries,
+            'size_bytes': size,
+            'max_bytes': self.max_bytes,
+            'max_age_days': self.max_age // 86400,
+            'extractor_version': self.extractor_version,
+        }
+
+    def clear(self) -> None:
+        """Remove todas as entradas e zera os contadores"""
+        conn = self.connection()
+        conn.execute('DELETE FROM resultados')
+        conn.execute('DELETE FROM contadores')
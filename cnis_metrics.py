@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Métricas de desempenho da extração do CNIS
+Tempo por etapa (exclusivo, mesmo com etapas encadeadas em fluxo), contadores
+e pico de memória via tracemalloc; perfil cProfile opcional por documento
+"""
+
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+def metrics_enabled() -> bool:
+    """Métricas ligadas por $CNIS_METRICS (1/true/yes)"""
+    return os.getenv('CNIS_METRICS', '').lower() in ('1', 'true', 'yes', 'on')
+
+class ExtractionMetrics:
+    """Coleta tempo por etapa, contadores e pico de memória de uma extração
+
+    As etapas formam uma pilha: o tempo gasto numa etapa interna é descontado da
+    etapa que a chamou, de modo que geradores encadeados (páginas -> linhas ->
+    seções -> vínculos) tenham cada um apenas o próprio custo.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        """Inicializa a coleta; trace_memory liga o tracemalloc até finish()"""
+        self.timings: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.info: Dict[str, Any] = {}
+        self._stack: List[List[Any]] = []
+        self._started = time.perf_counter()
+        self._own_tracemalloc = trace_memory and not tracemalloc.is_tracing()
+        if self._own_tracemalloc:
+            tracemalloc.start()
+        elif trace_memory:
+            tracemalloc.reset_peak()
+        self._trace_memory = trace_memory
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mede o tempo exclusivo de um trecho na etapa indicada"""
+        now = time.perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.timings[parent[0]] = self.timings.get(parent[0], 0.0) + now - parent[1]
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.timings[name] = self.timings.get(name, 0.0) + now - self._stack.pop()[1]
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def timed(self, iterable: Iterable[Any], name: str, counter: Optional[str] = None) -> Iterator[Any]:
+        """Envolve um iterador medindo o tempo de produção de cada item
+
+        counter (opcional) é o contador incrementado a cada item produzido.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            if counter:
+                self.counts[counter] = self.counts.get(counter, 0) + 1
+            yield item
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Incrementa um contador"""
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def finish(self) -> Dict[str, Any]:
+        """Encerra a coleta e retorna o bloco de métricas"""
+        block: Dict[str, Any] = dict(self.info)
+        block['timings'] = {name: round(value, 4) for name, value in self.timings.items()}
+        block['timings']['total'] = round(time.perf_counter() - self._started, 4)
+        block['counts'] = dict(self.counts)
+        if self._trace_memory and tracemalloc.is_tracing():
+            block['tracemalloc_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            if self._own_tracemalloc:
+                tracemalloc.stop()
+        return block
+
+def profile_call(func: Callable[..., Any], *args, output: Optional[str] = None, limit: int = 30) -> Any:
+    """Executa func sob cProfile, grava as estatísticas em output e resume no stderr"""
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        if output:
+            profiler.dump_stats(output)
+            logger.info(f"Perfil cProfile gravado em {output}")
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(limit)
+        sys.stderr.write(summary.getvalue())
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Motores de extração de texto de PDF para o CNIS
+Registro de bibliotecas intercambiáveis (pypdfium2, PyMuPDF, PyPDF2, pdfplumber),
+seleção por parâmetro/variável de ambiente e autoavaliação de desempenho
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import importlib.util
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Perfil gravado pelo benchmark com o motor mais rápido validado
+ENGINE_PROFILE_PATH = os.getenv(
+    'CNIS_ENGINE_PROFILE',
+    str(Path(__file__).resolve().parent / 'storage' / 'app' / 'cnis_pdf_engine.json')
+)
+
+_RE_ESPACOS = re.compile(r'[ \t\f\v\xa0]+')
+
+# Versão da normalização: altere sempre que normalize_page_text mudar o texto
+# produzido (faz parte da chave do cache de resultados e do artefato de texto)
+NORMALIZATION_VERSION = '1'
+
+def normalize_page_text(text: Optional[str]) -> str:
+    """Normaliza o texto de uma página para o mesmo layout de linhas em todos os motores
+
+    Unifica quebras de linha, troca espaços especiais por espaço simples, colapsa
+    sequências de espaços e remove linhas vazias.
+    """
+    if not text:
+        return ''
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = []
+    for line in text.split('\n'):
+        line = _RE_ESPACOS.sub(' ', line).strip()
+        if line:
+            lines.append(line)
+    return '\n'.join(lines)
+
+class PDFEngine:
+    """Motor de extração de texto baseado em uma biblioteca de PDF"""
+
+    name = ''
+    module = ''
+    _available: Optional[bool] = None
+    _installed: Optional[bool] = None
+
+    def is_installed(self) -> bool:
+        """Verifica se a biblioteca está instalada sem importá-la (find_spec)"""
+        if self._installed is None:
+            self._installed = importlib.util.find_spec(self.module) is not None
+        return self._installed
+
+    def is_available(self) -> bool:
+        """Verifica (uma única vez) se a biblioteca do motor pode ser importada"""
+        if self._available is None:
+            try:
+                self.load()
+                self._available = True
+            except Exception:
+                self._available = False
+        return self._available
+
+    def load(self):
+        """Importa a biblioteca do motor"""
+        return __import__(self.module)
+
+    def page_count(self, pdf_path: str) -> int:
+        """Retorna o número de páginas do PDF"""
+        raise NotImplementedError
+
+    def iter_pages(self, pdf_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        """Gera o texto bruto das páginas [start, end) do PDF, uma de cada vez"""
+        raise NotImplementedError
+
+    def extract_pages(self, pdf_path: str, start: int = 0, end: Optional[int] = None) -> List[str]:
+        """Extrai o texto bruto das páginas [start, end) do PDF"""
+        return list(self.iter_pages(pdf_path, start, end))
+
+class PdfiumEngine(PDFEngine):
+    """Motor pypdfium2 (PDFium nativo, o mais rápido)"""
+
+    name = 'pypdfium2'
+    module = 'pypdfium2'
+
+    def page_count(self, pdf_path: str) -> int:
+        pdfium = self.load()
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    def iter_pages(self, pdf_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        pdfium = self.load()
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            end = len(pdf) if end is None else end
+            for index in range(start, end):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                try:
+                    text = textpage.get_text_range()
+                finally:
+                    textpage.close()
+                    page.close()
+                yield text
+        finally:
+            pdf.close()
+
+class PyMuPDFEngine(PDFEngine):
+    """Motor PyMuPDF (fitz), usado quando instalado"""
+
+    name = 'pymupdf'
+    module = 'fitz'
+
+    def page_count(self, pdf_path: str) -> int:
+        fitz = self.load()
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
+
+    def iter_pages(self, pdf_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        fitz = self.load()
+        with fitz.open(pdf_path) as doc:
+            end = len(doc) if end is None else end
+            for index in range(start, end):
+                yield doc.load_page(index).get_text()
+
+class PyPDF2Engine(PDFEngine):
+    """Motor PyPDF2 (Python puro)"""
+
+    name = 'pypdf2'
+    module = 'PyPDF2'
+
+    def page_count(self, pdf_path: str) -> int:
+        PyPDF2 = self.load()
+        with open(pdf_path, 'rb') as file:
+            return len(PyPDF2.PdfReader(file).pages)
+
+    def iter_pages(self, pdf_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        PyPDF2 = self.load()
+        with open(pdf_path, 'rb') as file:
+            reader = PyPDF2.PdfReader(file)
+            end = len(reader.pages) if end is None else end
+            for index in range(start, end):
+                yield reader.pages[index].extract_text()
+
+class PdfplumberEngine(PDFEngine):
+    """Motor pdfplumber (pdfminer.six, o mais lento)"""
+
+    name = 'pdfplumber'
+    module = 'pdfplumber'
+
+    def page_count(self, pdf_path: str) -> int:
+        pdfplumber = self.load()
+        with pdfplumber.open(pdf_path) as pdf:
+            return len(pdf.pages)
+
+    def iter_pages(self, pdf_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        pdfplumber = self.load()
+        with pdfplumber.open(pdf_path) as pdf:
+            end = len(pdf.pages) if end is None else end
+            for index in range(start, end):
+                page = pdf.pages[index]
+                yield page.extract_text() or ''
+                # Libera os objetos de layout já processados desta página
+                page.flush_cache()
+
+# Registro de motores na ordem de preferência quando não há escolha explícita
+# nem perfil de benchmark (PyPDF2 e pdfplumber primeiro, como no extrator original)
+ENGINES: Dict[str, PDFEngine] = {
+    engine.name: engine
+    for engine in (PyPDF2Engine(), PdfplumberEngine(), PdfiumEngine(), PyMuPDFEngine())
+}
+
+def available_engines() -> List[str]:
+    """Lista os motores cujas bibliotecas estão instaladas"""
+    return [name for name, engine in ENGINES.items() if engine.is_available()]
+
+def load_engine_profile(profile_path: str = ENGINE_PROFILE_PATH) -> Optional[Dict[str, Any]]:
+    """Lê o perfil gravado pelo benchmark, se existir"""
+    try:
+        with open(profile_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def requested_engine(name: Optional[str] = None) -> Optional[str]:
+    """Motor pedido: parâmetro, $CNIS_PDF_ENGINE ou perfil do benchmark"""
+    requested = name or os.getenv('CNIS_PDF_ENGINE')
+    if not requested:
+        profile = load_engine_profile()
+        requested = profile.get('engine') if profile else None
+    return requested
+
+def resolve_engine_name(name: Optional[str] = None) -> str:
+    """Nome do motor que select_engine escolheria, sem importar nenhuma biblioteca
+
+    Usado na chave do cache: um acerto não paga a importação da biblioteca de PDF.
+    """
+    requested = requested_engine(name)
+    if requested:
+        engine = ENGINES.get(requested.lower())
+        if engine is not None and engine.is_installed():
+            return engine.name
+
+    for engine in ENGINES.values():
+        if engine.is_installed():
+            return engine.name
+
+    raise ImportError("Nenhuma biblioteca de PDF encontrada. Instale pypdfium2, PyPDF2 ou pdfplumber")
+
+def select_engine(name: Optional[str] = None) -> PDFEngine:
+    """Escolhe o motor: parâmetro, $CNIS_PDF_ENGINE, perfil do benchmark ou ordem padrão"""
+    requested = requested_engine(name)
+
+    if requested:
+        engine = ENGINES.get(requested.lower())
+        if engine is None:
+            logger.warning(f"Motor de PDF desconhecido: {requested}")
+        elif engine.is_available():
+            return engine
+        else:
+            logger.warning(f"Motor de PDF {requested} não está instalado, usando o próximo disponível")
+
+    for engine in ENGINES.values():
+        if engine.is_available():
+            return engine
+
+    raise ImportError("Nenhuma biblioteca de PDF encontrada. Instale pypdfium2, PyPDF2 ou pdfplumber")
+
+def iter_pages_with(engine_name: str, pdf_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+    """Gera as páginas [start, end) normalizadas com o motor indicado"""
+    for page in ENGINES[engine_name].iter_pages(pdf_path, start, end):
+        yield normalize_page_text(page)
+
+def extract_pages_with(engine_name: str, pdf_path: str, start: int = 0, end: Optional[int] = None) -> List[str]:
+    """Extrai e normaliza as páginas [start, end) com o motor indicado (usado pelos processos de trabalho)"""
+    return list(iter_pages_with(engine_name, pdf_path, start, end))
+
+def benchmark_engines(sample_path: str, signature: Callable[[str], Any], rounds: int = 3,
+                      profile_path: Optional[str] = ENGINE_PROFILE_PATH) -> Dict[str, Any]:
+    """Mede cada motor disponível numa amostra e grava o mais rápido cujo resultado confere
+
+    signature recebe o texto normalizado e devolve o resultado do parser; motores
+    cujo resultado diverge do resultado mais comum entre os motores são descartados.
+    """
+    timings = {}
+    signatures = {}
+
+    for name in available_engines():
+        engine = ENGINES[name]
+        best = None
+        text = ''
+        try:
+            for _ in range(rounds):
+                started = time.perf_counter()
+                pages = engine.extract_pages(sample_path)
+                text = '\n'.join(normalize_page_text(page) for page in pages)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+        except Exception as e:
+            logger.warning(f"Motor {name} falhou no benchmark: {e}")
+            continue
+        timings[name] = round(best, 4)
+        signatures[name] = json.dumps(signature(text), sort_keys=True, ensure_ascii=False)
+
+    if not timings:
+        raise RuntimeError('Nenhum motor de PDF conseguiu processar a amostra')
+
+    # Resultado de referência: o produzido pelo maior número de motores
+    votes = {}
+    for value in signatures.values():
+        votes[value] = votes.get(value, 0) + 1
+    reference = max(votes, key=votes.get)
+    matching = sorted((name for name, value in signatures.items() if value == reference), key=timings.get)
+
+    report = {
+        'engine': matching[0],
+        'timings': timings,
+        'matching': matching,
+        'divergent': sorted(set(timings) - set(matching)),
+        'sample': str(sample_path),
+        'rounds': rounds,
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+    if profile_path:
+        Path(profile_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(profile_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"Motor de PDF escolhido: {report['engine']} (perfil salvo em {profile_path})")
+
+    return report
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Verificação prévia (pre-flight) de PDFs antes da extração completa
+Confere cabeçalho, startxref/%%EOF e criptografia lendo apenas o início e o fim
+do arquivo, extrai somente a primeira página e classifica o tipo de documento
+(CNIS, laudo médico ou outro) para rotear ou rejeitar antes do trabalho pesado
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from typing import Any, Dict, Optional
+import logging
+
+from cnis_pdf_engines import select_engine, normalize_page_text
+
+logger = logging.getLogger(__name__)
+
+# Bytes lidos do início (cabeçalho) e do fim (trailer) do arquivo
+HEAD_BYTES = 1024
+TAIL_BYTES = 4096
+# Bytes lidos na posição indicada por startxref (tabela ou stream de xref)
+XREF_BYTES = 4096
+# Abaixo disso a primeira página é tratada como imagem (sem camada de texto)
+MIN_TEXT_CHARS = int(os.getenv('CNIS_PREFLIGHT_MIN_TEXT', 20))
+
+_RE_CABECALHO = re.compile(rb'%PDF-(\d\.\d)')
+_RE_STARTXREF = re.compile(rb'startxref\s+(\d+)\s+%%EOF')
+_RE_XREF = re.compile(rb'\s*(?:xref\b|\d+\s+\d+\s+obj\b)')
+_RE_ENCRYPT = re.compile(rb'/Encrypt\b')
+
+# Marcadores procurados na primeira página
+_MARCADORES_CNIS = {
+    'cnis': re.compile(r'\bCNIS\b'),
+    'cadastro_nacional': re.compile(r'Cadastro\s+Nacional\s+de\s+Informa[çc][õo]es\s+Sociais', re.IGNORECASE),
+    'relacoes_previdenciarias': re.compile(r'Rela[çc][õo]es\s+Previdenci[áa]rias', re.IGNORECASE),
+    'extrato_previdenciario': re.compile(r'Extrato\s+Previdenci[áa]rio', re.IGNORECASE),
+    'nit': re.compile(r'\bNIT\b'),
+}
+_MARCADORES_LAUDO = {
+    'cid': re.compile(r'\bCID(?:[\s:-]*10)?[\s:-]*[A-Z]\d{2}(?:\.\d)?\b', re.IGNORECASE),
+    'crm': re.compile(r'\bCRM\b'),
+    'laudo': re.compile(r'\bLaudo\b', re.IGNORECASE),
+    'atestado': re.compile(r'\bAtestado\b', re.IGNORECASE),
+}
+
+def preflight_enabled() -> bool:
+    """Pre-flight antes de cada extração ligado por $CNIS_PREFLIGHT (1/true/yes)"""
+    return os.getenv('CNIS_PREFLIGHT', '').lower() in ('1', 'true', 'yes', 'on')
+
+def check_structure(pdf_path: str) -> Dict[str, Any]:
+    """Confere cabeçalho, startxref e criptografia lendo só as pontas do arquivo
+
+    Não interpreta o documento: apenas localiza %PDF-, o último startxref/%%EOF,
+    verifica se o deslocamento aponta para uma tabela ou stream de xref e procura
+    /Encrypt no trailer.
+    """
+    size = os.path.getsize(pdf_path)
+    with open(pdf_path, 'rb') as f:
+        head = f.read(HEAD_BYTES)
+        f.seek(max(0, size - TAIL_BYTES))
+        tail = f.read()
+
+        header = _RE_CABECALHO.search(head)
+        structure = {
+            'file_size': size,
+            'is_pdf': header is not None,
+            'pdf_version': header.group(1).decode('ascii') if header else None,
+            'xref_valid': False,
+            'truncated': True,
+            'encrypted': False,
+        }
+        if not header:
+            return structure
+
+        startxref = None
+        for startxref in _RE_STARTXREF.finditer(tail):
+            pass
+        if startxref is None:
+            return structure
+        structure['truncated'] = False
+
+        offset = int(startxref.group(1))
+        if 0 < offset < size:
+            f.seek(offset)
+            xref = f.read(XREF_BYTES)
+            structure['xref_valid'] = _RE_XREF.match(xref) is not None
+            # Em PDFs com stream de xref o dicionário do trailer fica junto do stream
+            structure['encrypted'] = bool(_RE_ENCRYPT.search(xref))
+        structure['encrypted'] = structure['encrypted'] or bool(_RE_ENCRYPT.search(tail))
+
+    return structure
+
+def classify_text(text: str) -> Dict[str, Any]:
+    """Classifica o texto da primeira página em cnis, medical_report ou other"""
+    cnis = [name for name, pattern in _MARCADORES_CNIS.items() if pattern.search(text)]
+    laudo = [name for name, pattern in _MARCADORES_LAUDO.items() if pattern.search(text)]
+
+    # "Relações Previdenciárias" só aparece no CNIS; os demais precisam de reforço
+    if 'relacoes_previdenciarias' in cnis or len(cnis) >= 2:
+        document_type = 'cnis'
+    elif 'cid' in laudo or len(laudo) >= 2:
+        document_type = 'medical_report'
+    else:
+        document_type = 'other'
+
+    return {'document_type': document_type, 'markers': cnis + laudo}
+
+def preflight_pdf(pdf_path: str, engine_name: Optional[str] = None) -> Dict[str, Any]:
+    """Verifica o PDF e classifica a primeira página sem processar o restante
+
+    status é ok, not_pdf, corrupt, encrypted ou no_text; valid indica se vale a
+    pena seguir para a extração completa. xref inválido sozinho não reprova o
+    arquivo, pois as bibliotecas reconstroem a tabela; só reprova se a primeira
+    página também não puder ser lida.
+    """
+    started = time.perf_counter()
+    result: Dict[str, Any] = {'success': True, 'valid': False, 'status': 'ok'}
+
+    try:
+        result.update(check_structure(pdf_path))
+    except OSError as e:
+        return {'success': False, 'valid': False, 'status': 'unreadable', 'error': str(e)}
+
+    if not result['is_pdf']:
+        result['status'] = 'not_pdf'
+        result['elapsed'] = round(time.perf_counter() - started, 4)
+        return result
+
+    text = ''
+    try:
+        engine = select_engine(engine_name)
+        result['engine'] = engine.name
+        result['page_count'] = engine.page_count(pdf_path)
+        for page in engine.iter_pages(pdf_path, 0, 1):
+            text = normalize_page_text(page)
+    except ImportError:
+        raise
+    except Exception as e:
+        logger.warning(f"Pre-flight não conseguiu ler {pdf_path}: {e}")
+        result['status'] = 'encrypted' if result['encrypted'] else 'corrupt'
+        result['error'] = str(e)
+        result['elapsed'] = round(time.perf_counter() - started, 4)
+        return result
+
+    result['text_length'] = len(text)
+    result['has_text'] = len(text) >= MIN_TEXT_CHARS
+    result.update(classify_text(text))
+
+    if not result['has_text']:
+        result['status'] = 'no_text'
+    else:
+        result['valid'] = True
+
+    result['elapsed'] = round(time.perf_counter() - started, 4)
+    return result
+
+def main():
+    """Função principal: imprime o pre-flight de cada PDF informado"""
+    parser = argparse.ArgumentParser(description='Verificação prévia e classificação de PDFs')
+    parser.add_argument('pdf_paths', nargs='+', help='Arquivos PDF a verificar')
+    parser.add_argument('--engine', help='Motor de PDF (padrão: o mesmo do extrator)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    results = {path: preflight_pdf(path, args.engine) for path in args.pdf_paths}
+    output = results[args.pdf_paths[0]] if len(args.pdf_paths) == 1 else results
+    print(json.dumps(output, ensure_ascii=False, indent=2))
+    sys.exit(0 if all(result['valid'] for result in results.values()) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Série de remunerações por competência do CNIS
+Armazena competência, remuneração e indicadores de cada vínculo em colunas
+compactas (array) em vez de listas de dicionários, com codificação JSON enxuta
+"""
+
+import re
+from array import array
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+# Competências são guardadas como meses desde janeiro de 1970
+EPOCH_YEAR = 1970
+
+# Início de uma linha da tabela de remunerações: MM/AAAA seguido de valor
+_RE_LINHA_REMUNERACAO = re.compile(r'(\d{2})/(\d{4})\s+\d')
+# Indicadores opcionais após o valor (ex.: IREM-INDPEND, PEXT); duas letras fixas
+# e depois [A-Z0-9]*: sem divisões alternativas de uma sequência longa de letras
+_INDICADORES = r'(?:[\s,]+[A-Z]{2}[A-Z0-9]*(?:-[A-Z0-9]+)*(?=[\s,]|$))*'
+# Tabela de empregado: várias competências por linha (MM/AAAA valor [indicadores])
+_RE_COMPETENCIA = re.compile(
+    r'(?<![\d/])(\d{2})/(\d{4})\s+(\d+(?:\.\d{3})*,\d{2})(' + _INDICADORES + ')'
+)
+# Tabela do agrupamento: uma competência por linha, valor após contratante/estabelecimento
+_RE_VALOR = re.compile(r'(?<![\d.])\d{1,3}(?:\.\d{3})*,\d{2}(?!\d)')
+_RE_INDICADORES = re.compile(_INDICADORES)
+
+def competencia_to_month(mes: int, ano: int) -> int:
+    """Converte mês/ano para meses desde 01/1970"""
+    return (ano - EPOCH_YEAR) * 12 + (mes - 1)
+
+def month_to_competencia(month: int) -> str:
+    """Converte meses desde 01/1970 para MM/AAAA"""
+    ano, mes = divmod(month, 12)
+    return f"{mes + 1:02d}/{ano + EPOCH_YEAR}"
+
+def parse_valor(valor: str) -> float:
+    """Converte um valor no formato 1.234,56 para float"""
+    return float(valor.replace('.', '').replace(',', '.'))
+
+class RemuneracaoSeries:
+    """Série de remunerações de um vínculo em colunas compactas"""
+
+    __slots__ = ('meses', 'valores', 'indicadores')
+
+    def __init__(self):
+        """Inicializa a série vazia"""
+        self.meses = array('i')
+        self.valores = array('d')
+        # Indicadores são raros: guardados apenas para as posições que os têm
+        self.indicadores: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.meses)
+
+    def __iter__(self) -> Iterator[Tuple[str, float, str]]:
+        """Percorre a série como (competência MM/AAAA, valor, indicadores)"""
+        for index, month in enumerate(self.meses):
+            yield month_to_competencia(month), self.valores[index], self.indicadores.get(index, '')
+
+    def append(self, month: int, valor: float, indicadores: str = '') -> None:
+        """Acrescenta uma competência à série"""
+        if indicadores:
+            self.indicadores[len(self.meses)] = indicadores
+        self.meses.append(month)
+        self.valores.append(valor)
+
+    def add_line(self, line: str) -> int:
+        """Lê todas as competências de uma linha da tabela; retorna quantas foram lidas"""
+        head = _RE_LINHA_REMUNERACAO.match(line)
+        if not head:
+            return 0
+        count = 0
+        for match in _RE_COMPETENCIA.finditer(line):
+            count += self._add(match.group(1), match.group(2), match.group(3), match.group(4))
+        if count:
+            return count
+
+        # Layout do agrupamento: o valor é o último montante monetário da linha
+        valor = None
+        for valor in _RE_VALOR.finditer(line, head.end() - 1):
+            pass
+        if valor is None:
+            return 0
+        indicadores = _RE_INDICADORES.match(line, valor.end()).group(0)
+        return self._add(head.group(1), head.group(2), valor.group(0), indicadores)
+
+    def _add(self, mes: str, ano: str, valor: str, indicadores: str) -> int:
+        if not 1 <= int(mes) <= 12:
+            return 0
+        indicadores = ' '.join(indicadores.replace(',', ' ').split())
+        self.append(competencia_to_month(int(mes), int(ano)), parse_valor(valor), indicadores)
+        return 1
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str]) -> 'RemuneracaoSeries':
+        """Monta a série a partir das linhas de uma seção de vínculo"""
+        series = cls()
+        for line in lines:
+            series.add_line(line.strip())
+        return series
+
+    def total(self) -> float:
+        """Soma das remunerações da série"""
+        return round(sum(self.valores), 2)
+
+    def last(self) -> Optional[Tuple[str, float]]:
+        """Última competência informada e seu valor"""
+        if not self.meses:
+            return None
+        return month_to_competencia(self.meses[-1]), self.valores[-1]
+
+    def to_json(self) -> Optional[Dict[str, Any]]:
+        """Codificação JSON enxuta
+
+        inicio: primeira competência (MM/AAAA); meses: deslocamentos em relação a
+        ela (omitido quando a série é contínua); valores: remunerações;
+        indicadores: {posição: indicadores} apenas quando houver.
+        """
+        if not self.meses:
+            return None
+        first = self.meses[0]
+        offsets = [month - first for month in self.meses]
+        encoded = {'inicio': month_to_competencia(first)}
+        if offsets != list(range(len(offsets))):
+            encoded['meses'] = offsets
+        encoded['valores'] = [round(valor, 2) for valor in self.valores]
+        if self.indicadores:
+            encoded['indicadores'] = {str(index): value for index, value in self.indicadores.items()}
+        return encoded
+
+    @classmethod
+    def from_json(cls, encoded: Optional[Dict[str, Any]]) -> 'RemuneracaoSeries':
+        """Reconstrói a série a partir da codificação de to_json"""
+        series = cls()
+        if not encoded:
+            return series
+        mes, ano = encoded['inicio'].split('/')
+        first = competencia_to_month(int(mes), int(ano))
+        valores = encoded['valores']
+        offsets = encoded.get('meses') or range(len(valores))
+        series.meses = array('i', (first + offset for offset in offsets))
+        series.valores = array('d', valores)
+        series.indicadores = {int(index): value for index, value in encoded.get('indicadores', {}).items()}
+        return series
+
+    def to_numpy(self):
+        """Retorna (meses, valores) como arrays NumPy sem cópia (requer numpy)"""
+        import numpy as np
+        return np.frombuffer(self.meses, dtype=np.int32), np.frombuffer(self.valores, dtype=np.float64)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tempo de contribuição a partir dos vínculos extraídos do CNIS
+Normaliza as datas dos vínculos, une períodos concomitantes (ordenação e varredura)
+e calcula o tempo total, as lacunas e a cobertura por ano
+"""
+
+import re
+import sys
+import json
+import calendar
+import argparse
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+_RE_DATA_COMPLETA = re.compile(r'(\d{2})/(\d{2})/(\d{4})')
+_RE_MES_ANO = re.compile(r'(\d{2})/(\d{4})')
+
+# Períodos são tratados como intervalos fechados de ordinais (date.toordinal)
+Periodo = Tuple[int, int]
+
+def parse_data(value: Optional[str], fim_do_mes: bool = False) -> Optional[date]:
+    """Converte DD/MM/AAAA ou MM/AAAA em date
+
+    Competências MM/AAAA viram o primeiro dia do mês (início) ou o último dia
+    (fim_do_mes), como em convert_month_year_to_full_date.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        match = _RE_DATA_COMPLETA.fullmatch(value)
+        if match:
+            return date(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+        match = _RE_MES_ANO.fullmatch(value)
+        if match:
+            month = int(match.group(1))
+            year = int(match.group(2))
+            day = calendar.monthrange(year, month)[1] if fim_do_mes else 1
+            return date(year, month, day)
+    except ValueError:
+        pass
+    logger.warning(f"Data inválida em vínculo: {value}")
+    return None
+
+def normalize_periods(vinculos: Iterable[Dict[str, Any]], data_referencia: date) -> List[Periodo]:
+    """Converte os vínculos em períodos (início, fim); vínculos sem fim vão até data_referencia"""
+    periods = []
+    for vinculo in vinculos:
+        inicio = parse_data(vinculo.get('data_inicio'))
+        if inicio is None:
+            continue
+        fim = parse_data(vinculo.get('data_fim'), fim_do_mes=True) if vinculo.get('data_fim') else data_referencia
+        if fim is None:
+            continue
+        if fim < inicio:
+            logger.warning(f"Vínculo com fim anterior ao início ignorado: {vinculo.get('data_inicio')} - {vinculo.get('data_fim')}")
+            continue
+        periods.append((inicio.toordinal(), fim.toordinal()))
+    return periods
+
+def merge_periods(periods: Iterable[Periodo]) -> List[Periodo]:
+    """Une períodos sobrepostos ou contíguos em O(n log n)"""
+    merged: List[List[int]] = []
+    for inicio, fim in sorted(periods):
+        if merged and inicio <= merged[-1][1] + 1:
+            if fim > merged[-1][1]:
+                merged[-1][1] = fim
+        else:
+            merged.append([inicio, fim])
+    return [(inicio, fim) for inicio, fim in merged]
+
+def split_days(total_dias: int) -> Dict[str, int]:
+    """Decompõe dias em anos (365 dias), meses (30 dias) e dias"""
+    anos, resto = divmod(total_dias, 365)
+    meses, dias = divmod(resto, 30)
+    return {'anos': anos, 'meses': meses, 'dias': dias}
+
+def yearly_coverage(merged: List[Periodo]) -> Dict[str, int]:
+    """Dias cobertos em cada ano civil"""
+    coverage: Dict[str, int] = {}
+    for inicio, fim in merged:
+        year = date.fromordinal(inicio).year
+        last_year = date.fromordinal(fim).year
+        while year <= last_year:
+            start = max(inicio, date(year, 1, 1).toordinal())
+            end = min(fim, date(year, 12, 31).toordinal())
+            coverage[str(year)] = coverage.get(str(year), 0) + end - start + 1
+            year += 1
+    return coverage
+
+def _format(ordinal: int) -> str:
+    return date.fromordinal(ordinal).strftime('%d/%m/%Y')
+
+def calcular_tempo_contribuicao(vinculos: Iterable[Dict[str, Any]],
+                                data_referencia: Optional[date] = None) -> Dict[str, Any]:
+    """Calcula tempo total, períodos unificados, lacunas e cobertura anual dos vínculos"""
+    data_referencia = data_referencia or date.today()
+    merged = merge_periods(normalize_periods(vinculos, data_referencia))
+
+    total_dias = sum(fim - inicio + 1 for inicio, fim in merged)
+    lacunas = []
+    for (_, fim_anterior), (inicio, _) in zip(merged, merged[1:]):
+        lacunas.append({
+            'inicio': _format(fim_anterior + 1),
+            'fim': _format(inicio - 1),
+            'dias': inicio - fim_anterior - 1,
+        })
+
+    return {
+        'total_dias': total_dias,
+        'total': split_days(total_dias),
+        'periodos': [{'inicio': _format(inicio), 'fim': _format(fim), 'dias': fim - inicio + 1} for inicio, fim in merged],
+        'lacunas': lacunas,
+        'cobertura_anual': yearly_coverage(merged),
+        'data_referencia': data_referencia.strftime('%d/%m/%Y'),
+    }
+
+def calcular_lote(clientes: Dict[str, Iterable[Dict[str, Any]]],
+                  data_referencia: Optional[date] = None) -> Dict[str, Dict[str, Any]]:
+    """Calcula o tempo de contribuição de vários clientes de uma vez ({cliente: vínculos})"""
+    data_referencia = data_referencia or date.today()
+    return {
+        cliente: calcular_tempo_contribuicao(vinculos, data_referencia)
+        for cliente, vinculos in clientes.items()
+    }
+
+def main():
+    """Função principal: lê {cliente: vínculos} em JSON e imprime o tempo de cada cliente"""
+    parser = argparse.ArgumentParser(description='Tempo de contribuição a partir de vínculos do CNIS')
+    parser.add_argument('input', nargs='?', help='Arquivo JSON {cliente: [vínculos]} (padrão: stdin)')
+    parser.add_argument('--data-referencia', help='Data DD/MM/AAAA usada como fim dos vínculos em aberto')
+    args = parser.parse_args()
+
+    data_referencia = parse_data(args.data_referencia) if args.data_referencia else None
+    if args.input:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            clientes = json.load(f)
+    else:
+        clientes = json.load(sys.stdin)
+
+    print(json.dumps(calcular_lote(clientes, data_referencia), ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
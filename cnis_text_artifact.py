@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Artefato de texto extraído do CNIS
+Grava ao lado do documento o texto normalizado comprimido (gzip + JSON) com os
+deslocamentos de páginas e linhas, indexado pelo SHA-256 do PDF, para que o PHP
+e reprocessamentos leiam o texto sem abrir o PDF novamente
+"""
+
+import os
+import gzip
+import json
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+
+from cnis_cache import file_digest
+from cnis_pdf_engines import NORMALIZATION_VERSION, normalize_page_text
+
+logger = logging.getLogger(__name__)
+
+# Sufixo acrescentado ao caminho do documento (documento.pdf.cnistext.gz)
+ARTIFACT_SUFFIX = '.cnistext.gz'
+# Altere sempre que o layout do artefato mudar (a normalização tem versão própria)
+ARTIFACT_FORMAT = 1
+
+def text_artifacts_enabled() -> bool:
+    """Artefatos ligados por $CNIS_TEXT_ARTIFACT (1/true/yes)"""
+    return os.getenv('CNIS_TEXT_ARTIFACT', '').lower() in ('1', 'true', 'yes', 'on')
+
+def artifact_path(pdf_path: str) -> str:
+    """Caminho do artefato de texto de um documento"""
+    return f"{pdf_path}{ARTIFACT_SUFFIX}"
+
+def is_text_input(path: str) -> bool:
+    """Entrada já extraída: artefato ou arquivo .txt (páginas separadas por \\f)"""
+    return path.endswith(ARTIFACT_SUFFIX) or path.lower().endswith('.txt')
+
+def _add_line_offsets(page: str, position: int, line_offsets: List[int]) -> int:
+    """Acrescenta o início de cada linha da página e retorna a posição do fim da página"""
+    for line in page.split('\n'):
+        line_offsets.append(position)
+        position += len(line.encode('utf-8')) + 1
+    return position
+
+class TextArtifact:
+    """Texto normalizado de um documento com acesso direto a páginas e linhas
+
+    O texto é a concatenação das páginas, cada uma terminada por \\n. Os
+    deslocamentos são em bytes do texto codificado em UTF-8 (o que o substr do
+    PHP espera): page_offsets tem uma entrada a mais que o número de páginas e
+    line_offsets marca o início de cada linha.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        """Inicializa a partir do conteúdo JSON do artefato"""
+        self.sha256 = data.get('sha256')
+        self.engine = data.get('engine')
+        self.normalization = data.get('normalization')
+        self.page_offsets: List[int] = data['page_offsets']
+        self.line_offsets: List[int] = data['line_offsets']
+        self._data = data['text'].encode('utf-8')
+
+    @classmethod
+    def from_pages(cls, pages: List[str], sha256: Optional[str] = None,
+                   engine: Optional[str] = None) -> 'TextArtifact':
+        """Monta o artefato a partir das páginas já normalizadas"""
+        page_offsets = [0]
+        line_offsets = []
+        for page in pages:
+            page_offsets.append(_add_line_offsets(page, page_offsets[-1], line_offsets))
+        return cls({
+            'sha256': sha256,
+            'engine': engine,
+            'normalization': NORMALIZATION_VERSION,
+            'page_offsets': page_offsets,
+            'line_offsets': line_offsets,
+            'text': ''.join(page + '\n' for page in pages),
+        })
+
+    @classmethod
+    def load(cls, path: str) -> 'TextArtifact':
+        """Lê um artefato; ValueError se o formato não for o atual"""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('format') != ARTIFACT_FORMAT:
+            raise ValueError(f"Formato de artefato não suportado: {data.get('format')}")
+        return cls(data)
+
+    @classmethod
+    def for_pdf(cls, pdf_path: str, digest: Optional[str] = None,
+                engine: Optional[str] = None) -> Optional['TextArtifact']:
+        """Artefato do documento, se existir e pertencer ao mesmo arquivo (mesmo hash)
+
+        Com engine, só aceita o texto extraído por esse motor com a normalização atual.
+        """
+        path = artifact_path(pdf_path)
+        if not os.path.exists(path):
+            return None
+        try:
+            artifact = cls.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Artefato de texto ilegível, ignorado: {path} ({e})")
+            return None
+        if artifact.sha256 != (digest or file_digest(pdf_path)):
+            logger.info(f"Artefato de texto desatualizado, ignorado: {path}")
+            return None
+        if engine and (artifact.engine, artifact.normalization) != (engine, NORMALIZATION_VERSION):
+            logger.info(f"Artefato de texto de outro motor ou normalização ({artifact.engine}), ignorado: {path}")
+            return None
+        return artifact
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_offsets) - 1
+
+    @property
+    def text(self) -> str:
+        return self._data.decode('utf-8')
+
+    def page(self, index: int) -> str:
+        """Texto da página (sem o \\n final)"""
+        return self._data[self.page_offsets[index]:self.page_offsets[index + 1] - 1].decode('utf-8')
+
+    def iter_pages(self, max_pages: Optional[int] = None) -> Iterator[str]:
+        """Gera as páginas em ordem, como os motores de PDF"""
+        count = min(self.page_count, max_pages) if max_pages else self.page_count
+        for index in range(count):
+            yield self.page(index)
+
+    def line(self, index: int) -> str:
+        """Texto da linha pelo índice global"""
+        end = self.line_offsets[index + 1] if index + 1 < len(self.line_offsets) else len(self._data)
+        return self._data[self.line_offsets[index]:end - 1].decode('utf-8')
+
+    def save(self, path: str) -> None:
+        """Grava o artefato de forma atômica (arquivo temporário + rename)"""
+        payload = {
+            'format': ARTIFACT_FORMAT,
+            'sha256': self.sha256,
+            'engine': self.engine,
+            'normalization': self.normalization,
+            'pages': self.page_count,
+            'page_offsets': self.page_offsets,
+            'line_offsets': self.line_offsets,
+            'text': self.text,
+        }
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with gzip.open(temporary, 'wt', encoding='utf-8', compresslevel=6) as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+
+class TextArtifactWriter:
+    """Grava o artefato página a página, sem reter o texto do documento em memória
+
+    O JSON é escrito em fluxo no gzip: o cabeçalho, o texto (cada página escapada
+    ao chegar) e, em commit(), os deslocamentos acumulados. O arquivo só substitui
+    o artefato em commit(); discard() descarta o temporário.
+    """
+
+    def __init__(self, path: str, sha256: Optional[str] = None, engine: Optional[str] = None):
+        """Abre o arquivo temporário e escreve o cabeçalho do artefato"""
+        self.path = path
+        self.page_offsets: List[int] = [0]
+        self.line_offsets: List[int] = []
+        self._temporary = f"{path}.{os.getpid()}.tmp"
+        self._file = gzip.open(self._temporary, 'wt', encoding='utf-8', compresslevel=6)
+        header = {'format': ARTIFACT_FORMAT, 'sha256': sha256, 'engine': engine,
+                  'normalization': NORMALIZATION_VERSION}
+        # Objeto aberto: o texto e os deslocamentos são acrescentados depois
+        self._file.write(json.dumps(header, ensure_ascii=False, separators=(',', ':'))[:-1] + ',"text":"')
+
+    def add_page(self, page: str) -> None:
+        """Acrescenta uma página já normalizada"""
+        self.page_offsets.append(_add_line_offsets(page, self.page_offsets[-1], self.line_offsets))
+        self._file.write(json.dumps(page + '\n', ensure_ascii=False)[1:-1])
+
+    def commit(self) -> None:
+        """Fecha o JSON e substitui o artefato de forma atômica (rename)"""
+        trailer = {'pages': len(self.page_offsets) - 1, 'page_offsets': self.page_offsets,
+                   'line_offsets': self.line_offsets}
+        try:
+            self._file.write('",' + json.dumps(trailer, separators=(',', ':'))[1:])
+            self._file.close()
+            os.replace(self._temporary, self.path)
+        finally:
+            self.discard()
+
+    def discard(self) -> None:
+        """Abandona o artefato em andamento (sem efeito depois de commit)"""
+        self._file.close()
+        if os.path.exists(self._temporary):
+            os.unlink(self._temporary)
+
+def iter_text_file_pages(path: str, max_pages: Optional[int] = None) -> Iterator[str]:
+    """Gera as páginas de um texto já extraído (artefato ou .txt com \\f entre páginas)"""
+    if path.endswith(ARTIFACT_SUFFIX):
+        yield from TextArtifact.load(path).iter_pages(max_pages)
+        return
+
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        pages = f.read().split('\f')
+    # pdftotext termina o documento com \f: a última "página" fica vazia
+    if len(pages) > 1 and not pages[-1].strip():
+        pages.pop()
+    for page in pages[:max_pages] if max_pages else pages:
+        yield normalize_page_text(page)
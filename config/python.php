@@ -25,6 +25,93 @@ return [
         'cnis_extractor' => base_path('python_cnis_extractor.py'),
     ],
 
+    /*
+    |--------------------------------------------------------------------------
+    | Servidor de Extração CNIS
+    |--------------------------------------------------------------------------
+    |
+    | Socket Unix do extrator em modo servidor
+    | (simple_cnis_extractor.py --serve --socket ...). Quando definido e
+    | disponível, evita iniciar um processo Python a cada documento.
+    |
+    */
+
+    'cnis_daemon' => [
+        'socket' => env('CNIS_EXTRACTOR_SOCKET'),
+        'timeout' => env('CNIS_EXTRACTOR_SOCKET_TIMEOUT', 120),
+    ],
+
+    /*
+    |--------------------------------------------------------------------------
+    | Cache de Resultados CNIS
+    |--------------------------------------------------------------------------
+    |
+    | Banco SQLite onde o extrator guarda resultados indexados pelo hash do
+    | PDF. Reenvios do mesmo documento não passam novamente pela extração.
+    |
+    */
+
+    'cnis_cache' => env('CNIS_CACHE_PATH'),
+
+    /*
+    |--------------------------------------------------------------------------
+    | Métricas da Extração CNIS
+    |--------------------------------------------------------------------------
+    |
+    | Quando ativado, o extrator inclui no resultado o tempo de cada etapa,
+    | contagens (páginas, linhas, seções) e o pico de memória, que são
+    | registrados no log junto com o processamento.
+    |
+    */
+
+    'cnis_metrics' => env('CNIS_METRICS', false),
+
+    /*
+    |--------------------------------------------------------------------------
+    | Artefato de Texto do CNIS
+    |--------------------------------------------------------------------------
+    |
+    | O extrator grava ao lado do PDF o texto extraído (documento.pdf.cnistext.gz),
+    | indexado pelo hash do arquivo. Os métodos de fallback em PHP e os
+    | reprocessamentos leem esse texto em vez de interpretar o PDF de novo. O
+    | servidor de extração usa a variável CNIS_TEXT_ARTIFACT do próprio ambiente.
+    |
+    */
+
+    'cnis_text_artifact' => env('CNIS_TEXT_ARTIFACT', true),
+
+    /*
+    |--------------------------------------------------------------------------
+    | Motor de PDF do CNIS
+    |--------------------------------------------------------------------------
+    |
+    | Biblioteca usada para ler o texto do PDF: pypdfium2 (mais rápida), pymupdf,
+    | pypdf2 ou pdfplumber. Vazio = perfil gravado por
+    | simple_cnis_extractor.py --benchmark-engines amostra.pdf ou a ordem
+    | padrão. Se o motor pedido não estiver instalado, o extrator usa o
+    | próximo disponível. O servidor de extração usa a variável
+    | CNIS_PDF_ENGINE do próprio ambiente.
+    |
+    */
+
+    'cnis_pdf_engine' => env('CNIS_PDF_ENGINE'),
+
+    /*
+    |--------------------------------------------------------------------------
+    | Orçamento por Documento do CNIS
+    |--------------------------------------------------------------------------
+    |
+    | Limites de tempo (segundos) e de páginas por documento. Ao atingir um
+    | deles o extrator devolve o que já leu marcado como parcial, em vez de
+    | prender o worker num arquivo enorme ou malformado. Vazio = sem limite.
+    |
+    */
+
+    'cnis_budget' => [
+        'time' => env('CNIS_TIME_BUDGET'),
+        'pages' => env('CNIS_PAGE_BUDGET'),
+    ],
+
     /*
     |--------------------------------------------------------------------------
     | Configurações de Execução
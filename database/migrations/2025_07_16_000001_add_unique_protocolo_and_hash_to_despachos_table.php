@@ -0,0 +1,53 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\DB;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    /**
+     * Run the migrations.
+     */
+    public function up(): void
+    {
+        Schema::table('despachos', function (Blueprint $table) {
+            // Hash SHA-256 do conteúdo: despachos inalterados não são regravados
+            $table->char('conteudo_hash', 64)->nullable()->after('conteudo');
+        });
+
+        // Mantém apenas o despacho mais recente de cada protocolo de cada empresa
+        // antes do índice único (despachos de empresas diferentes não se misturam)
+        DB::statement('
+            DELETE d1 FROM despachos d1
+            JOIN despachos d2 ON d1.id_empresa = d2.id_empresa AND d1.protocolo = d2.protocolo
+                AND (d1.data_email < d2.data_email OR (d1.data_email = d2.data_email AND d1.id < d2.id))
+        ');
+
+        DB::statement('UPDATE despachos SET conteudo_hash = SHA2(conteudo, 256)');
+
+        Schema::table('despachos', function (Blueprint $table) {
+            $table->dropIndex(['protocolo']);
+            $table->unique(['id_empresa', 'protocolo']);
+            // email_id (protocolo + data) se repete quando duas empresas recebem o mesmo
+            // email; único só dentro da empresa, senão o upsert casaria a linha da outra
+            $table->dropUnique(['email_id']);
+            $table->unique(['id_empresa', 'email_id']);
+        });
+    }
+
+    /**
+     * Reverse the migrations.
+     */
+    public function down(): void
+    {
+        Schema::table('despachos', function (Blueprint $table) {
+            $table->dropUnique(['id_empresa', 'email_id']);
+            $table->unique('email_id');
+            $table->dropUnique(['id_empresa', 'protocolo']);
+            $table->index('protocolo');
+            $table->dropColumn('conteudo_hash');
+        });
+    }
+};
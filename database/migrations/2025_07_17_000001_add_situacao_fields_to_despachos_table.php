@@ -0,0 +1,36 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    /**
+     * Run the migrations.
+     */
+    public function up(): void
+    {
+        Schema::table('despachos', function (Blueprint $table) {
+            // Campos extraídos do email pelo scripts/process_inss_emails.py
+            $table->date('data_protocolo')->nullable()->after('servico');
+            $table->string('status_atual')->nullable()->after('data_protocolo');
+            // exigencia, deferido, indeferido ou agendamento
+            $table->string('classificacao', 20)->nullable()->after('status_atual');
+            $table->date('prazo')->nullable()->after('classificacao');
+
+            $table->index(['classificacao', 'prazo']);
+        });
+    }
+
+    /**
+     * Reverse the migrations.
+     */
+    public function down(): void
+    {
+        Schema::table('despachos', function (Blueprint $table) {
+            $table->dropIndex(['classificacao', 'prazo']);
+            $table->dropColumn(['data_protocolo', 'status_atual', 'classificacao', 'prazo']);
+        });
+    }
+};
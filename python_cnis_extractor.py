@@ -4,6 +4,7 @@ Extrator de dados do CNIS usando Python
 Utiliza bibliotecas de IA e processamento de documentos para extrair informações estruturadas
 """
 
+import os
 import sys
 import json
 import re
@@ -12,6 +13,9 @@ from pathlib import Path
 from typing import Dict, List, Any, Optional
 import logging
 
+from cnis_pdf_engines import select_engine, extract_pages_with
+from cnis_remuneracoes import RemuneracaoSeries
+
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -39,18 +43,11 @@ class CNISExtractor:
             logger.warning("Tesseract não encontrado. Instale com: pip install pytesseract")
     
     def extract_text_from_pdf(self, pdf_path: str) -> str:
-        """Extrai texto do PDF usando PyMuPDF"""
+        """Extrai texto do PDF usando PyMuPDF ou, se ausente, o próximo motor disponível"""
         try:
-            import fitz
-            doc = fitz.open(pdf_path)
-            text = ""
-            
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text += page.get_text()
-            
-            doc.close()
-            return text
+            engine = select_engine(os.getenv('CNIS_PDF_ENGINE') or 'pymupdf')
+            pages = extract_pages_with(engine.name, pdf_path)
+            return ''.join(page + "\n" for page in pages if page)
         except Exception as e:
             logger.error(f"Erro ao extrair texto do PDF: {e}")
             return ""
@@ -179,7 +176,7 @@ class CNISExtractor:
             if agrupamento_match:
                 empregador = agrupamento_match.group(1).strip()
                 # Remove "Contribuinte Individual" e CNPJ do nome
-                empregador = re.sub(r'\tContribuinte Individual.*$', '', empregador)
+                empregador = re.sub(r'\s+Contribuinte Individual.*$', '', empregador)
                 empregador = re.sub(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}', '', empregador)
                 employment['empregador'] = empregador.strip()
                 employment['cnpj'] = ''
@@ -216,32 +213,23 @@ class CNISExtractor:
         if not employment['data_fim']:
             employment['data_fim'] = 'sem data fim'
         
-        # Extrai salário
-        employment['salario'] = self.extract_salary_from_section(section)
+        # Extrai a série de remunerações e o último salário
+        series = RemuneracaoSeries.from_lines(lines)
+        employment['salario'] = self.format_salary(series)
+        employment['remuneracoes'] = series.to_json()
         
         return employment
     
     def extract_salary_from_section(self, section: str) -> str:
         """Extrai salário de uma seção"""
-        lines = section.split('\n')
-        last_salary = ''
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Procura por remunerações no formato MM/YYYY VALOR
-            salary_match = re.search(r'\d{2}/\d{4}\s+([\d\.,]+)', line)
-            if salary_match:
-                salary = salary_match.group(1)
-                # Converte para formato numérico
-                salary = salary.replace('.', '').replace(',', '.')
-                try:
-                    salary_float = float(salary)
-                    last_salary = f"{salary_float:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-                except ValueError:
-                    pass
-        
-        return last_salary
+        return self.format_salary(RemuneracaoSeries.from_lines(section.split('\n')))
+    
+    def format_salary(self, series: RemuneracaoSeries) -> str:
+        """Formata a remuneração da última competência no padrão 1.234,56"""
+        last = series.last()
+        if not last:
+            return ''
+        return f"{last[1]:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
     
     def convert_month_year_to_full_date(self, month_year: str) -> str:
         """Converte MM/YYYY para o último dia do mês"""
@@ -11,8 +11,18 @@ import { Company } from '@/types';
 import { Head, Link, router, useForm } from '@inertiajs/react';
 import { ArrowLeft, Building2, Trash2 } from 'lucide-react';
 
+interface ImapSettings {
+    imap_host: string;
+    imap_port: number;
+    imap_username: string;
+    imap_mailbox: string;
+    imap_ssl: boolean;
+    imap_has_password: boolean;
+}
+
 interface Props {
     company: Company;
+    imap: ImapSettings;
 }
 
 interface CompanyFormData {
@@ -28,10 +38,16 @@ interface CompanyFormData {
     max_users: number;
     max_cases: number;
     is_active: boolean;
+    imap_host: string;
+    imap_port: number;
+    imap_username: string;
+    imap_password: string;
+    imap_mailbox: string;
+    imap_ssl: boolean;
     [key: string]: string | number | boolean;
 }
 
-export default function Edit({ company }: Props) {
+export default function Edit({ company, imap }: Props) {
     const { data, setData, put, processing, errors } = useForm<CompanyFormData>({
         name: company.name || '',
         email: company.email || '',
@@ -45,6 +61,12 @@ export default function Edit({ company }: Props) {
         max_users: company.max_users || 5,
         max_cases: company.max_cases || 100,
         is_active: company.is_active || false,
+        imap_host: imap.imap_host,
+        imap_port: imap.imap_port,
+        imap_username: imap.imap_username,
+        imap_password: '',
+        imap_mailbox: imap.imap_mailbox,
+        imap_ssl: imap.imap_ssl,
     });
 
     const handleSubmit = (e: React.FormEvent) => {
@@ -262,6 +284,82 @@ export default function Edit({ company }: Props) {
                         </CardContent>
                     </Card>
 
+                    <Card>
+                        <CardHeader>
+                            <CardTitle>E-mails do INSS</CardTitle>
+                            <CardDescription>
+                                Caixa IMAP que recebe os e-mails do Meu INSS; deixe o servidor em branco para desativar
+                            </CardDescription>
+                        </CardHeader>
+                        <CardContent className="space-y-4">
+                            <div className="grid grid-cols-1 gap-4 md:grid-cols-2">
+                                <div className="space-y-2">
+                                    <Label htmlFor="imap_host">Servidor IMAP</Label>
+                                    <Input
+                                        id="imap_host"
+                                        value={data.imap_host}
+                                        onChange={(e) => setData('imap_host', e.target.value)}
+                                        placeholder="imap.gmail.com"
+                                    />
+                                    <InputError message={errors.imap_host} />
+                                </div>
+
+                                <div className="space-y-2">
+                                    <Label htmlFor="imap_port">Porta</Label>
+                                    <Input
+                                        id="imap_port"
+                                        type="number"
+                                        min="1"
+                                        max="65535"
+                                        value={data.imap_port}
+                                        onChange={(e) => setData('imap_port', parseInt(e.target.value) || 993)}
+                                    />
+                                    <InputError message={errors.imap_port} />
+                                </div>
+
+                                <div className="space-y-2">
+                                    <Label htmlFor="imap_username">Usuário</Label>
+                                    <Input
+                                        id="imap_username"
+                                        value={data.imap_username}
+                                        onChange={(e) => setData('imap_username', e.target.value)}
+                                        placeholder="inss@empresa.com"
+                                    />
+                                    <InputError message={errors.imap_username} />
+                                </div>
+
+                                <div className="space-y-2">
+                                    <Label htmlFor="imap_password">Senha</Label>
+                                    <Input
+                                        id="imap_password"
+                                        type="password"
+                                        autoComplete="new-password"
+                                        value={data.imap_password}
+                                        onChange={(e) => setData('imap_password', e.target.value)}
+                                        placeholder={imap.imap_has_password ? 'Deixe em branco para manter a atual' : ''}
+                                    />
+                                    <InputError message={errors.imap_password} />
+                                </div>
+
+                                <div className="space-y-2">
+                                    <Label htmlFor="imap_mailbox">Pasta</Label>
+                                    <Input
+                                        id="imap_mailbox"
+                                        value={data.imap_mailbox}
+                                        onChange={(e) => setData('imap_mailbox', e.target.value)}
+                                        placeholder="INBOX"
+                                    />
+                                    <InputError message={errors.imap_mailbox} />
+                                </div>
+
+                                <div className="flex items-center space-x-2">
+                                    <Switch id="imap_ssl" checked={data.imap_ssl} onCheckedChange={(checked) => setData('imap_ssl', checked)} />
+                                    <Label htmlFor="imap_ssl">Conexão SSL</Label>
+                                </div>
+                            </div>
+                        </CardContent>
+                    </Card>
+
                     <div className="flex items-center gap-4">
                         <Button type="submit" disabled={processing}>
                             {processing ? 'Salvando...' : 'Salvar Alterações'}
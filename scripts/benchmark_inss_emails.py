@@ -0,0 +1,659 @@
+#!/usr/bin/env python3
+"""
+Benchmark e replay do processamento de emails do INSS
+Gera emails sintéticos no formato das notificações do INSS (multipart HTML/texto,
+tabelas aninhadas, blocos de despacho repetidos, charsets variados) ou reaproveita
+emails reais de um arquivo local, serve-os num servidor IMAP local e grava num
+SQLite (ou num MySQL de teste), medindo a latência de cada etapa
+"""
+
+import os
+import re
+import json
+import math
+import time
+import email
+import random
+import shutil
+import sys
+import sqlite3
+import argparse
+import platform
+import tempfile
+import threading
+import socketserver
+from datetime import date, datetime, timedelta, timezone
+from email import policy
+from email.message import EmailMessage
+from email.utils import format_datetime, make_msgid
+from html import escape
+from html.entities import codepoint2name
+import logging
+
+# O benchmark nunca usa o checkpoint de produção: o caminho é definido antes de
+# importar o script (os processos do pipeline herdam o mesmo diretório)
+if 'INSS_BENCHMARK_DIR' not in os.environ:
+    os.environ['INSS_BENCHMARK_DIR'] = tempfile.mkdtemp(prefix='inss_benchmark_')
+os.environ['INSS_SYNC_STATE'] = os.path.join(os.environ['INSS_BENCHMARK_DIR'], 'sync.json')
+
+import process_inss_emails as inss
+
+logger = logging.getLogger(__name__)
+
+# O script registra cada email em DEBUG/INFO; durante a medida só interessam erros
+logging.getLogger(inss.__name__).setLevel(logging.ERROR)
+
+# Etapas medidas email a email
+ETAPAS = ('get_email_content', 'extrair_protocolo', 'processar_email', 'salvar_email')
+
+CHARSETS = ('utf-8', 'iso-8859-1', 'windows-1252')
+CODIFICACOES = ('quoted-printable', 'base64', '8bit')
+
+_SERVICOS = (
+    'Aposentadoria por Idade Urbana', 'Aposentadoria por Tempo de Contribuição',
+    'Benefício Assistencial ao Idoso', 'Auxílio por Incapacidade Temporária',
+    'Pensão por Morte Urbana', 'Salário-Maternidade Urbano', 'Certidão de Tempo de Contribuição',
+)
+_UNIDADES = (
+    'APS São Paulo - Centro', 'APS Porto Alegre - Partenon', 'CEAB Reconhecimento de Direito da SRI',
+    'APS Curitiba - Boqueirão', 'CEAB Manutenção da SRIII', 'APS Florianópolis - Estreito',
+)
+_NOMES = ('MARIA', 'JOSÉ', 'ANTÔNIO', 'FRANCISCA', 'JOÃO', 'ANA', 'LUÍS', 'CONCEIÇÃO')
+_SOBRENOMES = ('SILVA', 'SANTOS', 'OLIVEIRA', 'SOUZA', 'PEREIRA', 'LIMA', 'CARVALHO', 'RIBEIRO')
+_DOCUMENTOS = (
+    'documento de identificação com foto', 'carteira de trabalho e previdência social',
+    'certidão de nascimento dos dependentes', 'PPP - Perfil Profissiográfico Previdenciário',
+    'comprovante de residência atualizado', 'laudo médico com CID e data de início da doença',
+)
+_EXTENSO = {10: 'dez', 15: 'quinze', 30: 'trinta', 45: 'quarenta e cinco'}
+
+# Despachos por situação: (status atual, parágrafos); a situação esperada é a chave
+_DESPACHOS = {
+    'exigencia': ('Em exigência', (
+        'Para dar continuidade à análise do seu pedido, apresente os seguintes documentos: {documentos}.',
+        'O cumprimento da exigência deve ser feito pelo Meu INSS no prazo de {dias} ({extenso}) dias, '
+        'contados do recebimento desta mensagem, sob pena de indeferimento do pedido.',
+    )),
+    'deferido': ('Concluída', (
+        'Informamos que o benefício solicitado foi concedido após a análise dos documentos apresentados.',
+        'A carta de concessão e o extrato de pagamento estão disponíveis no Meu INSS a partir de {data}.',
+    )),
+    'indeferido': ('Concluída', (
+        'Após a análise do pedido, o benefício foi indeferido por não ter sido comprovado o direito.',
+        'O prazo de {dias} ({extenso}) dias para recurso à Junta de Recursos conta a partir desta data.',
+    )),
+    'agendamento': ('Em análise', (
+        'Foi agendada avaliação presencial para a continuidade do seu pedido.',
+        'Compareça à unidade {unidade} no dia {data} às {hora}, portando documento de identificação com foto.',
+    )),
+}
+
+def _entidades(texto):
+    """Troca os caracteres não ASCII por entidades HTML nomeadas (&ccedil;, &atilde;...)"""
+    return ''.join(f'&{codepoint2name[ord(c)]};' if ord(c) > 127 and ord(c) in codepoint2name else c
+                   for c in texto)
+
+def _paragrafos_despacho(situacao, rng, data_email):
+    _, modelos = _DESPACHOS[situacao]
+    dias = rng.choice(sorted(_EXTENSO))
+    valores = {
+        'documentos': ', '.join(rng.sample(_DOCUMENTOS, rng.randint(1, 3))),
+        'dias': dias,
+        'extenso': _EXTENSO[dias],
+        'data': (data_email + timedelta(days=rng.randint(3, 40))).strftime('%d/%m/%Y'),
+        'hora': f"{rng.randint(8, 16):02d}:{rng.choice((0, 15, 30, 45)):02d}",
+        'unidade': rng.choice(_UNIDADES),
+    }
+    return [modelo.format(**valores) for modelo in modelos]
+
+def _blocos_despacho(paragrafos, blocos, rng):
+    """Repete o despacho `blocos` vezes, com pequenas variações (reenvios e históricos)"""
+    resultado = list(paragrafos)
+    for _ in range(blocos - 1):
+        for paragrafo in paragrafos:
+            variacao = rng.random()
+            if variacao < 0.4:
+                resultado.append(paragrafo)
+            elif variacao < 0.7:
+                resultado.append(paragrafo.replace('.', ' (mensagem reenviada).', 1))
+            else:
+                resultado.append(re.sub(r'\d{2}/\d{2}/\d{4}', (date(2025, 7, 1) + timedelta(days=rng.randint(0, 90)))
+                                        .strftime('%d/%m/%Y'), paragrafo))
+    return resultado
+
+def _html_email(metadados, saudacao, despacho, charset, entidades):
+    converter = _entidades if entidades else (lambda texto: texto)
+    dados = ''.join(f'<tr><td style="padding: 2px"><b>{escape(rotulo)}</b> {escape(valor)}</td></tr>'
+                    for rotulo, valor in metadados)
+    paragrafos = ''.join(f'<p>{escape(paragrafo)}</p>' for paragrafo in despacho)
+    html = (
+        f'<html><head><meta http-equiv="Content-Type" content="text/html; charset={charset}">'
+        '<title>Meu INSS</title><style>td { font-family: Arial, sans-serif; font-size: 13px; }</style></head>'
+        '<body><table width="100%" cellpadding="0" cellspacing="0"><tr><td align="center">'
+        '<table width="600" cellpadding="8" style="border: 1px solid #ccc">'
+        '<tr><td><h2>INSS - INSTITUTO NACIONAL DO SEGURO SOCIAL</h2></td></tr>'
+        '<tr><td><h3>Requerimento</h3></td></tr>'
+        f'<tr><td><table class="dados" width="100%">{dados}</table></td></tr>'
+        f'<tr><td><div><span>{escape(saudacao)}</span></div>{paragrafos}</td></tr>'
+        '<tr><td><table width="100%"><tr><td><small>Esta é uma mensagem automática, '
+        'por favor não responda.</small></td></tr></table></td></tr>'
+        '</table></td></tr></table></body></html>'
+    )
+    return converter(html)
+
+def gerar_email_inss(indice, rng, blocos_max=3):
+    """Gera um email de notificação do INSS; retorna (conteúdo bruto, valores esperados)
+
+    O email é multipart/alternative (texto e HTML com tabelas aninhadas), às vezes
+    com um anexo PDF, num dos CHARSETS e das CODIFICACOES. O despacho pode vir
+    repetido até `blocos_max` vezes, com variações.
+    """
+    protocolo = str(rng.randint(10 ** 8, 2 * 10 ** 9))
+    situacao = rng.choice(sorted(_DESPACHOS))
+    status, _ = _DESPACHOS[situacao]
+    servico = rng.choice(_SERVICOS)
+    data_email = datetime(2025, 7, 1, 8, tzinfo=timezone(timedelta(hours=-3))) + timedelta(minutes=37 * indice)
+    data_protocolo = (data_email - timedelta(days=rng.randint(5, 200))).strftime('%d/%m/%Y')
+    nome = f"{rng.choice(_NOMES)} {rng.choice(_SOBRENOMES)} {rng.choice(_SOBRENOMES)}"
+
+    metadados = [
+        ('Protocolo:', protocolo),
+        ('Serviço:', servico),
+        ('Data do Protocolo:', data_protocolo),
+        ('Unidade responsável:', rng.choice(_UNIDADES)),
+        ('Status atual:', status),
+    ]
+    saudacao = f"Prezado(a) {nome},"
+    despacho = _blocos_despacho(_paragrafos_despacho(situacao, rng, data_email), rng.randint(1, blocos_max), rng)
+    texto = '\n'.join(['INSS - INSTITUTO NACIONAL DO SEGURO SOCIAL', 'Requerimento']
+                      + [f"{rotulo} {valor}" for rotulo, valor in metadados]
+                      + [saudacao, ''] + despacho
+                      + ['', 'Esta é uma mensagem automática, por favor não responda.'])
+
+    charset = rng.choice(CHARSETS)
+    msg = EmailMessage()
+    msg['From'] = f'INSS <{inss.REMETENTE_INSS}>'
+    msg['To'] = 'intimacoes@previdia.com'
+    msg['Subject'] = rng.choice((
+        f"Requerimento {protocolo} - {servico}",
+        f"Meu INSS: atualização do requerimento nº {protocolo}",
+        'Meu INSS: houve uma atualização no seu requerimento',
+    ))
+    msg['Date'] = format_datetime(data_email)
+    msg['Message-ID'] = make_msgid(idstring=str(indice), domain='inss.gov.br')
+    msg.set_content(texto, charset=charset, cte=rng.choice(CODIFICACOES))
+    msg.add_alternative(_html_email(metadados, saudacao, despacho, charset, rng.random() < 0.3),
+                        subtype='html', charset=charset, cte=rng.choice(CODIFICACOES))
+    if rng.random() < 0.15:
+        msg.add_attachment(b'%PDF-1.4\n% comprovante\n%%EOF\n', maintype='application', subtype='pdf',
+                           filename=f'comprovante_{protocolo}.pdf')
+    return msg.as_bytes(policy=policy.SMTP), {'protocolo': protocolo, 'classificacao': situacao}
+
+def gerar_emails(quantidade, seed=0, blocos_max=3):
+    """Gera `quantidade` emails reproduzíveis pela semente; retorna [(conteúdo, esperado)]"""
+    rng = random.Random(seed)
+    return [gerar_email_inss(indice, rng, blocos_max) for indice in range(quantidade)]
+
+def ler_emails_replay(caminhos):
+    """Emails reais do INSS de arquivos locais (mbox, Maildir, .eml), sem valores esperados"""
+    return [(email_body, None) for caminho in caminhos
+            for email_body in inss.iterar_arquivo_local(caminho) if inss.remetente_inss(email_body)]
+
+class _SessaoIMAP(socketserver.StreamRequestHandler):
+    """Uma conexão com o servidor IMAP local"""
+
+    def _enviar(self, dados):
+        self.wfile.write(dados)
+        self.server.contar_bytes(len(dados))
+
+    def handle(self):
+        self._enviar(b'* OK [CAPABILITY IMAP4rev1] Servidor IMAP local pronto\r\n')
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                return
+            partes = linha.decode('utf-8', 'replace').rstrip('\r\n').split(' ', 2)
+            if len(partes) < 2:
+                continue
+            tag, comando = partes[0], partes[1].upper()
+            argumentos = partes[2] if len(partes) > 2 else ''
+            if comando == 'UID':
+                subcomando, _, argumentos = argumentos.partition(' ')
+                comando = f"UID {subcomando.upper()}"
+
+            self.server.registrar(comando)
+            if self.server.latencia:
+                time.sleep(self.server.latencia)
+            resposta = self.server.responder(comando, argumentos)
+            if resposta is None:
+                self._enviar(f"{tag} BAD comando nao suportado\r\n".encode())
+                continue
+            self._enviar(resposta + f"{tag} OK {comando} concluido\r\n".encode())
+            if comando == 'LOGOUT':
+                return
+
+class ServidorIMAPLocal(socketserver.ThreadingTCPServer):
+    """Servidor IMAP mínimo em 127.0.0.1 que serve uma lista de emails como INBOX
+
+    Implementa só o que sincronizar_caixa usa (LOGIN, SELECT, STATUS, UID SEARCH e
+    UID FETCH de cabeçalhos e RFC822), conta os comandos, os bytes e os emails completos enviados e soma
+    `latencia` segundos a cada resposta para simular a rede.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, mensagens, latencia=0.0, uidvalidity=1):
+        super().__init__(('127.0.0.1', 0), _SessaoIMAP)
+        self.mensagens = {uid: email_body for uid, email_body in enumerate(mensagens, 1)}
+        self.latencia = latencia
+        self.uidvalidity = uidvalidity
+        self._lock = threading.Lock()
+        self.zerar_contadores()
+        threading.Thread(target=self.serve_forever, name='imap-local', daemon=True).start()
+
+    def conta(self, id_empresa=None):
+        """Conta no formato de CONTA_PADRAO apontando para este servidor"""
+        return dict(inss.CONTA_PADRAO, id_empresa=id_empresa, servidor='127.0.0.1', porta=self.server_address[1],
+                    ssl=False, usuario='benchmark', senha='benchmark', caixa='INBOX')
+
+    def zerar_contadores(self):
+        with self._lock:
+            self.comandos = {}
+            self.bytes_enviados = 0
+            self.emails_baixados = 0
+
+    def registrar(self, comando):
+        with self._lock:
+            self.comandos[comando] = self.comandos.get(comando, 0) + 1
+
+    def contar_bytes(self, quantidade):
+        with self._lock:
+            self.bytes_enviados += quantidade
+
+    def contar_emails_baixados(self, quantidade):
+        with self._lock:
+            self.emails_baixados += quantidade
+
+    def _conjunto_uids(self, conjunto):
+        maior = max(self.mensagens, default=0)
+        uids = set()
+        for faixa in conjunto.split(','):
+            inicio, _, fim = faixa.partition(':')
+            inicio = maior if inicio == '*' else int(inicio)
+            fim = inicio if not fim else maior if fim == '*' else int(fim)
+            uids.update(uid for uid in range(min(inicio, fim), max(inicio, fim) + 1) if uid in self.mensagens)
+        return sorted(uids)
+
+    def responder(self, comando, argumentos):
+        """Respostas não marcadas do comando (bytes) ou None se não suportado"""
+        if comando in ('CAPABILITY',):
+            return b'* CAPABILITY IMAP4rev1\r\n'
+        if comando in ('LOGIN', 'NOOP', 'CLOSE'):
+            return b''
+        if comando == 'LOGOUT':
+            return b'* BYE Servidor IMAP local encerrando\r\n'
+        if comando in ('SELECT', 'EXAMINE'):
+            return (f"* {len(self.mensagens)} EXISTS\r\n* 0 RECENT\r\n"
+                    f"* OK [UIDVALIDITY {self.uidvalidity}] UIDs validos\r\n"
+                    f"* OK [UIDNEXT {max(self.mensagens, default=0) + 1}] Proximo UID\r\n").encode()
+        if comando == 'STATUS':
+            return f"* STATUS INBOX (UIDVALIDITY {self.uidvalidity})\r\n".encode()
+        if comando == 'UID SEARCH':
+            uids = sorted(self.mensagens)
+            match = re.search(r'UID (\d+):\*', argumentos)
+            if match:
+                # Como num servidor real, "N:*" inclui a última mensagem mesmo com UID menor que N
+                uids = [uid for uid in uids if uid >= int(match.group(1))] or uids[-1:]
+            return ('* SEARCH ' + ' '.join(map(str, uids))).rstrip().encode() + b'\r\n'
+        if comando == 'UID FETCH':
+            conjunto, _, itens = argumentos.partition(' ')
+            campos = re.search(r'HEADER\.FIELDS \(([^)]*)\)', itens, re.IGNORECASE)
+            resposta = []
+            uids = self._conjunto_uids(conjunto)
+            if not campos:
+                self.contar_emails_baixados(len(uids))
+            for uid in uids:
+                if campos:
+                    conteudo = _campos_cabecalho(self.mensagens[uid], campos.group(1).upper().split())
+                    chave = f"BODY[HEADER.FIELDS ({campos.group(1)})]"
+                else:
+                    conteudo = self.mensagens[uid]
+                    chave = 'RFC822'
+                resposta.append(f"* {uid} FETCH (UID {uid} {chave} {{{len(conteudo)}}}\r\n".encode()
+                                + conteudo + b')\r\n')
+            return b''.join(resposta)
+        return None
+
+def protocolo_do_assunto(email_body):
+    """Protocolo que o pré-filtro de cabeçalhos do script encontra no assunto (None se não houver)"""
+    cabecalho = email.message_from_bytes(_campos_cabecalho(email_body, ['SUBJECT']))
+    return inss.extrair_protocolo(inss.extrair_assunto(cabecalho))
+
+def _campos_cabecalho(email_body, campos):
+    """Linhas de cabeçalho (com continuações) dos campos pedidos, como num BODY[HEADER.FIELDS]"""
+    cabecalho = re.split(rb'\r?\n\r?\n', email_body, 1)[0]
+    campos = {campo.encode() for campo in campos}
+    linhas = []
+    incluir = False
+    for linha in re.split(rb'\r?\n', cabecalho):
+        if linha[:1] not in (b' ', b'\t'):
+            incluir = linha.split(b':', 1)[0].strip().upper() in campos
+        if incluir:
+            linhas.append(linha)
+    return b'\r\n'.join(linhas) + b'\r\n\r\n'
+
+# Tabela despachos equivalente à das migrations, para o SQLite
+SQL_CRIAR_DESPACHOS = """CREATE TABLE IF NOT EXISTS despachos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    protocolo VARCHAR(255) NOT NULL,
+    servico VARCHAR(255),
+    data_protocolo DATE,
+    status_atual VARCHAR(255),
+    classificacao VARCHAR(20),
+    prazo DATE,
+    conteudo TEXT NOT NULL,
+    conteudo_hash CHAR(64),
+    data_email DATETIME NOT NULL,
+    email_id VARCHAR(255) NOT NULL,
+    id_empresa INTEGER NOT NULL,
+    created_at DATETIME,
+    updated_at DATETIME,
+    UNIQUE (id_empresa, protocolo),
+    UNIQUE (id_empresa, email_id)
+)"""
+
+# Colunas DATETIME (também dentro de agregações como MAX(data_email))
+_COLUNAS_DATETIME = ('data_email', 'created_at', 'updated_at')
+
+# O conector do MySQL grava datetimes sem fuso horário
+sqlite3.register_adapter(datetime, lambda valor: valor.replace(tzinfo=None).isoformat(' '))
+sqlite3.register_adapter(date, lambda valor: valor.isoformat())
+
+def traduzir_sql(sql):
+    """Traduz as consultas do script (MySQL) para o SQLite
+
+    Cobre o que é usado com a tabela despachos: marcadores %s, NOW(), <=>, IF() e o
+    upsert ON DUPLICATE KEY UPDATE (pela chave única id_empresa + protocolo, com VALUES(coluna)).
+    """
+    sql = sql.replace('%s', '?').replace('NOW()', 'CURRENT_TIMESTAMP').replace('<=>', 'IS')
+    sql = sql.replace('ON DUPLICATE KEY UPDATE', 'ON CONFLICT (id_empresa, protocolo) DO UPDATE SET')
+    sql = re.sub(r'\bVALUES\((\w+)\)', r'excluded.\1', sql)
+    return re.sub(r'\bIF\(', 'iif(', sql)
+
+class CursorSQLite:
+    """Cursor com a interface usada do mysql.connector; traduz o SQL e converte datetimes"""
+
+    _traducoes = {}
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def _sql(self, sql):
+        if sql not in self._traducoes:
+            self._traducoes[sql] = traduzir_sql(sql)
+        return self._traducoes[sql]
+
+    def execute(self, sql, parametros=()):
+        self._cursor.execute(self._sql(sql), parametros)
+
+    def executemany(self, sql, linhas):
+        self._cursor.executemany(self._sql(sql), linhas)
+
+    def _converter(self, linha):
+        nomes = [descricao[0] for descricao in self._cursor.description]
+        return tuple(
+            datetime.fromisoformat(valor) if isinstance(valor, str) and any(c in nome for c in _COLUNAS_DATETIME)
+            else valor
+            for nome, valor in zip(nomes, linha)
+        )
+
+    def fetchone(self):
+        linha = self._cursor.fetchone()
+        return self._converter(linha) if linha is not None else None
+
+    def fetchall(self):
+        return [self._converter(linha) for linha in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+class ConexaoSQLite:
+    """Conexão SQLite no lugar da conexão MySQL (cursor, commit, rollback, close)"""
+
+    def __init__(self, caminho):
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+
+    def cursor(self):
+        return CursorSQLite(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+def preparar_sqlite(caminho):
+    """Recria o banco SQLite vazio e retorna a função que abre conexões com ele"""
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    conn = sqlite3.connect(caminho)
+    try:
+        conn.execute(SQL_CRIAR_DESPACHOS)
+        conn.execute('CREATE INDEX despachos_classificacao_prazo_index ON despachos (classificacao, prazo)')
+        conn.commit()
+    finally:
+        conn.close()
+    return lambda: ConexaoSQLite(caminho)
+
+def percentis(amostras):
+    """Resumo das latências (segundos) em milissegundos: média, p50, p90, p99 e máximo"""
+    ordenadas = sorted(amostras)
+    if not ordenadas:
+        return {}
+
+    def percentil(fracao):
+        # Método do posto mais próximo
+        return ordenadas[max(0, math.ceil(fracao * len(ordenadas)) - 1)] * 1000
+
+    return {
+        'media_ms': round(sum(ordenadas) / len(ordenadas) * 1000, 4),
+        'p50_ms': round(percentil(0.50), 4),
+        'p90_ms': round(percentil(0.90), 4),
+        'p99_ms': round(percentil(0.99), 4),
+        'max_ms': round(ordenadas[-1] * 1000, 4),
+        'emails_por_segundo': round(len(ordenadas) / sum(ordenadas), 2) if sum(ordenadas) > 0 else None,
+    }
+
+def medir_etapas(emails, obter_conn, id_empresa=None):
+    """Mede cada etapa em cada email; retorna (percentis por etapa, conferência com o esperado)"""
+    tempos = {etapa: [] for etapa in ETAPAS}
+    conferencia = {'protocolos': 0, 'classificacoes': 0, 'emails_com_esperado': 0}
+    conn = obter_conn()
+    try:
+        for email_body, esperado in emails:
+            msg = email.message_from_bytes(email_body)
+
+            inicio = time.perf_counter()
+            corpo = inss.get_email_content(msg)
+            tempos['get_email_content'].append(time.perf_counter() - inicio)
+
+            # Mesma ordem de processar_email: assunto primeiro, depois o corpo
+            assunto = inss.extrair_assunto(msg)
+            inicio = time.perf_counter()
+            protocolo = (inss.extrair_protocolo(assunto) if assunto else None) or \
+                (inss.extrair_protocolo(corpo) if corpo else None)
+            tempos['extrair_protocolo'].append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            dados = inss.processar_email(msg)
+            tempos['processar_email'].append(time.perf_counter() - inicio)
+
+            dados['id_empresa'] = id_empresa
+            inicio = time.perf_counter()
+            inss.salvar_email(conn, dados)
+            tempos['salvar_email'].append(time.perf_counter() - inicio)
+
+            if esperado:
+                conferencia['emails_com_esperado'] += 1
+                conferencia['protocolos'] += protocolo == dados['protocolo'] == esperado['protocolo']
+                conferencia['classificacoes'] += dados['classificacao'] == esperado['classificacao']
+    finally:
+        conn.close()
+    return {etapa: percentis(amostras) for etapa, amostras in tempos.items()}, conferencia
+
+def medir_sincronizacao(servidor, obter_conn, workers=None, id_empresa=None):
+    """Sincroniza a caixa do servidor local do zero (sem checkpoint) com sincronizar_caixa"""
+    if os.path.exists(inss.SYNC_STATE_PATH):
+        os.remove(inss.SYNC_STATE_PATH)
+    servidor.zerar_contadores()
+    conta = servidor.conta(id_empresa)
+
+    inicio = time.perf_counter()
+    imap = inss.conectar_imap(conta)
+    try:
+        salvos = inss.sincronizar_caixa(imap, obter_conn, workers, conta)
+    finally:
+        imap.logout()
+    decorrido = time.perf_counter() - inicio
+
+    return {
+        'segundos': round(decorrido, 4),
+        'emails': len(servidor.mensagens),
+        'emails_por_segundo': round(len(servidor.mensagens) / decorrido, 2) if decorrido > 0 else None,
+        'salvos': salvos,
+        'emails_baixados': servidor.emails_baixados,
+        'comandos_imap': dict(servidor.comandos),
+        'bytes_imap': servidor.bytes_enviados,
+    }
+
+def conferir_prefiltro(sincronizacao, emails):
+    """Acrescenta à sincronização "ja_gravados" a taxa de acerto do pré-filtro de cabeçalhos
+
+    Com tudo gravado, só os emails sem protocolo no assunto (que o pré-filtro não
+    decide) podem ser baixados e regravados; acima disso o pré-filtro falhou.
+    """
+    sem_protocolo = sum(1 for email_body, _ in emails if not protocolo_do_assunto(email_body))
+    decidiveis = len(emails) - sem_protocolo
+    descartados = len(emails) - sincronizacao['emails_baixados']
+    sincronizacao['prefiltro'] = {
+        'sem_protocolo_no_assunto': sem_protocolo,
+        'descartados_pelo_cabecalho': descartados,
+        'taxa_acerto': round(descartados / decidiveis, 4) if decidiveis else None,
+        'ok': sincronizacao['emails_baixados'] <= sem_protocolo and sincronizacao['salvos'] <= sem_protocolo,
+    }
+    if not sincronizacao['prefiltro']['ok']:
+        logger.warning(f"Pré-filtro: {sincronizacao['emails_baixados']} emails baixados e "
+                       f"{sincronizacao['salvos']} regravados com os despachos já gravados; "
+                       f"esperado no máximo {sem_protocolo} (sem protocolo no assunto)")
+
+def run_benchmark(emails, banco='sqlite', workers=None, latencia=0.0, id_empresa=None, parametros=None):
+    """Mede as etapas email a email e a sincronização completa pelo servidor IMAP local
+
+    A sincronização roda duas vezes: com o banco vazio ("completa") e de novo sem
+    checkpoint, com os despachos já gravados ("ja_gravados"). Nela só os emails sem
+    protocolo no assunto devem ser baixados; "prefiltro" confere isso.
+    """
+    diretorio = os.environ['INSS_BENCHMARK_DIR']
+    if banco == 'mysql':
+        obter_conn = inss.conectar_banco
+    else:
+        obter_conn = preparar_sqlite(os.path.join(diretorio, 'etapas.sqlite'))
+
+    logger.info(f"Medindo etapas em {len(emails)} emails")
+    etapas, conferencia = medir_etapas(emails, obter_conn, id_empresa)
+
+    if banco != 'mysql':
+        obter_conn = preparar_sqlite(os.path.join(diretorio, 'sincronizacao.sqlite'))
+    servidor = ServidorIMAPLocal([email_body for email_body, _ in emails], latencia)
+    try:
+        logger.info(f"Sincronizando {len(emails)} emails pelo IMAP local (workers={workers or 1})")
+        sincronizacao = {'completa': medir_sincronizacao(servidor, obter_conn, workers, id_empresa)}
+        sincronizacao['ja_gravados'] = medir_sincronizacao(servidor, obter_conn, workers, id_empresa)
+        conferir_prefiltro(sincronizacao['ja_gravados'], emails)
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    return {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {'python': platform.python_version(), 'maquina': platform.machine(), 'banco': banco},
+        'parametros': dict(parametros or {}, emails=len(emails), workers=workers or 1,
+                           latencia_ms=round(latencia * 1000, 3), header_fetch_chunk=inss.HEADER_FETCH_CHUNK,
+                           body_fetch_chunk=inss.BODY_FETCH_CHUNK, db_batch_size=inss.DB_BATCH_SIZE),
+        'etapas': etapas,
+        'conferencia': conferencia,
+        'sincronizacao': sincronizacao,
+    }
+
+def main():
+    """Função principal: gera (ou lê) os emails, mede as etapas e a sincronização"""
+    parser = argparse.ArgumentParser(description='Benchmark do processamento de emails do INSS')
+    parser.add_argument('--emails', type=int, default=500, help='Quantidade de emails sintéticos')
+    parser.add_argument('--seed', type=int, default=0, help='Semente do gerador de emails')
+    parser.add_argument('--blocos', type=int, default=3, help='Máximo de repetições do despacho por email')
+    parser.add_argument('--replay', nargs='+', metavar='CAMINHO',
+                        help='Usa emails reais do INSS (mbox, Maildir, .eml) em vez dos sintéticos')
+    parser.add_argument('--salvar-emails', metavar='MBOX', help='Grava os emails usados num arquivo mbox')
+    parser.add_argument('--banco', choices=('sqlite', 'mysql'), default='sqlite',
+                        help='sqlite (temporário) ou mysql (DB_* do .env; use um banco de teste, '
+                             'os despachos são gravados)')
+    parser.add_argument('--id-empresa', type=int, default=1,
+                        help='id_empresa gravado nos despachos (parte da chave única; padrão: 1)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Processos do pipeline na sincronização (0 ou 1: sequencial)')
+    parser.add_argument('--latencia-ms', type=float, default=0.0,
+                        help='Latência simulada por comando no servidor IMAP local')
+    parser.add_argument('--header-chunk', type=int, default=inss.HEADER_FETCH_CHUNK,
+                        help='Cabeçalhos por UID FETCH')
+    parser.add_argument('--body-chunk', type=int, default=inss.BODY_FETCH_CHUNK, help='Emails por UID FETCH')
+    parser.add_argument('--db-batch', type=int, default=inss.DB_BATCH_SIZE, help='Despachos por transação')
+    parser.add_argument('--output', help='Arquivo de saída JSON do relatório (padrão: stdout)')
+    args = parser.parse_args()
+
+    logger.setLevel(logging.INFO)
+    # Lotes do IMAP e do banco lidos pelo script a cada sincronização
+    inss.HEADER_FETCH_CHUNK = args.header_chunk
+    inss.BODY_FETCH_CHUNK = args.body_chunk
+    inss.DB_BATCH_SIZE = args.db_batch
+
+    try:
+        if args.replay:
+            emails = ler_emails_replay(args.replay)
+            parametros = {'origem': args.replay}
+        else:
+            emails = gerar_emails(args.emails, args.seed, args.blocos)
+            parametros = {'origem': 'sintetico', 'seed': args.seed, 'blocos': args.blocos}
+        if not emails:
+            parser.error('Nenhum email do INSS encontrado')
+
+        if args.salvar_emails:
+            with open(args.salvar_emails, 'wb') as f:
+                for email_body, _ in emails:
+                    corpo = re.sub(rb'(?m)^(>*From )', rb'>\1', email_body.replace(b'\r\n', b'\n'))
+                    f.write(b'From benchmark@localhost Thu Jan  1 00:00:00 2025\n' + corpo.rstrip(b'\n') + b'\n\n')
+
+        relatorio = run_benchmark(emails, args.banco, args.workers, args.latencia_ms / 1000,
+                                  args.id_empresa, parametros)
+    finally:
+        shutil.rmtree(os.environ['INSS_BENCHMARK_DIR'], ignore_errors=True)
+
+    saida = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(saida)
+    else:
+        print(saida)
+    # Pré-filtro que deixou passar emails já gravados invalida a medida de "ja_gravados"
+    if not relatorio['sincronizacao']['ja_gravados']['prefiltro']['ok']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
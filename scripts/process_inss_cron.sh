@@ -8,8 +8,12 @@ if [ -d "$PROJECT_DIR/venv" ]; then
     source "$PROJECT_DIR/venv/bin/activate"
 fi
 
-# Instalar dependências Python necessárias
-pip install python-dotenv mysql-connector-python
+# Dependências (python-dotenv, mysql-connector-python) são instaladas na implantação,
+# não a cada execução. Para processar em segundos, use scripts/process_inss_daemon.sh
+
+# Empresa dos despachos da conta padrão (id_empresa é obrigatório em despachos);
+# padrão: empresa 2, o escritório da integração AdvBox (ajuste se a caixa for de outra)
+export INSS_ID_EMPRESA="${INSS_ID_EMPRESA:-2}"
 
 # Executar o script de processamento
 python "$PROJECT_DIR/scripts/process_inss_emails.py"
@@ -0,0 +1,22 @@
+#!/bin/bash
+
+# Processamento contínuo dos emails do INSS (IMAP IDLE)
+# Deve ser mantido em execução pelo supervisor/systemd no lugar do cron
+
+# Define o diretório do projeto
+PROJECT_DIR="/var/www/previdia.com.br"
+
+# Vai para o diretório do projeto
+cd $PROJECT_DIR
+
+# Ativar ambiente virtual Python (se existir)
+if [ -d "$PROJECT_DIR/venv" ]; then
+    source "$PROJECT_DIR/venv/bin/activate"
+fi
+
+# Empresa dos despachos da conta padrão (id_empresa é obrigatório em despachos);
+# padrão: empresa 2, o escritório da integração AdvBox (ajuste se a caixa for de outra)
+export INSS_ID_EMPRESA="${INSS_ID_EMPRESA:-2}"
+
+# Executa o script Python em modo contínuo
+exec python "$PROJECT_DIR/scripts/process_inss_emails.py" --daemon >> $PROJECT_DIR/storage/logs/inss_emails_daemon.log 2>&1
@@ -1,40 +1,93 @@
 import imaplib
 import email
+import mmap
 import re
+import json
+import time
+import hashlib
+import random
+import select
+import queue
+import signal
+import asyncio
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
 import mysql.connector
-from datetime import datetime
-from email.header import decode_header
+import mysql.connector.pooling
+from datetime import datetime, timedelta
+from email.header import decode_header, make_header
+from html.parser import HTMLParser
 import os
+import sys
 from dotenv import load_dotenv
 import logging
 from email.utils import parsedate_to_datetime
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('/var/www/previdia.com.br/storage/logs/inss_emails.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
-logger.info("Iniciando processamento de emails")
+
+# Log em storage/logs do projeto (este script fica em scripts/); $INSS_LOG_FILE substitui
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_FILE = os.getenv('INSS_LOG_FILE') or os.path.join(PROJECT_ROOT, 'storage', 'logs', 'inss_emails.log')
 
 # Configurações do email
 EMAIL_USER = "intimacoes@previdia.com"
 EMAIL_PASSWORD = "Nova365@"
 IMAP_SERVER = "imap.kinghost.net"
 IMAP_PORT = 993
+IMAP_MAILBOX = 'INBOX'
+# Conta usada fora do modo multiempresa; os despachos são gravados com a empresa de
+# $INSS_ID_EMPRESA, obrigatória nesse modo (despachos.id_empresa é NOT NULL)
+CONTA_PADRAO = {
+    'id_empresa': int(os.getenv('INSS_ID_EMPRESA')) if os.getenv('INSS_ID_EMPRESA') else None,
+    'servidor': IMAP_SERVER,
+    'porta': IMAP_PORT,
+    'ssl': True,
+    'usuario': EMAIL_USER,
+    'senha': EMAIL_PASSWORD,
+    'caixa': IMAP_MAILBOX,
+}
+
+# Sincronização incremental por UID
+REMETENTE_INSS = 'noreply@inss.gov.br'
+# Data inicial usada apenas na sincronização completa (primeira execução ou UIDVALIDITY alterado)
+SYNC_SINCE = os.getenv('INSS_SYNC_SINCE', '9-Jun-2025')
+# Arquivo com o checkpoint (UIDVALIDITY, último UID) de cada caixa, em storage/app do projeto
+SYNC_STATE_PATH = os.getenv('INSS_SYNC_STATE') or os.path.join(PROJECT_ROOT, 'storage', 'app', 'inss_emails_sync.json')
+
+# Emails por FETCH: cabeçalhos são pequenos, corpos completos vão em lotes menores
+HEADER_FETCH_CHUNK = 200
+BODY_FETCH_CHUNK = 25
+
+# Similaridade (Jaccard) a partir da qual uma linha de despacho é considerada repetida
+SIMILARIDADE_MINIMA = 0.8
 
 # Configurações do banco de dados
 DB_HOST = os.getenv('DB_HOST', '127.0.0.1')
 DB_USER = os.getenv('DB_USERNAME', 'root')
 DB_PASS = os.getenv('DB_PASSWORD', '')
 DB_NAME = os.getenv('DB_DATABASE', 'laravel')
+DB_POOL_SIZE = int(os.getenv('INSS_DB_POOL_SIZE', 2))
+# Despachos gravados por transação
+DB_BATCH_SIZE = int(os.getenv('INSS_DB_BATCH_SIZE', 100))
+
+# Modo contínuo (--daemon): IMAP IDLE com reconexão por backoff exponencial
+# O IDLE é renovado antes dos 29 minutos recomendados pela RFC 2177
+IDLE_TIMEOUT = int(os.getenv('INSS_IDLE_TIMEOUT', 25 * 60))
+# Intervalo de consulta quando o servidor não suporta IDLE
+POLL_INTERVAL = int(os.getenv('INSS_POLL_INTERVAL', 60))
+RECONNECT_MIN_DELAY = 5
+RECONNECT_MAX_DELAY = 300
+
+# Modo multiempresa (--empresas): contas IMAP lidas de companies.settings
+# Conexões IMAP simultâneas por servidor (provedores limitam sessões por IP)
+IMAP_CONEXOES_POR_HOST = int(os.getenv('INSS_IMAP_CONEXOES_POR_HOST', 4))
+# No modo contínuo, intervalo para recarregar as empresas e suas contas
+EMPRESAS_RELOAD_INTERVAL = int(os.getenv('INSS_EMPRESAS_RELOAD_INTERVAL', 600))
 
 def conectar_banco():
     logger.info("Tentando conectar ao banco de dados")
@@ -51,38 +104,286 @@ def conectar_banco():
         logger.error(f"Erro ao conectar ao banco de dados: {str(e)}")
         raise
 
+def criar_pool_banco(tamanho=DB_POOL_SIZE):
+    """Cria o pool de conexões MySQL usado no modo contínuo"""
+    logger.info(f"Criando pool de conexões com o banco de dados ({tamanho} conexões)")
+    return mysql.connector.pooling.MySQLConnectionPool(
+        pool_name='inss_emails',
+        pool_size=tamanho,
+        pool_reset_session=True,
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASS,
+        database=DB_NAME
+    )
+
+def obter_conexao(pool):
+    """Retira uma conexão do pool, reconectando se o servidor a encerrou (wait_timeout)"""
+    conn = pool.get_connection()
+    conn.ping(reconnect=True, attempts=3, delay=2)
+    return conn
+
+# Padrões de protocolo em ordem de prioridade (o primeiro que aparecer no texto
+# vence), reunidos numa única expressão; o último é qualquer número de 6+ dígitos
+_RE_PROTOCOLO = re.compile(
+    r'requerimento\s*[nº.:]*\s*(?P<p0>\d+)'
+    r'|protocolo\s*[nº.:]*\s*(?P<p1>\d+)'
+    r'|processo\s*[nº.:]*\s*(?P<p2>\d+)'
+    r'|número\s*[.:]*\s*(?P<p3>\d+)'
+    r'|#\s*(?P<p4>\d+)'
+    r'|[\[\(](?P<p5>\d{6,}?)[\]\)]'  # Números com 6+ dígitos entre colchetes ou parênteses
+    r'|(?P<p6>\d{6,})'
+)
+
 def extrair_protocolo(texto):
     logger.debug(f"Tentando extrair protocolo do texto: {texto[:200]}...")  # Primeiros 200 caracteres
     
-    # Vários padrões possíveis para encontrar o protocolo
-    padroes = [
-        r'requerimento\s*[nº.:]*\s*(\d+)',  # Primeiro padrão para capturar do assunto
-        r'protocolo\s*[nº.:]*\s*(\d+)',
-        r'processo\s*[nº.:]*\s*(\d+)',
-        r'número\s*[.:]*\s*(\d+)',
-        r'#\s*(\d+)',
-        r'[\[\(](\d{6,}?)[\]\)]'  # Números com 6+ dígitos entre colchetes ou parênteses
-    ]
+    # Uma varredura guarda a primeira ocorrência de cada padrão
+    encontrados = {}
+    for match in _RE_PROTOCOLO.finditer(texto.lower()):
+        encontrados.setdefault(match.lastgroup, match.group(match.lastgroup))
+        if match.lastgroup == 'p0':
+            break
     
-    for padrao in padroes:
-        match = re.search(padrao, texto.lower())
-        if match:
-            protocolo = match.group(1)
+    if encontrados:
+        padrao = min(encontrados)
+        protocolo = encontrados[padrao]
+        if padrao == 'p6':
+            logger.info(f"Protocolo encontrado (número longo): {protocolo}")
+        else:
             logger.info(f"Protocolo encontrado: {protocolo}")
-            return protocolo
-            
-    # Se não encontrou com os padrões acima, procura por qualquer número com 6 ou mais dígitos
-    numeros = re.findall(r'\d{6,}', texto)
-    if numeros:
-        protocolo = numeros[0]
-        logger.info(f"Protocolo encontrado (número longo): {protocolo}")
         return protocolo
         
     logger.warning("Nenhum protocolo encontrado no texto")
     return None
 
-def get_email_content(msg):
-    """Extrai o conteúdo do email de forma mais robusta, focando no despacho do INSS"""
+# Marcadores das linhas de metadados do email do INSS, procurados numa única busca por linha
+_RE_MARCADORES = re.compile(
+    r'INSS - INSTITUTO NACIONAL DO SEGURO SOCIAL|Unidade responsável:|Serviço:|Requerimento'
+    r'|Data do Protocolo:|Protocolo:|Status atual:|Esta é uma mensagem automática'
+)
+# Linhas sempre mantidas na remoção de duplicatas
+MARCADORES_ESPECIAIS = {'Protocolo:', 'Serviço:', 'Data do Protocolo:', 'Unidade responsável:', 'Status atual:'}
+# Linhas omitidas do conteúdo
+MARCADORES_OMITIDOS = {'INSS - INSTITUTO NACIONAL DO SEGURO SOCIAL', 'Unidade responsável:', 'Serviço:', 'Requerimento'}
+# Linhas de metadados mantidas no início do conteúdo
+MARCADORES_METADADOS = {'Protocolo:', 'Data do Protocolo:', 'Status atual:'}
+# Campos preenchidos a partir do valor que segue o marcador
+CAMPOS_MARCADORES = {
+    'Serviço:': 'servico',
+    'Data do Protocolo:': 'data_protocolo',
+    'Status atual:': 'status',
+}
+
+# Classificação do despacho: palavras-chave de cada situação e prazos numa única
+# expressão sobre o texto em minúsculas; vale a primeira situação que aparece
+_RE_SITUACAO = re.compile(
+    # Advertências ("sob pena de indeferimento") não indicam a situação
+    r'(?P<ressalva>sob pena de (?:ser |seu |o )?(?:indeferiment|indeferid|arquivament)\w*)'
+    r'|(?P<exigencia>\bexig[êe]ncias?\b|\bapresent(?:e|ar) (?:os |as |o |a )?(?:seguintes )?documentos?\b)'
+    r'|(?P<indeferido>\bindeferid[oa]s?\b|\bindeferimento\b)'
+    r'|(?P<deferido>\bdeferid[oa]s?\b|\bdeferimento\b|\bconcedid[oa]s?\b)'
+    r'|(?P<agendamento>\bagendad[oa]s?\b|\bagendamento\b|\bcompare[cç]a\b|\bcomparecer\b)'
+    r'|(?P<prazo_dias>\bprazo (?:máximo |maximo )?de (?P<dias>\d{1,3})\s*(?:\([^)\n]{0,30}\)\s*)?dias)'
+    r'|(?P<prazo_data>\b(?:até|ate)\s+(?:o dia |dia )?(?P<data>\d{2}/\d{2}/\d{4}))'
+)
+SITUACOES = ('exigencia', 'indeferido', 'deferido', 'agendamento')
+
+def parse_data_br(valor):
+    """Converte DD/MM/AAAA (no início do texto) em date; None se ausente ou inválida"""
+    match = re.match(r'\s*(\d{2})/(\d{2})/(\d{4})', valor or '')
+    if not match:
+        return None
+    try:
+        return datetime(int(match.group(3)), int(match.group(2)), int(match.group(1))).date()
+    except ValueError:
+        return None
+
+def classificar_despacho(texto, status=None, data_referencia=None):
+    """Classifica o despacho e encontra o prazo em uma varredura do texto
+
+    A situação vem da linha "Status atual" quando ela a indica; senão, da primeira
+    palavra-chave do texto. O prazo é a primeira data "até DD/MM/AAAA" ou o primeiro
+    "prazo de N dias" contado a partir de data_referencia. Retorna (situação, prazo).
+    """
+    situacao = None
+    if status:
+        for match in _RE_SITUACAO.finditer(status.lower()):
+            if match.lastgroup in SITUACOES:
+                situacao = match.lastgroup
+                break
+    
+    prazo = None
+    for match in _RE_SITUACAO.finditer(texto.lower()):
+        grupo = match.lastgroup
+        if grupo in SITUACOES:
+            situacao = situacao or grupo
+        elif grupo == 'prazo_data' and prazo is None:
+            prazo = parse_data_br(match.group('data'))
+        elif grupo == 'prazo_dias' and prazo is None and data_referencia:
+            prazo = data_referencia + timedelta(days=int(match.group('dias')))
+        if situacao and prazo:
+            break
+    return situacao, prazo
+
+class ExtratorTextoHTML(HTMLParser):
+    """Extrai o texto de um HTML como segmentos por bloco, em uma única passada
+
+    Cada segmento é o texto entre duas fronteiras de bloco (abertura/fechamento de
+    p, div, td, li etc.); elementos inline como span e b não quebram o texto e
+    <br> vira um espaço. Entidades são decodificadas pelo próprio parser e o conteúdo de
+    script, style e head é ignorado, de modo que elementos aninhados nunca geram
+    cópias do mesmo texto.
+    """
+
+    BLOCOS = frozenset((
+        'address', 'article', 'aside', 'blockquote', 'caption', 'center', 'dd', 'div', 'dl', 'dt',
+        'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+        'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'tbody', 'td',
+        'tfoot', 'th', 'thead', 'tr', 'ul',
+    ))
+    IGNORADOS = frozenset(('script', 'style', 'head', 'title', 'noscript'))
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.segmentos = []
+        self._partes = []
+        self._ignorando = 0
+
+    def _fechar_segmento(self):
+        if self._partes:
+            texto = ' '.join(''.join(self._partes).split())
+            if len(texto) > 10:  # Ignora textos muito curtos
+                self.segmentos.append(texto)
+            self._partes = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.IGNORADOS:
+            self._ignorando += 1
+        elif tag == 'br':
+            self._partes.append(' ')
+        elif tag in self.BLOCOS:
+            self._fechar_segmento()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag == 'br':
+            self._partes.append(' ')
+        elif tag in self.BLOCOS:
+            self._fechar_segmento()
+
+    def handle_endtag(self, tag):
+        if tag in self.IGNORADOS:
+            self._ignorando = max(self._ignorando - 1, 0)
+        elif tag in self.BLOCOS:
+            self._fechar_segmento()
+
+    def handle_data(self, data):
+        if not self._ignorando:
+            self._partes.append(data)
+
+    def close(self):
+        super().close()
+        self._fechar_segmento()
+
+def html_para_segmentos(html):
+    """Converte um HTML em segmentos de texto por bloco, na ordem do documento"""
+    extrator = ExtratorTextoHTML()
+    extrator.feed(html)
+    extrator.close()
+    return extrator.segmentos
+
+class IndiceSimilaridade:
+    """Detecta linhas de despacho quase duplicadas sem comparar com todas as anteriores
+
+    Uma linha (normalizada, com mais de 20 caracteres) é duplicata de uma anterior
+    se uma contém a outra ou se a similaridade de Jaccard dos conjuntos de palavras
+    passa de SIMILARIDADE_MINIMA. Os conjuntos de palavras são calculados uma vez e
+    um índice invertido palavra -> linhas fornece os candidatos, já com o tamanho
+    da interseção.
+
+    Todo par que satisfaz o critério compartilha palavras inteiras, exceto quando
+    o texto contido tem menos de três palavras (pode cortar palavras nas pontas);
+    essas linhas curtas são comparadas diretamente.
+    """
+
+    def __init__(self):
+        self.linhas = []      # textos normalizados
+        self.tamanhos = []    # número de palavras distintas de cada linha
+        self.internas = []    # número de palavras distintas fora das pontas
+        self.curtas = []      # posições das linhas com menos de três palavras
+        self.indice = {}      # palavra -> posições das linhas que a contêm
+
+    @staticmethod
+    def _palavras_internas(palavras):
+        return len(set(palavras[1:-1]))
+
+    def contem_similar(self, normalizado):
+        """Indica se já existe uma linha similar a `normalizado`"""
+        if len(normalizado) <= 20 or not self.linhas:
+            return False
+
+        palavras = normalizado.split()
+        conjunto = set(palavras)
+        if len(palavras) < 3:
+            return any(normalizado in existente or existente in normalizado for existente in self.linhas) or \
+                self._jaccard_acima(conjunto, self._intersecoes(conjunto))
+
+        for posicao in self.curtas:
+            if self.linhas[posicao] in normalizado:
+                return True
+
+        intersecoes = self._intersecoes(conjunto)
+        internas = self._palavras_internas(palavras)
+        for posicao, comum in intersecoes.items():
+            existente = self.linhas[posicao]
+            # Conter o outro texto exige ter todas as suas palavras internas
+            if comum >= internas and normalizado in existente:
+                return True
+            if comum >= self.internas[posicao] and existente in normalizado:
+                return True
+        return self._jaccard_acima(conjunto, intersecoes)
+
+    def _intersecoes(self, conjunto):
+        intersecoes = {}
+        for palavra in conjunto:
+            for posicao in self.indice.get(palavra, ()):
+                intersecoes[posicao] = intersecoes.get(posicao, 0) + 1
+        return intersecoes
+
+    def _jaccard_acima(self, conjunto, intersecoes):
+        tamanho = len(conjunto)
+        for posicao, comum in intersecoes.items():
+            if comum / (tamanho + self.tamanhos[posicao] - comum) > SIMILARIDADE_MINIMA:
+                return True
+        return False
+
+    def adicionar(self, normalizado):
+        """Registra uma linha de despacho aceita"""
+        posicao = len(self.linhas)
+        palavras = normalizado.split()
+        conjunto = set(palavras)
+        self.linhas.append(normalizado)
+        self.tamanhos.append(len(conjunto))
+        self.internas.append(self._palavras_internas(palavras))
+        if len(palavras) < 3:
+            self.curtas.append(posicao)
+        for palavra in conjunto:
+            self.indice.setdefault(palavra, []).append(posicao)
+
+def valores_marcadores(line, marcadores):
+    """Texto que segue cada marcador da linha, até o próximo marcador"""
+    valores = {}
+    for indice, (marcador, inicio, fim) in enumerate(marcadores):
+        proximo = marcadores[indice + 1][1] if indice + 1 < len(marcadores) else len(line)
+        valores.setdefault(marcador, line[fim:proximo].strip())
+    return valores
+
+def get_email_content(msg, campos=None):
+    """Extrai o conteúdo do email de forma mais robusta, focando no despacho do INSS
+
+    Se `campos` for um dicionário, recebe serviço, data do protocolo e status
+    encontrados nas linhas de metadados (inclusive as omitidas do conteúdo).
+    """
     content = []
     
     if msg.is_multipart():
@@ -101,24 +402,8 @@ def get_email_content(msg):
                         charset = part.get_content_charset() or 'utf-8'
                         try:
                             decoded_content = payload.decode(charset)
-                            # Remove scripts e estilos
-                            decoded_content = re.sub(r'<script[^>]*>.*?</script>', '', decoded_content, flags=re.DOTALL)
-                            decoded_content = re.sub(r'<style[^>]*>.*?</style>', '', decoded_content, flags=re.DOTALL)
-                            
-                            # Procura por texto entre tags HTML comuns em emails
-                            tags_to_extract = ['p', 'td', 'div', 'span', 'li']
-                            for tag in tags_to_extract:
-                                matches = re.findall(f'<{tag}[^>]*>(.*?)</{tag}>', decoded_content, re.DOTALL)
-                                for match in matches:
-                                    # Remove todas as tags HTML restantes
-                                    clean_text = re.sub(r'<[^>]+>', '', match)
-                                    # Remove caracteres especiais HTML
-                                    clean_text = re.sub(r'&nbsp;', ' ', clean_text)
-                                    clean_text = re.sub(r'&[a-zA-Z]+;', '', clean_text)
-                                    # Remove espaços extras e quebras de linha
-                                    clean_text = ' '.join(clean_text.split())
-                                    if clean_text and len(clean_text.strip()) > 10:  # Ignora textos muito curtos
-                                        content.append(clean_text.strip())
+                            # Texto de cada bloco do HTML, em uma única passada
+                            content.extend(html_para_segmentos(decoded_content))
                         except Exception as e:
                             logger.error(f"Erro ao processar HTML: {str(e)}")
                             decoded_content = payload.decode(charset, 'replace')
@@ -173,34 +458,34 @@ def get_email_content(msg):
         normalized = re.sub(r'[^\w\s]', '', line.lower())
         normalized = ' '.join(normalized.split())  # Remove espaços extras
         
+        # Marcadores da linha, encontrados uma única vez
+        marcadores = [(match.group(), match.start(), match.end()) for match in _RE_MARCADORES.finditer(line)]
+        encontrados = {marcador for marcador, _, _ in marcadores}
+        
         # Se a linha normalizada não foi vista antes ou é uma linha especial (protocolo, serviço, etc)
-        if normalized not in seen_normalized or any(key in line for key in ['Protocolo:', 'Serviço:', 'Data do Protocolo:', 'Unidade responsável:', 'Status atual:']):
+        if normalized not in seen_normalized or encontrados & MARCADORES_ESPECIAIS:
             seen_normalized[normalized] = True
-            unique_lines.append(line)
+            unique_lines.append((line, encontrados))
+            if campos is not None and encontrados:
+                for marcador, valor in valores_marcadores(line, marcadores).items():
+                    if marcador in CAMPOS_MARCADORES and valor:
+                        campos.setdefault(CAMPOS_MARCADORES[marcador], valor)
     
     # Organiza o conteúdo em seções
     organized_content = []
     metadata = []
     despacho = []
-    despacho_seen = set()  # Para controlar duplicação do despacho
+    despacho_seen = set()  # Para controlar a saudação do despacho
+    despacho_index = IndiceSimilaridade()  # Para controlar duplicação do despacho
     
-    # Lista de informações para omitir
-    skip_patterns = [
-        'INSS - INSTITUTO NACIONAL DO SEGURO SOCIAL',
-        'Unidade responsável:',
-        'Serviço:',
-        'Requerimento'
-    ]
-    
-    for line in unique_lines:
+    for line, encontrados in unique_lines:
         # Verifica se a linha deve ser omitida
-        should_skip = any(pattern in line for pattern in skip_patterns)
-        if should_skip:
+        if encontrados & MARCADORES_OMITIDOS:
             continue
             
-        if any(key in line for key in ['Protocolo:', 'Data do Protocolo:', 'Status atual:']):
+        if encontrados & MARCADORES_METADADOS:
             metadata.append(line)
-        elif 'Esta é uma mensagem automática' in line:
+        elif 'Esta é uma mensagem automática' in encontrados:
             continue  # Ignora a mensagem automática
         else:
             # Normaliza o texto do despacho para comparação
@@ -214,19 +499,8 @@ def get_email_content(msg):
                     despacho.append(line)
             else:
                 # Adiciona apenas se não for uma duplicata do despacho
-                similar_found = False
-                for existing in despacho_seen:
-                    # Calcula a similaridade entre os textos
-                    if len(despacho_normalized) > 20 and (
-                        despacho_normalized in existing or 
-                        existing in despacho_normalized or
-                        (len(set(despacho_normalized.split()) & set(existing.split())) / len(set(despacho_normalized.split() + existing.split()))) > 0.8
-                    ):
-                        similar_found = True
-                        break
-                
-                if not similar_found:
-                    despacho_seen.add(despacho_normalized)
+                if not despacho_index.contem_similar(despacho_normalized):
+                    despacho_index.adicionar(despacho_normalized)
                     despacho.append(line)
     
     # Monta o conteúdo final na ordem desejada
@@ -236,29 +510,38 @@ def get_email_content(msg):
     logger.debug(f"Conteúdo limpo do email: {result[:200]}...")
     return result
 
+def extrair_assunto(msg):
+    """Decodifica o assunto completo do email, com todas as partes RFC 2047 (também usado só com os cabeçalhos)"""
+    if not msg["subject"]:
+        return ""
+    try:
+        return str(make_header(decode_header(msg["subject"])))
+    except (LookupError, UnicodeDecodeError) as e:
+        logger.warning(f"Erro ao decodificar o assunto {msg['subject']!r}: {str(e)}")
+        return str(msg["subject"])
+
+def extrair_data(msg):
+    """Data de recebimento do cabeçalho Date; None se ausente ou inválida"""
+    try:
+        return parsedate_to_datetime(msg["date"])
+    except Exception as e:
+        logger.error(f"Erro ao processar data {msg['date']}: {str(e)}")
+        return None
+
 def processar_email(msg):
     logger.info("Processando novo email")
     
     # Extrair assunto
-    subject = ""
-    if msg["subject"]:
-        subject_bytes, encoding = decode_header(msg["subject"])[0]
-        if isinstance(subject_bytes, bytes):
-            subject = subject_bytes.decode(encoding if encoding else "utf-8")
-        else:
-            subject = subject_bytes
+    subject = extrair_assunto(msg)
     logger.debug(f"Assunto do email: {subject}")
 
     # Extrair data de recebimento usando email.utils.parsedate_to_datetime
-    try:
-        date_received = parsedate_to_datetime(msg["date"])
-        logger.debug(f"Data de recebimento: {date_received}")
-    except Exception as e:
-        logger.error(f"Erro ao processar data {msg['date']}: {str(e)}")
-        date_received = datetime.now()
+    date_received = extrair_data(msg) or datetime.now()
+    logger.debug(f"Data de recebimento: {date_received}")
 
-    # Extrair corpo do email usando a nova função
-    corpo = get_email_content(msg)
+    # Extrair corpo do email e os campos das linhas de metadados
+    campos = {}
+    corpo = get_email_content(msg, campos)
     logger.debug(f"Corpo do email (primeiros 200 caracteres): {corpo[:200]}...")
     
     # Extrair protocolo do assunto ou do corpo
@@ -268,12 +551,9 @@ def processar_email(msg):
     if not protocolo and corpo:
         protocolo = extrair_protocolo(corpo)
 
-    # Extrair serviço do corpo
-    servico = None
-    for linha in corpo.split('\n'):
-        if 'Serviço:' in linha:
-            servico = linha.split('Serviço:')[1].strip()
-            break
+    # Situação (exigência, deferido, indeferido, agendamento) e prazo do despacho
+    classificacao, prazo = classificar_despacho(corpo, campos.get('status'), date_received.date())
+    logger.debug(f"Situação do despacho: {classificacao}, prazo: {prazo}")
     
     # Gerar um ID único para o email
     email_id = f"{protocolo}_{date_received.strftime('%Y%m%d%H%M%S')}"
@@ -283,108 +563,900 @@ def processar_email(msg):
         'assunto': subject,
         'conteudo': corpo,
         'data_recebimento': date_received,
-        'servico': servico,
+        'servico': campos.get('servico'),
+        'data_protocolo': parse_data_br(campos.get('data_protocolo')),
+        'status': campos.get('status'),
+        'classificacao': classificacao,
+        'prazo': prazo,
         'email_id': email_id
     }
 
-def salvar_email(conn, dados):
-    if not dados['protocolo']:
-        logger.warning("Email descartado: sem número de protocolo")
-        return False
+def calcular_hash_conteudo(conteudo):
+    """SHA-256 do conteúdo do despacho, usado para não regravar despachos inalterados"""
+    return hashlib.sha256((conteudo or '').encode('utf-8')).hexdigest()
+
+# Upsert pela chave única (id_empresa, protocolo): cada empresa tem o próprio despacho
+# do protocolo e uma linha nunca muda de empresa. Como no EmailService, a linha só muda
+# se o conteúdo mudou (hash) e o email não é mais antigo que o gravado; caso contrário
+# nenhuma coluna é alterada (o MySQL não regrava a linha nem atualiza updated_at).
+# As atribuições são avaliadas em ordem: data_email e conteudo_hash precisam ser as
+# últimas, e conteudo_hash compara com o data_email já atualizado.
+_MANTER_DESPACHO = "(conteudo_hash <=> VALUES(conteudo_hash) OR VALUES(data_email) < data_email)"
+SQL_UPSERT_DESPACHO = f"""INSERT INTO despachos
+        (protocolo, conteudo, conteudo_hash, data_email, servico, data_protocolo, status_atual, classificacao,
+         prazo, email_id, id_empresa, created_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+        ON DUPLICATE KEY UPDATE
+            conteudo = IF({_MANTER_DESPACHO}, conteudo, VALUES(conteudo)),
+            servico = IF({_MANTER_DESPACHO}, servico, VALUES(servico)),
+            data_protocolo = IF({_MANTER_DESPACHO}, data_protocolo, VALUES(data_protocolo)),
+            status_atual = IF({_MANTER_DESPACHO}, status_atual, VALUES(status_atual)),
+            classificacao = IF({_MANTER_DESPACHO}, classificacao, VALUES(classificacao)),
+            prazo = IF({_MANTER_DESPACHO}, prazo, VALUES(prazo)),
+            updated_at = IF({_MANTER_DESPACHO}, updated_at, NOW()),
+            data_email = IF({_MANTER_DESPACHO}, data_email, VALUES(data_email)),
+            conteudo_hash = IF(VALUES(data_email) < data_email, conteudo_hash, VALUES(conteudo_hash))"""
+
+def salvar_emails(conn, lista_dados):
+    """Grava vários despachos com um único INSERT ... ON DUPLICATE KEY UPDATE e um commit
+
+    Emails sem protocolo são descartados. Retorna True se o lote foi gravado
+    (ou não havia nada a gravar) e False em caso de erro (o lote é desfeito).
+    """
+    linhas = []
+    for dados in lista_dados:
+        if not dados['protocolo']:
+            logger.warning("Email descartado: sem número de protocolo")
+            continue
+        linhas.append((
+            dados['protocolo'],
+            dados['conteudo'],
+            calcular_hash_conteudo(dados['conteudo']),
+            dados['data_recebimento'],
+            dados['servico'],
+            dados.get('data_protocolo'),
+            dados.get('status'),
+            dados.get('classificacao'),
+            dados.get('prazo'),
+            dados['email_id'],
+            dados.get('id_empresa')
+        ))
+    if not linhas:
+        return True
 
     cursor = conn.cursor()
     try:
-        # Verificar se o protocolo já existe na tabela de despachos
-        cursor.execute("SELECT id FROM despachos WHERE protocolo = %s", (dados['protocolo'],))
-        if cursor.fetchone():
-            # Atualizar o registro existente
-            sql = """UPDATE despachos 
-                    SET conteudo = %s, data_email = %s, servico = %s, updated_at = NOW()
-                    WHERE protocolo = %s"""
-            cursor.execute(sql, (
-                dados['conteudo'],
-                dados['data_recebimento'],
-                dados['servico'],
-                dados['protocolo']
-            ))
-            logger.info(f"Despacho com protocolo {dados['protocolo']} atualizado")
-        else:
-            # Inserir novo registro
-            sql = """INSERT INTO despachos 
-                    (protocolo, conteudo, data_email, servico, email_id, created_at, updated_at) 
-                    VALUES (%s, %s, %s, %s, %s, NOW(), NOW())"""
-            cursor.execute(sql, (
-                dados['protocolo'],
-                dados['conteudo'],
-                dados['data_recebimento'],
-                dados['servico'],
-                dados['email_id']
-            ))
-            logger.info(f"Despacho com protocolo {dados['protocolo']} inserido")
-            
+        cursor.executemany(SQL_UPSERT_DESPACHO, linhas)
         conn.commit()
+        # rowcount: 1 por inserção, 2 por atualização, 0 para despacho inalterado
+        logger.info(f"Lote de {len(linhas)} despachos gravado ({cursor.rowcount} linhas afetadas)")
         return True
     except mysql.connector.Error as err:
-        logger.error(f"Erro ao salvar despacho: {err}")
+        logger.error(f"Erro ao salvar lote de despachos: {err}")
+        conn.rollback()
         return False
     finally:
         cursor.close()
 
-def main():
+def salvar_email(conn, dados):
+    if not dados['protocolo']:
+        logger.warning("Email descartado: sem número de protocolo")
+        return False
+    return salvar_emails(conn, [dados])
+
+def chave_caixa(usuario, servidor, caixa):
+    """Identifica a caixa de email no arquivo de checkpoint"""
+    return f"{usuario}@{servidor}/{caixa}"
+
+def carregar_checkpoints(caminho=SYNC_STATE_PATH):
+    """Lê os checkpoints {caixa: {uidvalidity, last_uid}}; vazio se o arquivo não existir"""
     try:
-        # Conectar ao servidor IMAP
-        logger.info(f"Conectando ao servidor IMAP {IMAP_SERVER}:{IMAP_PORT}")
-        imap = imaplib.IMAP4_SSL(IMAP_SERVER, IMAP_PORT)
-        imap.login(EMAIL_USER, EMAIL_PASSWORD)
-        logger.info("Conectado ao servidor IMAP com sucesso")
-        
-        # Selecionar a caixa de entrada
-        imap.select('INBOX')
-        logger.info("Caixa de entrada selecionada")
-
-        # Buscar todos os emails do INSS dos últimos 30 dias
-        status, mensagens = imap.search(None, '(FROM "noreply@inss.gov.br" SINCE "9-Jun-2025")')
-        if status != 'OK' or not mensagens[0]:
-            logger.warning("Nenhum email encontrado ou erro na busca")
-            return
-            
-        msg_nums = mensagens[0].split()
-        num_mensagens = len(msg_nums)
-        logger.info(f"Encontrados {num_mensagens} emails do INSS")
-        
-        # Conectar ao banco de dados
-        conn = conectar_banco()
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Checkpoint de sincronização ilegível ({e}), fazendo sincronização completa")
+        return {}
+
+def salvar_checkpoints(checkpoints, caminho=SYNC_STATE_PATH):
+    """Grava os checkpoints de forma atômica (arquivo temporário + rename)"""
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(checkpoints, f, indent=2)
+    os.replace(temporario, caminho)
+
+_checkpoints_lock = threading.Lock()
+
+def obter_uidvalidity(imap, caixa):
+    """Retorna o UIDVALIDITY da caixa selecionada"""
+    typ, dados = imap.response('UIDVALIDITY')
+    if dados and dados[0]:
+        return int(dados[0])
+    status, dados = imap.status(caixa, '(UIDVALIDITY)')
+    match = re.search(rb'UIDVALIDITY\s+(\d+)', dados[0] or b'') if status == 'OK' else None
+    if not match:
+        raise RuntimeError(f"Não foi possível obter o UIDVALIDITY da caixa {caixa}")
+    return int(match.group(1))
+
+def buscar_uids_novos(imap, checkpoint, uidvalidity):
+    """Busca os UIDs de emails do INSS ainda não processados
+
+    Com checkpoint válido busca apenas UIDs após o último processado; se não há
+    checkpoint ou o UIDVALIDITY mudou, faz a sincronização completa desde SYNC_SINCE.
+    Retorna (uids, último UID já processado).
+    """
+    criterio = f'FROM "{REMETENTE_INSS}" SINCE "{SYNC_SINCE}"'
+    if checkpoint and checkpoint.get('uidvalidity') == uidvalidity:
+        last_uid = int(checkpoint.get('last_uid', 0))
+        criterio += f' UID {last_uid + 1}:*'
+        logger.info(f"Sincronização incremental a partir do UID {last_uid + 1}")
+    else:
+        if checkpoint:
+            logger.warning(f"UIDVALIDITY alterado ({checkpoint.get('uidvalidity')} -> {uidvalidity}), "
+                           "fazendo sincronização completa")
+        last_uid = 0
+        logger.info(f"Sincronização completa desde {SYNC_SINCE}")
+
+    status, dados = imap.uid('SEARCH', None, f'({criterio})')
+    if status != 'OK':
+        raise RuntimeError(f"Erro na busca de emails: {dados}")
+
+    # "N:*" sempre inclui a última mensagem, mesmo que seu UID seja menor que N
+    uids = sorted(int(uid) for uid in (dados[0] or b'').split())
+    return [uid for uid in uids if uid > last_uid], last_uid
+
+def formatar_conjunto_uids(uids):
+    """Monta o conjunto de UIDs do IMAP compactando sequências (ex.: 3:5,9)"""
+    faixas = []
+    for uid in sorted(uids):
+        if faixas and uid == faixas[-1][1] + 1:
+            faixas[-1][1] = uid
+        else:
+            faixas.append([uid, uid])
+    return ','.join(str(a) if a == b else f"{a}:{b}" for a, b in faixas)
+
+def em_lotes(itens, tamanho):
+    """Divide uma lista em lotes de até `tamanho` itens"""
+    for inicio in range(0, len(itens), tamanho):
+        yield itens[inicio:inicio + tamanho]
+
+def em_lotes_iter(itens, tamanho):
+    """Divide um iterador em listas de até `tamanho` itens, sem consumi-lo inteiro"""
+    lote = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def ler_resposta_fetch(resposta):
+    """Converte a resposta de um UID FETCH em {uid: conteúdo}
+
+    Cada mensagem vem como (b'N (UID n BODY[...] {tamanho}', conteúdo) seguida de
+    b')' — alguns servidores enviam o UID depois do literal, nesse item final.
+    """
+    resultado = {}
+    pendente = None
+    for item in resposta or []:
+        if isinstance(item, tuple):
+            match = re.search(rb'UID (\d+)', item[0])
+            if match:
+                resultado[int(match.group(1))] = item[1]
+                pendente = None
+            else:
+                pendente = item[1]
+        elif isinstance(item, bytes) and pendente is not None:
+            match = re.search(rb'UID (\d+)', item)
+            if match:
+                resultado[int(match.group(1))] = pendente
+            pendente = None
+    return resultado
+
+def buscar_cabecalhos(imap, uids):
+    """Busca assunto, data e Message-ID de vários emails em um único FETCH (sem marcar como lidos)"""
+    status, resposta = imap.uid('FETCH', formatar_conjunto_uids(uids),
+                                '(UID BODY.PEEK[HEADER.FIELDS (SUBJECT DATE MESSAGE-ID)])')
+    if status != 'OK':
+        raise RuntimeError(f"Erro ao buscar cabeçalhos: {resposta}")
+    return {uid: email.message_from_bytes(cabecalho) for uid, cabecalho in ler_resposta_fetch(resposta).items()}
+
+def buscar_mensagens(imap, uids):
+    """Busca o conteúdo completo de vários emails em um único FETCH"""
+    status, resposta = imap.uid('FETCH', formatar_conjunto_uids(uids), '(UID RFC822)')
+    if status != 'OK':
+        raise RuntimeError(f"Erro ao buscar emails: {resposta}")
+    return ler_resposta_fetch(resposta)
+
+def despachos_conhecidos(conn, protocolos, id_empresa=None):
+    """Retorna {protocolo: data_email} dos protocolos já gravados em despachos pela empresa"""
+    if not protocolos:
+        return {}
+    protocolos = list(protocolos)
+    cursor = conn.cursor()
+    try:
+        marcadores = ', '.join(['%s'] * len(protocolos))
+        cursor.execute(f"SELECT protocolo, MAX(data_email) FROM despachos WHERE id_empresa = %s "
+                       f"AND protocolo IN ({marcadores}) GROUP BY protocolo", [id_empresa] + protocolos)
+        return {protocolo: data_email for protocolo, data_email in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+def ja_gravado(protocolo, data_email, conhecidos):
+    """Indica se o email já está refletido em despachos, olhando apenas os cabeçalhos
+
+    O email é pulado quando o despacho gravado para o protocolo do assunto é
+    deste email ou de um mais recente.
+    """
+    data_gravada = conhecidos.get(protocolo) if protocolo else None
+    if data_gravada is None or data_email is None:
+        return False
+    # data_email é gravado sem fuso horário (hora local do remetente)
+    return data_gravada >= data_email.replace(tzinfo=None)
+
+def iterar_emails_novos(imap, conn, uids, id_empresa=None):
+    """Gera (uid, conteúdo) em ordem de UID; conteúdo None indica email já gravado
+
+    Os cabeçalhos são lidos em lotes de HEADER_FETCH_CHUNK para descartar emails cujo
+    despacho já está gravado pela mesma empresa; os demais são baixados em lotes de
+    BODY_FETCH_CHUNK.
+    """
+    for lote in em_lotes(uids, HEADER_FETCH_CHUNK):
+        cabecalhos = {
+            uid: (extrair_protocolo(extrair_assunto(cabecalho)), extrair_data(cabecalho))
+            for uid, cabecalho in buscar_cabecalhos(imap, lote).items()
+        }
+        conhecidos = despachos_conhecidos(conn, {protocolo for protocolo, _ in cabecalhos.values()} - {None},
+                                          id_empresa)
+        pendentes = [uid for uid in lote if not ja_gravado(*cabecalhos.get(uid, (None, None)), conhecidos)]
+        logger.info(f"Lote de {len(lote)} emails: {len(lote) - len(pendentes)} já gravados, "
+                    f"{len(pendentes)} a baixar")
+
+        baixados = {}
+        proximo = 0
+        for uid in lote:
+            if uid not in pendentes[proximo:proximo + 1]:
+                yield uid, None
+                continue
+            if uid not in baixados:
+                baixados = buscar_mensagens(imap, pendentes[proximo:proximo + BODY_FETCH_CHUNK])
+            proximo += 1
+            conteudo = baixados.pop(uid, None)
+            if not isinstance(conteudo, bytes):
+                # Interrompe aqui: o checkpoint não passa deste email
+                logger.error(f"Erro ao buscar email UID {uid}")
+                return
+            yield uid, conteudo
+
+def conectar_imap(conta=CONTA_PADRAO):
+    """Conecta ao servidor IMAP da conta e seleciona a caixa de entrada"""
+    logger.info(f"Conectando ao servidor IMAP {conta['servidor']}:{conta['porta']}")
+    classe = imaplib.IMAP4_SSL if conta.get('ssl', True) else imaplib.IMAP4
+    imap = classe(conta['servidor'], conta['porta'])
+    imap.login(conta['usuario'], conta['senha'])
+    logger.info("Conectado ao servidor IMAP com sucesso")
+    
+    imap.select(conta['caixa'])
+    logger.info("Caixa de entrada selecionada")
+    return imap
+
+def gravar_lote(conn, lote, id_empresa=None):
+    """Grava os despachos de um lote [(uid, dados ou None)] em uma transação"""
+    despachos = [dados for _, dados in lote if dados is not None]
+    for dados in despachos:
+        dados['id_empresa'] = id_empresa
+    return salvar_emails(conn, despachos)
+
+def registrar_lote(progresso, lote):
+    """Atualiza o progresso após um lote gravado: contadores e último UID concluído"""
+    progresso['processados'] += sum(1 for _, dados in lote if dados and dados['protocolo'])
+    progresso['last_uid'] = lote[-1][0]
+
+def processar_bytes_email(email_body):
+    """Interpreta e processa um email bruto (executado nos processos do pipeline)"""
+    return processar_email(email.message_from_bytes(email_body))
+
+def registrar_falha(uid, progresso):
+    """Registra um email que não pôde ser processado (chamada dentro do except)
+
+    O email entra no lote sem despacho, para que o checkpoint passe por ele: senão
+    seria baixado de novo a cada execução e seguraria todos os emails seguintes.
+    """
+    logger.exception(f"Erro ao processar o email UID {uid}; email ignorado")
+    progresso['falhas'] += 1
+    return None
+
+def processar_sequencial(imap, conn, uids, progresso, id_empresa=None):
+    """Baixa, processa e grava os emails um após o outro"""
+    lote = []
+    for uid, email_body in iterar_emails_novos(imap, conn, uids, id_empresa):
+        if email_body is None:
+            progresso['ignorados'] += 1
+            lote.append((uid, None))
+        else:
+            logger.info(f"Processando email UID {uid}")
+            try:
+                dados = processar_bytes_email(email_body)
+            except Exception:
+                dados = registrar_falha(uid, progresso)
+            lote.append((uid, dados))
         
-        # Processar cada email
-        emails_processados = 0
-        for num in msg_nums:
-            if not isinstance(num, bytes):
-                num = str(num).encode('utf-8')
-                
-            logger.info(f"Processando email {num}")
-            status, msg_data = imap.fetch(num, '(RFC822)')
-            if status != 'OK' or not msg_data or not msg_data[0]:
-                logger.error(f"Erro ao buscar email {num}")
+        if len(lote) >= DB_BATCH_SIZE:
+            if not gravar_lote(conn, lote, id_empresa):
+                return
+            registrar_lote(progresso, lote)
+            lote = []
+    
+    if lote and gravar_lote(conn, lote, id_empresa):
+        registrar_lote(progresso, lote)
+
+def processar_em_pipeline(imap, conn, obter_conn, uids, progresso, workers, id_empresa=None):
+    """Baixa, processa e grava os emails em paralelo, ligados por filas limitadas
+
+    Uma thread de leitura baixa os emails do IMAP, um pool de processos executa
+    processar_email e uma thread de escrita grava os despachos em lotes, na ordem
+    dos UIDs (o checkpoint continua contíguo). As filas limitadas seguram a etapa
+    mais rápida quando a seguinte está atrasada.
+    """
+    fila_leitura = queue.Queue(maxsize=workers * 4)
+    fila_escrita = queue.Queue(maxsize=workers * 4)
+    parar = threading.Event()
+    fim = object()
+
+    def colocar(fila, item):
+        # Desiste se outra etapa falhou, em vez de bloquear para sempre na fila cheia
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=0.5)
+                return True
+            except queue.Full:
                 continue
-                
-            email_body = msg_data[0][1]
-            if not isinstance(email_body, bytes):
-                logger.error(f"Corpo do email {num} não é bytes")
+        return False
+
+    def retirar(fila):
+        while not parar.is_set():
+            try:
+                return fila.get(timeout=0.5)
+            except queue.Empty:
                 continue
-                
-            msg = email.message_from_bytes(email_body)
-            
-            # Processar e salvar o email
-            dados = processar_email(msg)
-            if salvar_email(conn, dados):
-                emails_processados += 1
-                logger.info("Email salvo com sucesso")
+        return fim
+
+    def ler():
+        try:
+            for item in iterar_emails_novos(imap, conn, uids, id_empresa):
+                if not colocar(fila_leitura, item):
+                    return
+        except Exception as e:
+            logger.error(f"Erro ao baixar emails: {e}")
+        finally:
+            colocar(fila_leitura, fim)
+
+    def escrever():
+        conn_escrita = obter_conn()
+        lote = []
+        try:
+            while True:
+                try:
+                    item = fila_escrita.get(timeout=0.5)
+                except queue.Empty:
+                    if not lote and parar.is_set():
+                        # O laço principal falhou antes de enviar o fim
+                        return
+                    # Sem emails chegando: grava o que já está pronto
+                    item = None
+                if item is fim or item is None or len(lote) >= DB_BATCH_SIZE:
+                    if lote:
+                        if not gravar_lote(conn_escrita, lote, id_empresa):
+                            break
+                        registrar_lote(progresso, lote)
+                        lote = []
+                    if item is fim:
+                        return
+                    if item is None:
+                        continue
+                uid, tarefa = item
+                try:
+                    dados = tarefa.result() if tarefa is not None else None
+                except BrokenExecutor:
+                    # Falha do pool, não do email: interrompe o lote
+                    raise
+                except Exception:
+                    dados = registrar_falha(uid, progresso)
+                lote.append((uid, dados))
+        except Exception as e:
+            logger.error(f"Erro ao processar email: {e}")
+        finally:
+            # Em caso de falha as demais etapas são interrompidas
+            parar.set()
+            conn_escrita.close()
+
+    leitor = threading.Thread(target=ler, name='inss-leitura', daemon=True)
+    escritor = threading.Thread(target=escrever, name='inss-escrita', daemon=True)
+    try:
+        # spawn: os processos não herdam as threads e conexões abertas deste processo
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            leitor.start()
+            escritor.start()
+            while True:
+                item = retirar(fila_leitura)
+                if item is fim:
+                    break
+                uid, email_body = item
+                if email_body is None:
+                    progresso['ignorados'] += 1
+                    tarefa = None
+                else:
+                    logger.info(f"Processando email UID {uid}")
+                    tarefa = executor.submit(processar_bytes_email, email_body)
+                if not colocar(fila_escrita, (uid, tarefa)):
+                    break
+            colocar(fila_escrita, fim)
+            escritor.join()
+    finally:
+        # Também em caso de erro: a escrita termina e devolve a conexão ao pool
+        parar.set()
+        for thread in (escritor, leitor):
+            if thread.is_alive():
+                thread.join()
+
+def sincronizar_caixa(imap, obter_conn, workers=None, conta=CONTA_PADRAO):
+    """Processa os emails do INSS posteriores ao checkpoint da caixa selecionada
+
+    obter_conn é chamado apenas se houver emails novos e deve retornar uma conexão
+    com o banco; ela é fechada (ou devolvida ao pool) ao final. Com workers > 1 os
+    emails são processados em pipeline (ver processar_em_pipeline). Os despachos
+    são gravados com o id_empresa da conta. Retorna o número de emails salvos.
+    """
+    # Buscar apenas os emails do INSS posteriores ao checkpoint
+    chave = chave_caixa(conta['usuario'], conta['servidor'], conta['caixa'])
+    uidvalidity = obter_uidvalidity(imap, conta['caixa'])
+    uids, last_uid = buscar_uids_novos(imap, carregar_checkpoints().get(chave), uidvalidity)
+    if not uids:
+        logger.info("Nenhum email novo do INSS")
+        return 0
         
-        logger.info(f"Total de emails processados: {emails_processados}")
+    logger.info(f"Encontrados {len(uids)} emails novos do INSS")
+    
+    # Conectar ao banco de dados
+    conn = obter_conn()
+    
+    # Processar os emails em lotes gravados numa única transação; o checkpoint
+    # avança só até o último lote gravado, para que uma falha seja tentada de
+    # novo na próxima execução
+    progresso = {'last_uid': last_uid, 'processados': 0, 'ignorados': 0, 'falhas': 0}
+    try:
+        if workers and workers > 1 and len(uids) > 1:
+            processar_em_pipeline(imap, conn, obter_conn, uids, progresso, workers, conta['id_empresa'])
+        else:
+            processar_sequencial(imap, conn, uids, progresso, conta['id_empresa'])
+    finally:
+        # O arquivo é compartilhado pelas contas sincronizadas em paralelo: relê
+        # e altera apenas a chave desta caixa
+        with _checkpoints_lock:
+            checkpoints = carregar_checkpoints()
+            checkpoints[chave] = {'uidvalidity': uidvalidity, 'last_uid': progresso['last_uid']}
+            salvar_checkpoints(checkpoints)
+        logger.info(f"Checkpoint salvo: UIDVALIDITY {uidvalidity}, último UID {progresso['last_uid']}")
+        conn.close()
+    
+    logger.info(f"Total de emails processados: {progresso['processados']} "
+                f"({progresso['ignorados']} já gravados, não baixados; {progresso['falhas']} com erro)")
+    return progresso['processados']
+
+def iterar_mbox(caminho):
+    """Gera o conteúdo bruto de cada email de um arquivo mbox
+
+    O arquivo é mapeado em memória (mmap) e as mensagens são delimitadas pelas
+    linhas "From " em sequência, sem carregar o arquivo inteiro.
+    """
+    with open(caminho, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            inicio = 0 if mm[:5] == b'From ' else mm.find(b'\nFrom ')
+            while inicio != -1:
+                if mm[inicio:inicio + 1] == b'\n':
+                    inicio += 1
+                # A linha "From remetente data" separa as mensagens e não faz parte delas
+                corpo = mm.find(b'\n', inicio)
+                if corpo == -1:
+                    return
+                fim = mm.find(b'\nFrom ', corpo)
+                mensagem = mm[corpo + 1:len(mm) if fim == -1 else fim + 1]
+                # Remove a linha em branco que o formato mbox acrescenta ao fim de cada email
+                if mensagem.endswith(b'\r\n'):
+                    mensagem = mensagem[:-2]
+                elif mensagem.endswith(b'\n'):
+                    mensagem = mensagem[:-1]
+                yield mensagem
+                inicio = fim
+
+def iterar_maildir(caminho):
+    """Gera o conteúdo bruto dos emails de um Maildir (cur/ e new/, incluindo subpastas)"""
+    for raiz, pastas, arquivos in os.walk(caminho):
+        pastas.sort()
+        if os.path.basename(raiz) not in ('cur', 'new'):
+            continue
+        for nome in sorted(arquivos):
+            with open(os.path.join(raiz, nome), 'rb') as f:
+                yield f.read()
+
+def iterar_eml(caminho):
+    """Gera o conteúdo bruto dos arquivos .eml de um diretório (recursivo)"""
+    for raiz, pastas, arquivos in os.walk(caminho):
+        pastas.sort()
+        for nome in sorted(arquivos):
+            if nome.lower().endswith('.eml'):
+                with open(os.path.join(raiz, nome), 'rb') as f:
+                    yield f.read()
+
+def iterar_arquivo_local(caminho):
+    """Escolhe o leitor pelo tipo de origem: .eml, mbox, Maildir ou diretório de .eml"""
+    if os.path.isfile(caminho):
+        if caminho.lower().endswith('.eml'):
+            with open(caminho, 'rb') as f:
+                return iter([f.read()])
+        return iterar_mbox(caminho)
+    if os.path.isdir(os.path.join(caminho, 'cur')) or os.path.isdir(os.path.join(caminho, 'new')):
+        return iterar_maildir(caminho)
+    if os.path.isdir(caminho):
+        return iterar_eml(caminho)
+    raise FileNotFoundError(f"Origem de emails não encontrada: {caminho}")
+
+def remetente_inss(email_body):
+    """Indica se o email bruto foi enviado pelo INSS (lê apenas os cabeçalhos)"""
+    cabecalho = email_body.split(b'\r\n\r\n', 1)[0].split(b'\n\n', 1)[0]
+    return REMETENTE_INSS in (email.message_from_bytes(cabecalho).get('from') or '').lower()
+
+def importar_arquivo(caminho, conn, id_empresa=None, workers=None):
+    """Importa os despachos de um arquivo local (mbox, Maildir ou diretório de .eml)
+
+    Usa o mesmo caminho do IMAP (processar_email e gravação em lotes); emails de
+    outros remetentes são ignorados. Com workers > 1 cada lote é interpretado por
+    um pool de processos. Retorna o número de emails salvos.
+    """
+    logger.info(f"Importando emails de {caminho}")
+    executor = None
+    if workers and workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    
+    lidos = 0
+    salvos = 0
+    try:
+        mensagens = (email_body for email_body in iterar_arquivo_local(caminho) if remetente_inss(email_body))
+        for lote in em_lotes_iter(mensagens, DB_BATCH_SIZE):
+            if executor:
+                resultados = list(executor.map(processar_bytes_email, lote))
+            else:
+                resultados = [processar_bytes_email(email_body) for email_body in lote]
+            lidos += len(lote)
+            if not gravar_lote(conn, list(enumerate(resultados, lidos - len(lote) + 1)), id_empresa):
+                raise RuntimeError(f"Erro ao gravar despachos de {caminho}; importação interrompida")
+            salvos += sum(1 for dados in resultados if dados['protocolo'])
+    finally:
+        if executor:
+            executor.shutdown()
+    
+    logger.info(f"{caminho}: {lidos} emails do INSS lidos, {salvos} despachos gravados")
+    return salvos
+
+def aguardar_idle(imap, timeout=IDLE_TIMEOUT):
+    """Aguarda em IMAP IDLE (RFC 2177) até chegar um email ou o tempo se esgotar
+
+    Retorna True se o servidor anunciou mensagens novas (EXISTS).
+    """
+    tag = imap._new_tag()
+    imap.send(tag + b' IDLE\r\n')
+    resposta = imap.readline()
+    if not resposta.startswith(b'+'):
+        raise imaplib.IMAP4.error(f"IDLE recusado pelo servidor: {resposta!r}")
+
+    novos = False
+    limite = time.monotonic() + timeout
+    sock = imap.socket()
+    try:
+        while not novos:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            # Dados já decifrados pelo SSL não aparecem no select
+            pendente = sock.pending() if hasattr(sock, 'pending') else 0
+            if not pendente and not select.select([sock], [], [], min(restante, 60))[0]:
+                continue
+            linha = imap.readline()
+            if not linha:
+                raise imaplib.IMAP4.abort('Conexão encerrada pelo servidor durante o IDLE')
+            logger.debug(f"IDLE: {linha!r}")
+            novos = linha.startswith(b'*') and linha.rstrip().upper().endswith(b'EXISTS')
+    finally:
+        imap.send(b'DONE\r\n')
+        # Descarta respostas até o fim do comando IDLE
+        while True:
+            linha = imap.readline()
+            if not linha:
+                raise imaplib.IMAP4.abort('Conexão encerrada pelo servidor durante o IDLE')
+            if linha.startswith(tag):
+                break
+    return novos
+
+def _encerrar(signum, frame):
+    raise KeyboardInterrupt
+
+def executar_continuo(workers=None):
+    """Modo contínuo: mantém a conexão IMAP em IDLE e processa emails assim que chegam
+
+    Reconecta com backoff exponencial (com variação aleatória) em qualquer falha
+    (rede, servidor IMAP, banco ou um email que não pôde ser interpretado); as
+    conexões com o banco vêm de um pool mantido durante toda a execução.
+    """
+    # O pipeline usa duas conexões ao mesmo tempo: a da leitura (pré-filtro) e a da escrita
+    pool = criar_pool_banco(max(DB_POOL_SIZE, 2 if workers and workers > 1 else 1))
+    espera = RECONNECT_MIN_DELAY
+    
+    # SIGTERM (supervisor/systemd) encerra como Ctrl+C, fechando a sessão IMAP
+    signal.signal(signal.SIGTERM, _encerrar)
+    
+    while True:
+        imap = None
+        try:
+            imap = conectar_imap()
+            suporta_idle = 'IDLE' in imap.capabilities
+            if not suporta_idle:
+                logger.warning(f"Servidor sem suporte a IDLE, consultando a cada {POLL_INTERVAL}s")
+            
+            while True:
+                sincronizar_caixa(imap, lambda: obter_conexao(pool), workers)
+                espera = RECONNECT_MIN_DELAY
+                
+                if suporta_idle:
+                    if aguardar_idle(imap):
+                        logger.info("Novo email anunciado pelo servidor")
+                else:
+                    time.sleep(POLL_INTERVAL)
+                    imap.noop()
+        except KeyboardInterrupt:
+            logger.info("Modo contínuo encerrado")
+            break
+        except Exception as e:
+            # Inclui RuntimeError de FETCH recusado e erros de interpretação: o daemon não para
+            atraso = espera + random.uniform(0, espera / 2)
+            logger.exception(f"Falha no modo contínuo ({e}); nova tentativa em {atraso:.0f}s")
+            time.sleep(atraso)
+            espera = min(espera * 2, RECONNECT_MAX_DELAY)
+        finally:
+            if imap is not None:
+                try:
+                    imap.logout()
+                except Exception:
+                    pass
+
+def carregar_contas_empresas(conn):
+    """Lê as contas IMAP das empresas ativas (chave "imap" de companies.settings)
+
+    A chave é gravada pelo formulário de edição da empresa (CompanyController@update,
+    card "E-mails do INSS"). Formato: {"imap": {"host", "port", "username",
+    "password", "mailbox", "ssl"}};
+    empresas sem host, usuário ou senha são ignoradas, assim como uma caixa já
+    atribuída a outra empresa.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id, settings FROM companies WHERE is_active = 1 AND settings IS NOT NULL ORDER BY id")
+        linhas = cursor.fetchall()
+    finally:
+        cursor.close()
+    
+    contas = {}
+    for id_empresa, settings in linhas:
+        try:
+            config = json.loads(settings) if isinstance(settings, (str, bytes, bytearray)) else settings
+            imap = config.get('imap') if isinstance(config, dict) else None
+        except ValueError:
+            logger.warning(f"Empresa {id_empresa}: settings não é um JSON válido")
+            continue
+        if not isinstance(imap, dict) or not all(imap.get(campo) for campo in ('host', 'username', 'password')):
+            continue
         
-        # Fechar conexões
+        ssl = imap.get('ssl', True)
+        conta = {
+            'id_empresa': id_empresa,
+            'servidor': imap['host'],
+            'porta': int(imap.get('port') or (993 if ssl else 143)),
+            'ssl': bool(ssl),
+            'usuario': imap['username'],
+            'senha': imap['password'],
+            'caixa': imap.get('mailbox') or 'INBOX',
+        }
+        chave = chave_caixa(conta['usuario'], conta['servidor'], conta['caixa'])
+        if chave in contas:
+            logger.warning(f"Empresa {id_empresa}: caixa {chave} já usada pela empresa "
+                           f"{contas[chave]['id_empresa']}, ignorada")
+            continue
+        contas[chave] = conta
+    
+    logger.info(f"{len(contas)} empresas com caixa de email configurada")
+    return contas
+
+def sincronizar_conta(conta):
+    """Conecta à caixa de uma empresa, processa os emails novos e encerra a sessão
+
+    Executado numa thread do modo multiempresa; cada sincronização com emails novos
+    abre a própria conexão com o banco.
+    """
+    threading.current_thread().name = f"empresa-{conta['id_empresa']}"
+    imap = conectar_imap(conta)
+    try:
+        return sincronizar_caixa(imap, conectar_banco, conta=conta)
+    finally:
+        try:
+            imap.logout()
+        except Exception:
+            pass
+
+async def sincronizar_empresa(conta, limites):
+    """Sincroniza a caixa de uma empresa sem passar do limite de conexões do servidor
+
+    Falhas são registradas e não interrompem as demais empresas. Retorna o número
+    de emails salvos.
+    """
+    limite = limites.setdefault(conta['servidor'], asyncio.Semaphore(IMAP_CONEXOES_POR_HOST))
+    async with limite:
+        try:
+            return await asyncio.to_thread(sincronizar_conta, conta)
+        except Exception as e:
+            logger.error(f"Erro ao sincronizar a empresa {conta['id_empresa']} "
+                         f"({conta['usuario']}@{conta['servidor']}): {e}")
+            return 0
+
+async def acompanhar_empresa(conta, limites):
+    """Consulta a caixa de uma empresa a cada POLL_INTERVAL segundos
+
+    Consulta em vez de IDLE: uma sessão IDLE por empresa ocuparia permanentemente
+    as conexões limitadas por IMAP_CONEXOES_POR_HOST.
+    """
+    while True:
+        await sincronizar_empresa(conta, limites)
+        await asyncio.sleep(POLL_INTERVAL)
+
+def ler_contas_empresas():
+    """Conecta ao banco e lê as contas das empresas ativas"""
+    conn = conectar_banco()
+    try:
+        return carregar_contas_empresas(conn)
+    finally:
         conn.close()
-        imap.logout()
+
+async def executar_empresas(continuo=False):
+    """Modo multiempresa: sincroniza as caixas de todas as empresas ativas ao mesmo tempo
+
+    Cada sincronização roda numa thread (imaplib é bloqueante) coordenada pelo
+    asyncio; no máximo IMAP_CONEXOES_POR_HOST sessões por servidor ficam abertas.
+    No modo contínuo cada caixa é consultada a cada POLL_INTERVAL e a lista de
+    empresas é recarregada a cada EMPRESAS_RELOAD_INTERVAL.
+    """
+    limites = {}
+    tarefas = {}
+    loop = asyncio.get_running_loop()
+    executor = None
+    threads = 0
+    try:
+        while True:
+            try:
+                # A primeira leitura acontece antes de qualquer tarefa e pode bloquear
+                contas = await asyncio.to_thread(ler_contas_empresas) if executor else ler_contas_empresas()
+            except (OSError, mysql.connector.Error) as e:
+                if not continuo or not executor:
+                    raise
+                logger.error(f"Erro ao carregar as empresas ({e}); mantendo as caixas atuais")
+                contas = {chave: conta for chave, (conta, _) in tarefas.items()}
+            
+            # Threads suficientes para ocupar todas as conexões permitidas (+1 para
+            # recarregar as empresas); o executor padrão do asyncio teria no máximo 32
+            por_servidor = {}
+            for conta in contas.values():
+                por_servidor[conta['servidor']] = por_servidor.get(conta['servidor'], 0) + 1
+            necessarias = sum(min(total, IMAP_CONEXOES_POR_HOST) for total in por_servidor.values()) + 1
+            if necessarias > threads:
+                anterior = executor
+                threads = necessarias
+                executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='inss')
+                loop.set_default_executor(executor)
+                if anterior is not None:
+                    anterior.shutdown(wait=False)
+            
+            if not continuo:
+                salvos = await asyncio.gather(*(sincronizar_empresa(conta, limites) for conta in contas.values()))
+                logger.info(f"{len(contas)} empresas sincronizadas, {sum(salvos)} emails processados")
+                return sum(salvos)
+            
+            # Caixas removidas ou com configuração alterada são reiniciadas
+            for chave, (conta, tarefa) in list(tarefas.items()):
+                if contas.get(chave) != conta:
+                    tarefa.cancel()
+                    del tarefas[chave]
+            for chave, conta in contas.items():
+                if chave not in tarefas:
+                    logger.info(f"Acompanhando a caixa {chave} da empresa {conta['id_empresa']}")
+                    tarefas[chave] = (conta, asyncio.create_task(acompanhar_empresa(conta, limites)))
+            
+            await asyncio.sleep(EMPRESAS_RELOAD_INTERVAL)
+    finally:
+        for _, tarefa in tarefas.values():
+            tarefa.cancel()
+
+def configurar_logging():
+    """Configura o log no console e em LOG_FILE (no main: importar o módulo não cria arquivos)"""
+    handlers = [logging.StreamHandler()]
+    try:
+        os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+        handlers.append(logging.FileHandler(LOG_FILE))
+    except OSError as e:
+        print(f"Sem log em arquivo ({LOG_FILE}): {e}", file=sys.stderr)
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(asctime)s - %(levelname)s - [%(threadName)s] %(message)s',
+        handlers=handlers
+    )
+
+def main():
+    configurar_logging()
+    logger.info("Iniciando processamento de emails")
+    parser = argparse.ArgumentParser(description='Importa os despachos do INSS recebidos por email')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Modo contínuo: aguarda novos emails via IMAP IDLE e os processa em segundos')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('INSS_WORKERS', 0)),
+                        help='Processos para interpretar emails em pipeline (download, processamento e '
+                             'gravação simultâneos); 0 ou 1 processa sequencialmente')
+    parser.add_argument('--empresas', action='store_true',
+                        help='Processa em paralelo as caixas de todas as empresas ativas (companies.settings '
+                             '-> imap), marcando cada despacho com o id_empresa; com --daemon consulta as '
+                             'caixas continuamente')
+    parser.add_argument('--importar', nargs='+', metavar='CAMINHO',
+                        help='Importa de arquivos locais em vez do IMAP: mbox, Maildir, arquivo .eml ou '
+                             'diretório de .eml')
+    parser.add_argument('--id-empresa', type=int,
+                        help='Empresa associada aos despachos importados com --importar (padrão: $INSS_ID_EMPRESA)')
+    args = parser.parse_args()
+    
+    # despachos.id_empresa é NOT NULL: sem empresa todos os INSERTs falhariam
+    if args.importar and args.id_empresa is None:
+        args.id_empresa = CONTA_PADRAO['id_empresa']
+        if args.id_empresa is None:
+            parser.error('--importar requer --id-empresa ou $INSS_ID_EMPRESA')
+    elif not args.empresas and CONTA_PADRAO['id_empresa'] is None:
+        parser.error('$INSS_ID_EMPRESA não definida: informe a empresa dos despachos da conta padrão '
+                     '(ou use --empresas)')
+    
+    if args.importar:
+        conn = conectar_banco()
+        try:
+            total = sum(importar_arquivo(caminho, conn, args.id_empresa, args.workers) for caminho in args.importar)
+        finally:
+            conn.close()
+        logger.info(f"Importação concluída: {total} despachos gravados")
+        return
+    
+    if args.empresas:
+        signal.signal(signal.SIGTERM, _encerrar)
+        try:
+            asyncio.run(executar_empresas(continuo=args.daemon))
+        except KeyboardInterrupt:
+            logger.info("Modo multiempresa encerrado")
+        return
+    
+    if args.daemon:
+        executar_continuo(args.workers)
+        return
+    
+    try:
+        imap = conectar_imap()
+        try:
+            sincronizar_caixa(imap, conectar_banco, args.workers)
+        finally:
+            imap.logout()
         logger.info("Processamento concluído com sucesso")
 
     except Exception as e:
@@ -6,5 +6,9 @@ PROJECT_DIR="/var/www/previdia.com.br"
 # Vai para o diretório do projeto
 cd $PROJECT_DIR
 
+# Empresa dos despachos da conta padrão (id_empresa é obrigatório em despachos);
+# padrão: empresa 2, o escritório da integração AdvBox (ajuste se a caixa for de outra)
+export INSS_ID_EMPRESA="${INSS_ID_EMPRESA:-2}"
+
 # Executa o script Python
 /usr/bin/python3 $PROJECT_DIR/scripts/process_inss_emails.py >> $PROJECT_DIR/storage/logs/cron_inss_emails.log 2>&1 
\ No newline at end of file
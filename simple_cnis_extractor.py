@@ -4,62 +4,221 @@ Extrator de dados do CNIS usando Python - Versão Simplificada
 Usa apenas bibliotecas básicas do Python para extrair informações do CNIS
 """
 
+import os
 import sys
 import json
 import re
+import time
 import argparse
+import threading
+import socketserver
+from contextlib import nullcontext, redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from itertools import repeat
+from typing import BinaryIO, Callable, Dict, List, Any, Optional, Iterable, Iterator, Set
 import logging
 
+from cnis_cache import CNISResultCache, file_digest
+from cnis_remuneracoes import RemuneracaoSeries
+from cnis_tempo_contribuicao import calcular_tempo_contribuicao, parse_data
+from cnis_metrics import ExtractionMetrics, metrics_enabled, profile_call
+from cnis_pdf_engines import (ENGINES, select_engine, resolve_engine_name, iter_pages_with, extract_pages_with,
+                              benchmark_engines)
+from cnis_preflight import preflight_enabled, preflight_pdf
+from cnis_text_artifact import (TextArtifact, TextArtifactWriter, artifact_path, is_text_input,
+                                iter_text_file_pages, text_artifacts_enabled)
+
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Versão do extrator: altere sempre que o formato ou a lógica do resultado mudar
+# (invalida os resultados armazenados no cache)
+EXTRACTOR_VERSION = '1.5'
+
+# Classificador de linhas do CNIS: cada linha é etiquetada uma única vez
+LINE_VINCULO = 'vinculo'              # cabeçalho de vínculo: sempre abre nova seção
+LINE_VINCULO_PARCIAL = 'vinculo_parcial'  # parece cabeçalho: só abre seção dentro de outra
+LINE_FIM_SECAO = 'fim_secao'          # Relações Previdenciárias, Valores Consolidados, Legenda, TOTAIS
+LINE_REMUNERACAO = 'remuneracao'      # linha da tabela de remunerações (MM/AAAA valor ...)
+LINE_DATA = 'data'                    # linha contendo uma data DD/MM/AAAA
+LINE_OUTRA = 'outra'
+
+# Variantes do cabeçalho de vínculo
+VARIANTE_CNPJ = 'cnpj'                # CNPJ completo
+VARIANTE_CNPJ_RAIZ = 'cnpj_raiz'      # apenas os 8 primeiros dígitos do CNPJ
+VARIANTE_INDETERMINADO = 'indeterminado'
+VARIANTE_AGRUPAMENTO = 'agrupamento'  # AGRUPAMENTO DE CONTRATANTES/COOPERATIVAS
+
+_RE_LINHA = re.compile(
+    r'\d+\s+(?:'
+    r'(?P<agrupamento>AGRUPAMENTO\s+DE\s+CONTRATANTES/COOPERATIVAS\s+Contribuinte\s+Individual)'
+    r'|(?P<indeterminado>Indeterminado)(?=\s)'
+    r'|(?P<cnpj>\d{2}\.\d{3}\.\d{3})(?P<filial>/\d{4}-\d{2})?'
+    r')'
+    r'|(?P<fim_secao>Relações\s+Previdenciárias|Valores\s+Consolidados|Legenda|TOTAIS)'
+    r'|(?P<remuneracao>\d{2}/\d{4}\s+[\d.,]+)'
+    r'|(?P<data>.*?\d{2}/\d{2}/\d{4})'
+)
+# Nome da empresa logo após o identificador do cabeçalho
+_RE_NOME_ESPACADO = re.compile(r'\s+[A-Z]')
+_RE_NOME_OPCIONAL = re.compile(r'\s*[A-Z]')
+# O nome começa no primeiro caractere após os espaços: sem retrocesso sobre eles
+_RE_NOME_ATE_CATEGORIA = re.compile(r'\s+(\S.*?)(?:Empregado|Contribuinte)')
+_RE_NOME_COLADO = re.compile(r'[A-Z].+')
+_RE_AGRUPAMENTO_DATAS = re.compile(r'\s+(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})')
+
+_RE_CNPJ_QUALQUER = re.compile(r'(\d{2}\.\d{3}\.\d{3}(?:/\d{4}-\d{2})?)')
+_RE_PUBLICO_DATAS = re.compile(r'Público\s*(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4}|\d{2}/\d{4})')
+_RE_PUBLICO_DATA = re.compile(r'Público\s*(\d{2}/\d{2}/\d{4})')
+_RE_MES_ANO = re.compile(r'^\d{2}/\d{4}$')
+_RE_DATA = re.compile(r'\d{2}/\d{2}/\d{4}')
+_RE_NAO_VINCULO = re.compile(r'AUXILIO\s+DOENCA|APOSENTADORIA|BENEFICIO|^\d+\s*-\s*')
+_RE_DATA_NASCIMENTO = re.compile(r'Data\s+de\s+nascimento[:\s]*(\d{2}/\d{2}/\d{4})', re.IGNORECASE)
+_RE_DATA_RELATORIO = re.compile(r'(\d{2}/\d{2}/\d{4})\s+\d{2}:\d{2}:\d{2}')
+# Nome do segurado: prefixo NIT + CPF + Nome e letras até "Data de nascimento" (ou o
+# fim do texto). As letras são lidas por uma sequência gulosa e o rótulo é procurado
+# só dentro dela, em vez de testá-lo a cada caractere de uma repetição preguiçosa
+_RE_NOME_PREFIXO = re.compile(
+    r'NIT[:\s]*[\d.-]+\s+CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+Nome[:\s]*', re.IGNORECASE
+)
+_RE_NOME_LETRAS = re.compile(r'[A-ZÁÊÇÕ][A-ZÁÊÇÕa-záêçõ\s]+', re.IGNORECASE)
+_RE_ROTULO_NASCIMENTO = re.compile(r'(?<=\s)Data\s+de\s+nascimento', re.IGNORECASE)
+
+def find_nome(text: str) -> Optional[str]:
+    """Texto do nome do segurado no primeiro cabeçalho NIT/CPF/Nome válido, em tempo linear"""
+    for prefix in _RE_NOME_PREFIXO.finditer(text):
+        letters = _RE_NOME_LETRAS.match(text, prefix.end())
+        if not letters:
+            continue
+        # Como em [...]+?, o nome tem ao menos dois caracteres antes do espaço do rótulo
+        label = _RE_ROTULO_NASCIMENTO.search(text, letters.start() + 3, letters.end())
+        if label:
+            return text[letters.start():label.start()]
+        if letters.end() == len(text):
+            return letters.group(0)
+    return None
+
+def classify_line(line: str):
+    """Etiqueta uma linha (já sem espaços nas pontas) com uma única busca
+
+    Retorna (etiqueta, variante, match); variante e match só são preenchidos
+    para cabeçalhos de vínculo.
+    """
+    match = _RE_LINHA.match(line)
+    if match is None:
+        return LINE_OUTRA, None, None
+
+    if match.group('agrupamento'):
+        return LINE_VINCULO, VARIANTE_AGRUPAMENTO, match
+    if match.group('indeterminado'):
+        tag = LINE_VINCULO if _RE_NOME_ESPACADO.match(line, match.end()) else LINE_VINCULO_PARCIAL
+        return tag, VARIANTE_INDETERMINADO, match
+    if match.group('filial'):
+        # Nome separado por espaço ou colado ao CNPJ (linha truncada)
+        tag = LINE_VINCULO if _RE_NOME_OPCIONAL.match(line, match.end()) else LINE_VINCULO_PARCIAL
+        return tag, VARIANTE_CNPJ, match
+    if match.group('cnpj'):
+        tag = LINE_VINCULO if _RE_NOME_ESPACADO.match(line, match.end()) else LINE_VINCULO_PARCIAL
+        return tag, VARIANTE_CNPJ_RAIZ, match
+
+    return match.lastgroup, None, None
+
+# Número mínimo de páginas para distribuir a extração de texto entre processos
+PARALLEL_PAGES_THRESHOLD = int(os.getenv('CNIS_PARALLEL_PAGES_THRESHOLD', 40))
+# Páginas por tarefa na extração paralela (limita o texto retido em memória)
+PARALLEL_CHUNK_PAGES = 16
+
 class CNISExtractorSimple:
     """Classe para extração de dados do CNIS usando Python básico"""
     
-    def __init__(self):
-        """Inicializa o extrator"""
+    def __init__(self, parallel_workers: Optional[int] = None, parallel_threshold: Optional[int] = None,
+                 cache: Optional[CNISResultCache] = None, engine: Optional[str] = None,
+                 metrics: Optional[bool] = None, time_budget: Optional[float] = None,
+                 page_budget: Optional[int] = None, text_artifacts: Optional[bool] = None,
+                 preflight: Optional[bool] = None):
+        """Inicializa o extrator
+
+        parallel_workers: processos usados na extração paralela por páginas (1 desativa)
+        parallel_threshold: número mínimo de páginas para usar a extração paralela
+        cache: cache de resultados indexado pelo hash do PDF (opcional)
+        engine: motor de PDF (padrão: $CNIS_PDF_ENGINE ou perfil do benchmark)
+        metrics: inclui o bloco de métricas no resultado (padrão: $CNIS_METRICS)
+        time_budget: segundos por documento antes do resultado parcial (padrão: $CNIS_TIME_BUDGET; 0 = sem limite)
+        page_budget: páginas lidas antes do resultado parcial (padrão: $CNIS_PAGE_BUDGET; 0 = sem limite)
+        text_artifacts: lê/grava o artefato de texto ao lado do PDF (padrão: $CNIS_TEXT_ARTIFACT)
+        preflight: verifica o PDF antes da extração e recusa os inválidos ou que não são CNIS (padrão: $CNIS_PREFLIGHT)
+        """
+        self.engine = engine
+        self.parallel_workers = parallel_workers or int(os.getenv('CNIS_PARALLEL_WORKERS', 0)) or os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold or PARALLEL_PAGES_THRESHOLD
+        self.cache = cache
+        self.collect_metrics = metrics_enabled() if metrics is None else metrics
+        self.time_budget = float(os.getenv('CNIS_TIME_BUDGET', 0)) if time_budget is None else time_budget
+        self.page_budget = int(os.getenv('CNIS_PAGE_BUDGET', 0)) if page_budget is None else page_budget
+        self.text_artifacts = text_artifacts_enabled() if text_artifacts is None else text_artifacts
+        self.preflight = preflight_enabled() if preflight is None else preflight
         logger.info("CNIS Extractor Simple inicializado")
     
+    def iter_text_pages(self, pdf_path: str, max_pages: Optional[int] = None) -> Iterator[str]:
+        """Gera o texto normalizado de cada página, em ordem, sem montar o documento inteiro
+
+        max_pages limita as páginas distribuídas na extração paralela (a sequencial
+        para assim que o consumidor deixa de pedir páginas).
+        """
+        engine = select_engine(self.engine)
+        page_count = engine.page_count(pdf_path) if self.parallel_workers > 1 else 0
+        if max_pages:
+            page_count = min(page_count, max_pages)
+        logger.info(f"Extraindo texto com {engine.name}")
+        
+        if self.should_extract_in_parallel(page_count):
+            yield from self.iter_pages_parallel(engine.name, pdf_path, page_count)
+        else:
+            yield from iter_pages_with(engine.name, pdf_path)
+    
     def extract_text_from_pdf(self, pdf_path: str) -> str:
-        """Extrai texto do PDF usando métodos básicos"""
+        """Extrai o texto do PDF com o motor selecionado, já normalizado"""
         try:
-            # Tenta usar PyPDF2 se disponível
-            try:
-                import PyPDF2
-                with open(pdf_path, 'rb') as file:
-                    reader = PyPDF2.PdfReader(file)
-                    text = ""
-                    for page in reader.pages:
-                        text += page.extract_text() + "\n"
-                logger.info("Texto extraído com PyPDF2")
-                return text
-            except ImportError:
-                logger.warning("PyPDF2 não encontrado, tentando pdfplumber")
-            
-            # Tenta usar pdfplumber se disponível
-            try:
-                import pdfplumber
-                text = ""
-                with pdfplumber.open(pdf_path) as pdf:
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
-                logger.info("Texto extraído com pdfplumber")
-                return text
-            except ImportError:
-                logger.warning("pdfplumber não encontrado")
-            
-            # Se nenhuma biblioteca estiver disponível, retorna erro
-            raise ImportError("Nenhuma biblioteca de PDF encontrada. Instale PyPDF2 ou pdfplumber")
-            
+            return ''.join(page + "\n" for page in self.iter_text_pages(pdf_path) if page)
         except Exception as e:
             logger.error(f"Erro ao extrair texto do PDF: {e}")
             return ""
     
+    def should_extract_in_parallel(self, page_count: int) -> bool:
+        """Decide se vale a pena distribuir as páginas entre processos"""
+        return self.parallel_workers > 1 and page_count >= self.parallel_threshold
+    
+    def iter_pages_parallel(self, engine_name: str, pdf_path: str, page_count: int) -> Iterator[str]:
+        """Extrai faixas de páginas em processos separados, gerando as páginas na ordem original"""
+        workers = min(self.parallel_workers, page_count)
+        chunk_size = min(-(-page_count // workers), PARALLEL_CHUNK_PAGES)
+        starts = list(range(0, page_count, chunk_size))
+        ends = [min(start + chunk_size, page_count) for start in starts]
+        logger.info(f"Extraindo {page_count} páginas em {workers} processos")
+        
+        next_page = 0
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                try:
+                    for pages in executor.map(extract_pages_with, repeat(engine_name), repeat(pdf_path), starts, ends):
+                        for page in pages:
+                            yield page
+                            next_page += 1
+                except GeneratorExit:
+                    # O consumidor parou (orçamento esgotado): descarta as faixas não iniciadas
+                    executor.shutdown(cancel_futures=True)
+                    raise
+        except (OSError, BrokenProcessPool) as e:
+            logger.warning(f"Extração paralela indisponível ({e}), extraindo sequencialmente")
+            yield from iter_pages_with(engine_name, pdf_path, next_page, page_count)
+    
+    def extract_pages_parallel(self, engine_name: str, pdf_path: str, page_count: int) -> List[str]:
+        """Extrai o texto por faixas de páginas em processos separados, mantendo a ordem"""
+        return list(self.iter_pages_parallel(engine_name, pdf_path, page_count))
+    
     def extract_personal_data(self, text: str) -> Dict[str, str]:
         """Extrai dados pessoais do texto"""
         personal_data = {}
@@ -76,23 +235,16 @@ class CNISExtractorSimple:
                 personal_data['cpf'] = match.group(1)
                 break
         
-        # Padrões para nome - usando a estrutura específica do CNIS
-        nome_patterns = [
-            # Padrão específico: NIT + CPF + Nome
-            r'NIT[:\s]*[\d\.-]+\s+CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+Nome[:\s]*([A-ZÁÊÇÕ][A-ZÁÊÇÕa-záêçõ\s]+?)(?:\s+Data\s+de\s+nascimento|$)',
-        ]
-        
-        for pattern in nome_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                nome = match.group(1).strip()
-                # Limpa caracteres indesejados
-                nome = re.sub(r'[0-9\-\_\.\(\)\[\]]', '', nome)
-                nome = re.sub(r'\s+', ' ', nome).strip()
-                
-                if len(nome) > 5 and ' ' in nome:
-                    personal_data['nome'] = nome.title()
-                    break
+        # Nome - usando a estrutura específica do CNIS (NIT + CPF + Nome)
+        nome = find_nome(text)
+        if nome:
+            nome = nome.strip()
+            # Limpa caracteres indesejados
+            nome = re.sub(r'[0-9\-\_\.\(\)\[\]]', '', nome)
+            nome = re.sub(r'\s+', ' ', nome).strip()
+            
+            if len(nome) > 5 and ' ' in nome:
+                personal_data['nome'] = nome.title()
         
         # Padrões para data de nascimento
         nasc_patterns = [
@@ -107,95 +259,114 @@ class CNISExtractorSimple:
         
         return personal_data
     
-    def extract_employment_data(self, text: str) -> List[Dict[str, str]]:
-        """Extrai dados de vínculos empregatícios"""
-        employments = []
-        
-        # Identifica datas que devem ser excluídas
-        exclude_dates = set()
-        
+    def find_excluded_dates(self, text: str, exclude_dates: Set[str]) -> None:
+        """Acrescenta a exclude_dates as datas que não pertencem a vínculos"""
         # Data de nascimento
-        nasc_match = re.search(r'Data\s+de\s+nascimento[:\s]*(\d{2}/\d{2}/\d{4})', text, re.IGNORECASE)
-        if nasc_match:
+        nasc_match = _RE_DATA_NASCIMENTO.search(text)
+        if nasc_match and nasc_match.group(1) not in exclude_dates:
             exclude_dates.add(nasc_match.group(1))
             logger.info(f"Data de nascimento identificada: {nasc_match.group(1)}")
         
         # Datas de geração do relatório
-        report_dates = re.findall(r'(\d{2}/\d{2}/\d{4})\s+\d{2}:\d{2}:\d{2}', text)
-        for date in report_dates:
-            exclude_dates.add(date)
-            logger.info(f"Data de geração do relatório identificada: {date}")
-        
-        # Divide o texto em seções de vínculos
-        sections = self.split_into_employment_sections(text)
-        
-        for section in sections:
-            employment = self.extract_employment_from_section(section, exclude_dates)
-            if employment and employment.get('empregador'):
-                employments.append(employment)
+        for date in _RE_DATA_RELATORIO.findall(text):
+            if date not in exclude_dates:
+                exclude_dates.add(date)
+                logger.info(f"Data de geração do relatório identificada: {date}")
+    
+    def extract_employment_data(self, text: str) -> List[Dict[str, str]]:
+        """Extrai dados de vínculos empregatícios"""
+        # Identifica datas que devem ser excluídas
+        exclude_dates = set()
+        self.find_excluded_dates(text, exclude_dates)
         
-        return employments
+        return list(self.iter_employments(text.split('\n'), exclude_dates))
     
-    def split_into_employment_sections(self, text: str) -> List[str]:
-        """Divide o texto em seções de vínculos empregatícios"""
-        sections = []
-        lines = text.split('\n')
+    def iter_lines(self, pages: Iterable[str]) -> Iterator[str]:
+        """Gera as linhas de cada página sem montar o texto do documento"""
+        for page in pages:
+            yield from page.split('\n')
+    
+    def iter_employment_sections(self, lines: Iterable[str],
+                                 on_orphan_line: Optional[Callable[[str, str], None]] = None) -> Iterator[List[str]]:
+        """Agrupa as linhas em seções de vínculo, gerando cada seção assim que ela termina
+
+        on_orphan_line recebe (linha, etiqueta) das linhas que ficam fora de qualquer seção.
+        """
         current_section = []
         
-        for i, line in enumerate(lines):
+        for line in lines:
             line = line.strip()
+            tag, _, _ = classify_line(line)
             
-            # Identifica início de uma seção de vínculo (AMPLIADO para capturar todos)
-            is_start_of_section = (
-                # Padrão: número + CNPJ completo + nome da empresa
-                re.match(r'^\d+\s+\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}\s+[A-Z]', line) or
-                # Padrão: número + CNPJ incompleto (apenas 8 primeiros dígitos) + nome da empresa
-                re.match(r'^\d+\s+\d{2}\.\d{3}\.\d{3}\s+[A-Z]', line) or
-                # Padrão: número + "Indeterminado" + nome da empresa
-                re.match(r'^\d+\s+Indeterminado\s+[A-Z]', line) or
-                # Padrão: número + CNPJ + nome truncado (sem "Empregado")
-                re.match(r'^\d+\s+\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}[A-Z]', line) or
-                # Padrão: número + AGRUPAMENTO DE CONTRATANTES (vínculo real)
-                re.match(r'^\d+\s+AGRUPAMENTO\s+DE\s+CONTRATANTES/COOPERATIVAS\s+Contribuinte\s+Individual', line)
-            )
-            
-            if is_start_of_section:
-                # Salva a seção anterior se existir
+            # Cabeçalho de vínculo abre nova seção; cabeçalho parcial só dentro de outra seção
+            if tag == LINE_VINCULO or (tag == LINE_VINCULO_PARCIAL and current_section):
                 if current_section:
-                    sections.append('\n'.join(current_section))
+                    yield current_section
                 current_section = [line]
             elif current_section:
                 current_section.append(line)
                 
-                # Identifica fim da seção
-                if (re.match(r'^Relações\s+Previdenciárias', line) or
-                    re.match(r'^Valores\s+Consolidados', line) or
-                    re.match(r'^Legenda', line) or
-                    re.match(r'^TOTAIS', line) or
-                    # Nova seção começando
-                    re.match(r'^\d+\s+\d{2}\.\d{3}\.\d{3}', line) or
-                    re.match(r'^\d+\s+Indeterminado\s+', line) or
-                    re.match(r'^\d+\s+AGRUPAMENTO\s+DE\s+CONTRATANTES/COOPERATIVAS\s+Contribuinte\s+Individual', line)):
-                    
-                    if (re.match(r'^\d+\s+\d{2}\.\d{3}\.\d{3}', line) or
-                        re.match(r'^\d+\s+Indeterminado\s+', line) or
-                        re.match(r'^\d+\s+AGRUPAMENTO\s+DE\s+CONTRATANTES/COOPERATIVAS\s+Contribuinte\s+Individual', line)):
-                        # Nova seção começando, remove esta linha da atual
-                        current_section.pop()
-                        sections.append('\n'.join(current_section))
-                        current_section = [line]
-                    else:
-                        sections.append('\n'.join(current_section))
-                        current_section = []
+                if tag == LINE_FIM_SECAO:
+                    yield current_section
+                    current_section = []
+            elif on_orphan_line is not None:
+                on_orphan_line(line, tag)
         
-        # Adiciona a última seção se existir
+        # Última seção, se existir
         if current_section:
-            sections.append('\n'.join(current_section))
+            yield current_section
+    
+    def iter_employments(self, lines: Iterable[str], exclude_dates: Set[str],
+                         metrics: Optional[ExtractionMetrics] = None) -> Iterator[Dict[str, Any]]:
+        """Gera cada vínculo assim que sua seção é fechada
+
+        O vínculo é retido até o início da próxima seção: linhas de remuneração que
+        continuam na página seguinte, depois do fim da seção, ainda são anexadas a ele.
+        metrics (opcional) recebe o tempo de divisão em seções e de leitura dos vínculos.
+        """
+        pending = None
+        target = None
+        
+        def on_orphan_line(line: str, tag: str) -> None:
+            if tag == LINE_REMUNERACAO and target is not None:
+                target['remuneracoes'].add_line(line)
         
-        return sections
+        sections = self.iter_employment_sections(lines, on_orphan_line)
+        if metrics:
+            sections = metrics.timed(sections, 'sections', 'sections')
+        
+        for section_lines in sections:
+            with metrics.stage('employment_parsing') if metrics else nullcontext():
+                employment = self.extract_employment_from_lines(section_lines, exclude_dates)
+            if employment and employment.get('empregador'):
+                if pending is not None:
+                    yield self.finalize_employment(pending)
+                pending = employment
+                target = employment
+            else:
+                target = None
+        
+        if pending is not None:
+            yield self.finalize_employment(pending)
+    
+    def finalize_employment(self, employment: Dict[str, Any]) -> Dict[str, Any]:
+        """Converte a série de remunerações do vínculo para a codificação JSON"""
+        series = employment.get('remuneracoes')
+        if isinstance(series, RemuneracaoSeries):
+            employment['remuneracoes'] = series.to_json()
+        return employment
+    
+    def split_into_employment_sections(self, text: str) -> List[str]:
+        """Divide o texto em seções de vínculos empregatícios"""
+        return ['\n'.join(section) for section in self.iter_employment_sections(text.split('\n'))]
     
     def extract_employment_from_section(self, section: str, exclude_dates: set) -> Optional[Dict[str, str]]:
         """Extrai dados de um vínculo empregatício de uma seção"""
+        employment = self.extract_employment_from_lines(section.split('\n'), exclude_dates)
+        return self.finalize_employment(employment) if employment else None
+    
+    def extract_employment_from_lines(self, lines: List[str], exclude_dates: set) -> Optional[Dict[str, str]]:
+        """Extrai dados de um vínculo empregatício das linhas de uma seção"""
         employment = {
             'empregador': '',
             'cnpj': '',
@@ -203,62 +374,54 @@ class CNISExtractorSimple:
             'data_fim': ''
         }
         
-        lines = section.split('\n')
-        
         # Extrai informações básicas da primeira linha
         first_line = lines[0].strip() if lines else ""
+        _, variante, header = classify_line(first_line)
+        is_agrupamento = False
         
-        # Padrão para linha com CNPJ completo e nome da empresa
-        emp_match = re.match(r'^\d+\s+(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})\s+(.+?)(?:Empregado|Contribuinte)', first_line)
-        if emp_match:
-            employment['cnpj'] = emp_match.group(1)
-            empregador = emp_match.group(2).strip()
-            employment['empregador'] = empregador
-        
-        # Padrão para linha com CNPJ incompleto (apenas 8 primeiros dígitos)
-        if not employment['empregador']:
-            emp_match = re.match(r'^\d+\s+(\d{2}\.\d{3}\.\d{3})\s+(.+?)(?:Empregado|Contribuinte)', first_line)
+        if variante in (VARIANTE_CNPJ, VARIANTE_CNPJ_RAIZ):
+            cnpj = header.group('cnpj') + (header.group('filial') or '')
+            # Nome da empresa até a categoria do filiado
+            emp_match = _RE_NOME_ATE_CATEGORIA.match(first_line, header.end())
             if emp_match:
-                employment['cnpj'] = emp_match.group(1)
-                empregador = emp_match.group(2).strip()
-                employment['empregador'] = empregador
+                employment['cnpj'] = cnpj
+                employment['empregador'] = emp_match.group(1).strip()
+            
+            # Linha truncada (CNPJ + nome sem espaço)
+            if not employment['empregador'] and variante == VARIANTE_CNPJ:
+                emp_match = _RE_NOME_COLADO.match(first_line, header.end())
+                if emp_match:
+                    employment['cnpj'] = cnpj
+                    employment['empregador'] = emp_match.group(0).strip()
         
-        # Padrão para linha com "Indeterminado"
-        if not employment['empregador']:
-            emp_match = re.match(r'^\d+\s+Indeterminado\s+(.+?)(?:Empregado|Contribuinte)', first_line)
+        elif variante == VARIANTE_INDETERMINADO:
+            emp_match = _RE_NOME_ATE_CATEGORIA.match(first_line, header.end())
             if emp_match:
                 employment['cnpj'] = 'Indeterminado'
-                empregador = emp_match.group(1).strip()
-                employment['empregador'] = empregador
+                employment['empregador'] = emp_match.group(1).strip()
         
-        # Padrão para linha truncada (CNPJ + nome sem espaço)
-        if not employment['empregador']:
-            emp_match = re.match(r'^\d+\s+(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})([A-Z].+)', first_line)
-            if emp_match:
-                employment['cnpj'] = emp_match.group(1)
-                empregador = emp_match.group(2).strip()
-                employment['empregador'] = empregador
-        
-        # Padrão para AGRUPAMENTO DE CONTRATANTES/COOPERATIVAS
-        agrup_match = re.match(r'^\d+\s+AGRUPAMENTO\s+DE\s+CONTRATANTES/COOPERATIVAS\s+Contribuinte\s+Individual\s+(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})', first_line)
-        if agrup_match:
-            employment['empregador'] = "AGRUPAMENTO DE CONTRATANTES"
-            employment['data_inicio'] = agrup_match.group(1)
-            employment['data_fim'] = agrup_match.group(2)
-            
-            # Procura CNPJ nas linhas subsequentes
-            for line in lines[1:]:
-                cnpj_match = re.search(r'(\d{2}\.\d{3}\.\d{3}(?:/\d{4}-\d{2})?)', line)
-                if cnpj_match:
-                    employment['cnpj'] = cnpj_match.group(1)
-                    break
+        elif variante == VARIANTE_AGRUPAMENTO:
+            # AGRUPAMENTO DE CONTRATANTES/COOPERATIVAS com datas na mesma linha
+            agrup_match = _RE_AGRUPAMENTO_DATAS.match(first_line, header.end())
+            if agrup_match:
+                is_agrupamento = True
+                employment['empregador'] = "AGRUPAMENTO DE CONTRATANTES"
+                employment['data_inicio'] = agrup_match.group(1)
+                employment['data_fim'] = agrup_match.group(2)
+                
+                # Procura CNPJ nas linhas subsequentes
+                for line in lines[1:]:
+                    cnpj_match = _RE_CNPJ_QUALQUER.search(line)
+                    if cnpj_match:
+                        employment['cnpj'] = cnpj_match.group(1)
+                        break
         
         # Se não é agrupamento, extrai datas de vínculo da segunda linha
-        if not agrup_match and len(lines) > 1:
+        if not is_agrupamento and len(lines) > 1:
             second_line = lines[1].strip()
             
             # Padrão: Público + data início + data fim + outras informações
-            date_match = re.search(r'Público\s*(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4}|\d{2}/\d{4})', second_line)
+            date_match = _RE_PUBLICO_DATAS.search(second_line)
             if date_match:
                 data_inicio = date_match.group(1)
                 data_fim_raw = date_match.group(2)
@@ -268,7 +431,7 @@ class CNISExtractorSimple:
                     employment['data_inicio'] = data_inicio
                 
                 # Se a data fim é apenas MM/YYYY, converte para DD/MM/YYYY
-                if re.match(r'^\d{2}/\d{4}$', data_fim_raw):
+                if _RE_MES_ANO.match(data_fim_raw):
                     data_fim = self.convert_month_year_to_full_date(data_fim_raw)
                 else:
                     data_fim = data_fim_raw
@@ -277,7 +440,7 @@ class CNISExtractorSimple:
                     employment['data_fim'] = data_fim
             else:
                 # Padrão alternativo: apenas data de início
-                date_match = re.search(r'Público\s*(\d{2}/\d{2}/\d{4})', second_line)
+                date_match = _RE_PUBLICO_DATA.search(second_line)
                 if date_match:
                     data_inicio = date_match.group(1)
                     if data_inicio not in exclude_dates:
@@ -285,12 +448,12 @@ class CNISExtractorSimple:
                         employment['data_fim'] = ''  # Vínculo ativo, sem data fim
         
         # Se não encontrou as datas, procura em outras linhas (apenas para vínculos normais)
-        if not employment['data_inicio'] and not agrup_match:
+        if not employment['data_inicio'] and not is_agrupamento:
             for line in lines[1:]:
                 line = line.strip()
                 
                 # Procura por padrões de datas
-                dates_in_line = re.findall(r'\d{2}/\d{2}/\d{4}', line)
+                dates_in_line = _RE_DATA.findall(line)
                 
                 # Filtra datas que devem ser excluídas
                 valid_dates = [d for d in dates_in_line if d not in exclude_dates]
@@ -310,8 +473,7 @@ class CNISExtractorSimple:
         
         # Filtro para excluir itens que NÃO são vínculos empregatícios
         empregador_upper = employment['empregador'].upper()
-        if (re.search(r'AUXILIO\s+DOENCA|APOSENTADORIA|BENEFICIO', empregador_upper) or
-            re.search(r'^\d+\s*-\s*', empregador_upper)):
+        if _RE_NAO_VINCULO.search(empregador_upper):
             return None
         
         # Limpa empregador
@@ -321,6 +483,9 @@ class CNISExtractorSimple:
         if not employment['data_fim']:
             employment['data_fim'] = ''
         
+        # Tabela de remunerações por competência (série compacta)
+        employment['remuneracoes'] = RemuneracaoSeries.from_lines(lines[1:])
+        
         return employment
     
     def convert_month_year_to_full_date(self, month_year: str) -> str:
@@ -351,70 +516,607 @@ class CNISExtractorSimple:
         
         return month_year
     
-    def process_cnis(self, pdf_path: str) -> Dict[str, Any]:
-        """Processa o arquivo CNIS e extrai todos os dados"""
+    def budget_exceeded(self, pages_read: int, started: float) -> Optional[str]:
+        """Orçamento do documento esgotado antes da próxima página: 'pages', 'time' ou None"""
+        if self.page_budget and pages_read >= self.page_budget:
+            return 'pages'
+        # A primeira página é sempre lida: o resultado parcial nunca fica vazio
+        if self.time_budget and pages_read and time.perf_counter() - started > self.time_budget:
+            return 'time'
+        return None
+    
+    def open_text_artifact(self, pdf_path: str, digest: str, engine_name: str) -> Optional[TextArtifactWriter]:
+        """Abre o artefato de texto ao lado do PDF (falha de escrita não interrompe a extração)"""
+        path = artifact_path(pdf_path)
+        try:
+            return TextArtifactWriter(path, digest, engine_name)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar o artefato de texto {path}: {e}")
+            return None
+    
+    def process_cnis(self, pdf_path: str, preflight: Optional[bool] = None) -> Dict[str, Any]:
+        """Processa o arquivo CNIS e extrai todos os dados
+
+        pdf_path também pode ser texto já extraído: um artefato (.cnistext.gz) ou
+        um .txt com as páginas separadas por \\f. Com artefatos ligados, o texto
+        de um PDF já processado vem do artefato e o de um PDF novo é gravado nele.
+
+        Com orçamento de tempo ou de páginas, o documento que o excede é interrompido
+        na fronteira de página e o resultado traz partial=True e partial_reason.
+
+        Com preflight (padrão: o do extrator), um PDF fora do cache e sem artefato é
+        verificado pela primeira página antes da extração: se for inválido ou um laudo
+        médico, o resultado é success=False com o bloco preflight (status e document_type).
+        """
+        preflight = self.preflight if preflight is None else preflight
+        started = time.perf_counter()
+        metrics = ExtractionMetrics() if self.collect_metrics else None
+        writer: Optional[TextArtifactWriter] = None
         try:
             logger.info(f"Processando arquivo: {pdf_path}")
             
-            # Extrai texto do PDF
-            text = self.extract_text_from_pdf(pdf_path)
+            text_input = is_text_input(pdf_path)
+            use_artifact = self.text_artifacts and not text_input
+            
+            # O motor entra na chave do cache: motores diferentes produzem textos diferentes.
+            # Só o nome é resolvido aqui; a biblioteca é importada depois de um cache miss
+            engine_name = 'text' if text_input else resolve_engine_name(self.engine)
+            
+            # Consulta o cache antes de abrir o PDF
+            digest = None
+            if self.cache or use_artifact:
+                with metrics.stage('digest') if metrics else nullcontext():
+                    digest = file_digest(pdf_path)
+            if self.cache:
+                with metrics.stage('cache') if metrics else nullcontext():
+                    cached = self.cache.get(digest, engine_name)
+                if cached is not None:
+                    logger.info(f"Resultado obtido do cache ({digest[:12]})")
+                    if metrics:
+                        metrics.info['cache_hit'] = True
+                        cached['metrics'] = metrics.finish()
+                    return cached
+            
+            # Texto do artefato dispensa o motor de PDF
+            with metrics.stage('text_artifact') if metrics and use_artifact else nullcontext():
+                artifact = TextArtifact.for_pdf(pdf_path, digest, engine_name) if use_artifact else None
+            if not text_input and artifact is None:
+                # Importação da biblioteca de PDF (a primeira do processo é a mais cara)
+                with metrics.stage('engine_load') if metrics else nullcontext():
+                    engine = select_engine(self.engine)
+                    engine.load()
+                # Biblioteca instalada mas que não importa: o motor usado é outro
+                engine_name = engine.name
+                
+                if preflight:
+                    # Mesmo processo e motor já carregado: só a primeira página é lida a mais
+                    with metrics.stage('preflight') if metrics else nullcontext():
+                        check = preflight_pdf(pdf_path, engine_name)
+                    if not check['valid'] or check.get('document_type') == 'medical_report':
+                        reason = check['status'] if not check['valid'] else check['document_type']
+                        logger.warning(f"PDF recusado no pre-flight ({reason}): {pdf_path}")
+                        result = {
+                            'success': False,
+                            'error': f'Documento recusado no pre-flight: {reason}',
+                            'preflight': check,
+                        }
+                        if metrics:
+                            result['metrics'] = metrics.finish()
+                        return result
+            # Sem artefato, as páginas são gravadas nele à medida que são lidas
+            if use_artifact and artifact is None:
+                writer = self.open_text_artifact(pdf_path, digest, engine_name)
+            if metrics:
+                metrics.info['text_source'] = 'text' if text_input else 'artifact' if artifact else 'pdf'
+            
+            # Pipeline em fluxo: páginas -> linhas -> seções -> vínculos
+            personal_data = {}
+            exclude_dates = set()
+            text_stats = {'length': 0, 'has_text': False, 'failed': False, 'emissao': None,
+                          'pages': 0, 'partial_reason': None}
+            
+            def scanned_pages() -> Iterator[str]:
+                nonlocal writer
+                # Dados pessoais e datas a excluir vêm do cabeçalho repetido em cada página
+                try:
+                    # Uma página além do orçamento indica que o documento foi truncado
+                    max_pages = self.page_budget + 1 if self.page_budget else None
+                    if text_input:
+                        pages = iter_text_file_pages(pdf_path, max_pages)
+                    elif artifact:
+                        pages = artifact.iter_pages(max_pages)
+                    else:
+                        pages = self.iter_text_pages(pdf_path, max_pages)
+                    if metrics:
+                        pages = metrics.timed(pages, 'pdf_engine', 'pages')
+                    for page in pages:
+                        exceeded = self.budget_exceeded(text_stats['pages'], started)
+                        if exceeded:
+                            text_stats['partial_reason'] = exceeded
+                            logger.warning(f"Orçamento de {'páginas' if exceeded == 'pages' else 'tempo'} "
+                                           f"esgotado após {text_stats['pages']} páginas; resultado parcial")
+                            break
+                        text_stats['pages'] += 1
+                        if writer is not None:
+                            try:
+                                with metrics.stage('text_artifact') if metrics else nullcontext():
+                                    writer.add_page(page)
+                            except OSError as e:
+                                logger.warning(f"Não foi possível gravar o artefato de texto {writer.path}: {e}")
+                                writer.discard()
+                                writer = None
+                        text_stats['length'] += len(page) + 1 if page else 0
+                        if not page.strip():
+                            continue
+                        text_stats['has_text'] = True
+                        with metrics.stage('personal_data') if metrics else nullcontext():
+                            if len(personal_data) < 3:
+                                for key, value in self.extract_personal_data(page).items():
+                                    personal_data.setdefault(key, value)
+                            self.find_excluded_dates(page, exclude_dates)
+                            if text_stats['emissao'] is None:
+                                emissao = _RE_DATA_RELATORIO.search(page)
+                                text_stats['emissao'] = emissao.group(1) if emissao else None
+                        yield page
+                except Exception as e:
+                    logger.error(f"Erro ao extrair texto do PDF: {e}")
+                    text_stats['failed'] = True
+            
+            lines = self.iter_lines(scanned_pages())
+            if metrics:
+                metrics.info['engine'] = engine_name
+                metrics.info['cache_hit'] = False
+                lines = metrics.timed(lines, 'lines', 'lines')
+            employment_data = list(self.iter_employments(lines, exclude_dates, metrics))
             
-            if not text.strip():
-                return {
+            if text_stats['failed'] or not text_stats['has_text']:
+                result = {
                     'success': False,
                     'error': 'Não foi possível extrair texto do PDF'
                 }
+                if metrics:
+                    result['metrics'] = metrics.finish()
+                return result
             
-            # Extrai dados
-            personal_data = self.extract_personal_data(text)
-            employment_data = self.extract_employment_data(text)
+            with metrics.stage('tempo_contribuicao') if metrics else nullcontext():
+                # Vínculos em aberto contam até a emissão do extrato (resultado estável no cache)
+                tempo_contribuicao = calcular_tempo_contribuicao(
+                    employment_data, parse_data(text_stats['emissao'])
+                )
             
             # Mapeia os dados para o formato esperado
             result_data = {
                 'client_name': personal_data.get('nome', ''),
                 'client_cpf': personal_data.get('cpf', ''),
-                'vinculos_empregaticios': employment_data
+                'vinculos_empregaticios': employment_data,
+                'tempo_contribuicao': tempo_contribuicao
             }
             
             result = {
                 'success': True,
                 'data': result_data,
-                'text_length': len(text)
+                'text_length': text_stats['length']
             }
+            if text_stats['partial_reason']:
+                result['partial'] = True
+                result['partial_reason'] = text_stats['partial_reason']
+                result['pages_processed'] = text_stats['pages']
             
             logger.info(f"Extraídos {len(employment_data)} vínculos empregatícios")
             logger.info(f"Nome do cliente: {result_data['client_name']}")
+            
+            # Resultados parciais não vão para o cache: dependem do orçamento e da carga da máquina
+            if self.cache and not text_stats['partial_reason']:
+                self.cache.put(digest, engine_name, result)
+            if writer is not None and not text_stats['partial_reason']:
+                with metrics.stage('text_artifact') if metrics else nullcontext():
+                    try:
+                        writer.commit()
+                        logger.info(f"Artefato de texto gravado em {writer.path}")
+                    except OSError as e:
+                        logger.warning(f"Não foi possível gravar o artefato de texto {writer.path}: {e}")
+            if metrics:
+                # Métricas pertencem a esta execução: ficam fora do cache
+                metrics.count('vinculos', len(employment_data))
+                result['metrics'] = metrics.finish()
+                logger.info(f"Métricas da extração: {json.dumps(result['metrics'], ensure_ascii=False)}")
             return result
             
         except Exception as e:
             logger.error(f"Erro no processamento: {e}")
-            return {
+            result = {
                 'success': False,
                 'error': str(e)
             }
+            if metrics:
+                result['metrics'] = metrics.finish()
+            return result
+        finally:
+            # Artefato incompleto (falha ou resultado parcial) não substitui o anterior
+            if writer is not None:
+                writer.discard()
+
+# Extrator mantido aquecido em cada processo de trabalho (modo servidor)
+_worker_extractor: Optional[CNISExtractorSimple] = None
+
+def _preload_pdf_libraries() -> None:
+    """Importa antecipadamente a biblioteca do motor de PDF selecionado"""
+    try:
+        select_engine().load()
+    except ImportError as e:
+        logger.warning(str(e))
+
+def build_cache(cache_path: Optional[str]) -> Optional[CNISResultCache]:
+    """Cria o cache de resultados quando um caminho é informado"""
+    if not cache_path:
+        return None
+    return CNISResultCache(cache_path, EXTRACTOR_VERSION)
+
+def _redirect_stdout_to_stderr() -> None:
+    """Aponta o fd 1 para o stderr: prints e avisos de bibliotecas não chegam ao canal de respostas"""
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+def _init_worker(cache_path: Optional[str] = None) -> None:
+    """Inicializa o processo de trabalho com extrator e bibliotecas carregadas"""
+    global _worker_extractor
+    _redirect_stdout_to_stderr()
+    _preload_pdf_libraries()
+    # Os documentos já são distribuídos entre processos; sem paralelismo aninhado
+    _worker_extractor = CNISExtractorSimple(parallel_workers=1, cache=build_cache(cache_path))
+
+def _process_in_worker(pdf_path: str, preflight: Optional[bool] = None) -> Dict[str, Any]:
+    """Processa um CNIS usando o extrator do processo de trabalho"""
+    if _worker_extractor is None:
+        _init_worker()
+    return _worker_extractor.process_cnis(pdf_path, preflight)
+
+def _process_checked_in_worker(pdf_path: str) -> Dict[str, Any]:
+    """Processa um CNIS com o pre-flight antes da extração"""
+    return _process_in_worker(pdf_path, preflight=True)
+
+# Ações aceitas pelo modo servidor ('action' da requisição; padrão: extract)
+SERVER_ACTIONS: Dict[str, Callable[[str], Dict[str, Any]]] = {
+    'extract': _process_in_worker,
+    'extract_preflight': _process_checked_in_worker,
+    'preflight': preflight_pdf,
+}
+
+def _encode_frame(payload: Dict[str, Any]) -> bytes:
+    """Serializa uma resposta como uma linha JSON (um quadro por linha)"""
+    return (json.dumps(payload, ensure_ascii=False) + '\n').encode('utf-8')
+
+def _parse_request(raw: bytes) -> Dict[str, Any]:
+    """Decodifica uma requisição JSON do modo servidor"""
+    request = json.loads(raw.decode('utf-8'))
+    if not isinstance(request, dict) or not request.get('pdf_path'):
+        raise ValueError("Requisição deve ser um objeto JSON com 'pdf_path'")
+    if request.get('action', 'extract') not in SERVER_ACTIONS:
+        raise ValueError(f"Ação desconhecida: {request['action']}")
+    return request
+
+class CNISExtractionServer:
+    """Servidor de extração que mantém processos de trabalho aquecidos entre requisições"""
+
+    def __init__(self, max_jobs: Optional[int] = None, cache_path: Optional[str] = None):
+        """Inicializa o pool de processos e o limite de jobs simultâneos"""
+        self.max_jobs = max_jobs or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.max_jobs, initializer=_init_worker,
+                                            initargs=(cache_path,))
+        # Limita jobs em andamento para não acumular requisições em memória
+        self.slots = threading.BoundedSemaphore(self.max_jobs)
+        logger.info(f"Servidor CNIS iniciado com {self.max_jobs} processos de trabalho")
+
+    def submit(self, request: Dict[str, Any]):
+        """Submete uma requisição ao pool respeitando o limite de jobs"""
+        self.slots.acquire()
+        try:
+            action = SERVER_ACTIONS[request.get('action', 'extract')]
+            future = self.executor.submit(action, request['pdf_path'])
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def build_response(self, request_id: Any, future) -> Dict[str, Any]:
+        """Monta a resposta de uma requisição concluída"""
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"Erro no processo de trabalho: {e}")
+            result = {'success': False, 'error': str(e)}
+        return {'id': request_id, 'result': result}
+
+    def serve_stdio(self, output: BinaryIO) -> None:
+        """Lê requisições JSON por linha no stdin e responde em output (cópia privada do stdout)"""
+        output_lock = threading.Lock()
+        pending = []
+
+        def write(payload: Dict[str, Any]) -> None:
+            with output_lock:
+                output.write(_encode_frame(payload))
+                output.flush()
+
+        for raw in sys.stdin.buffer:
+            if not raw.strip():
+                continue
+            try:
+                request = _parse_request(raw)
+            except ValueError as e:
+                write({'id': None, 'result': {'success': False, 'error': f'Requisição inválida: {e}'}})
+                continue
+
+            request_id = request.get('id')
+            future = self.submit(request)
+            future.add_done_callback(lambda f, rid=request_id: write(self.build_response(rid, f)))
+            pending.append(future)
+            pending = [f for f in pending if not f.done()]
+
+        for future in pending:
+            future.exception()
+
+    def serve_unix_socket(self, socket_path: str) -> None:
+        """Atende requisições JSON por linha em um socket Unix"""
+        server_ref = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw in self.rfile:
+                    if not raw.strip():
+                        continue
+                    try:
+                        request = _parse_request(raw)
+                    except ValueError as e:
+                        response = {'id': None, 'result': {'success': False, 'error': f'Requisição inválida: {e}'}}
+                    else:
+                        future = server_ref.submit(request)
+                        response = server_ref.build_response(request.get('id'), future)
+                    self.wfile.write(_encode_frame(response))
+                    self.wfile.flush()
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+            server.daemon_threads = True
+            os.chmod(socket_path, 0o660)
+            logger.info(f"Servidor CNIS escutando em {socket_path}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                logger.info("Servidor CNIS encerrado")
+            finally:
+                os.unlink(socket_path)
+
+    def shutdown(self) -> None:
+        """Encerra o pool de processos"""
+        self.executor.shutdown(wait=True)
+
+def run_server(socket_path: Optional[str], max_jobs: Optional[int], cache_path: Optional[str] = None) -> None:
+    """Executa o modo servidor (stdin/stdout ou socket Unix)"""
+    # As respostas vão por uma cópia privada do stdout; o fd 1 passa a ser o stderr
+    # antes de criar os processos de trabalho, que o herdam
+    responses = None if socket_path else os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    _redirect_stdout_to_stderr()
+    server = CNISExtractionServer(max_jobs, cache_path)
+    try:
+        if socket_path:
+            server.serve_unix_socket(socket_path)
+        else:
+            server.serve_stdio(responses)
+    finally:
+        server.shutdown()
+        if responses:
+            responses.close()
+
+def iter_batch_inputs(paths: List[str], manifest: Optional[str] = None) -> Iterator[str]:
+    """Enumera os PDFs do lote a partir de arquivos, diretórios e manifesto"""
+    sources = list(paths)
+    if manifest:
+        with open(manifest, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    sources.append(line)
+
+    seen = set()
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            candidates = sorted(p for p in path.rglob('*') if p.suffix.lower() == '.pdf' and p.is_file())
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            key = str(candidate)
+            if key not in seen:
+                seen.add(key)
+                yield key
+
+def load_checkpoint(checkpoint: Optional[str]) -> Set[str]:
+    """Carrega os caminhos concluídos com sucesso de um checkpoint anterior"""
+    done = set()
+    if checkpoint and Path(checkpoint).exists():
+        with open(checkpoint, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    # Documentos com falha são reprocessados na retomada
+                    if entry.get('success'):
+                        done.add(entry['pdf_path'])
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    # Linha truncada por interrupção: o documento será reprocessado
+                    continue
+    return done
+
+def run_batch(paths: List[str], manifest: Optional[str] = None, workers: Optional[int] = None,
+              checkpoint: Optional[str] = None, output: Optional[str] = None,
+              cache_path: Optional[str] = None) -> Dict[str, int]:
+    """Processa vários CNIS em paralelo, emitindo um resultado NDJSON por documento"""
+    workers = workers or os.cpu_count() or 1
+    done = load_checkpoint(checkpoint)
+    if done:
+        logger.info(f"Retomando lote: {len(done)} documentos já processados")
+
+    stats = {'processed': 0, 'failed': 0, 'skipped': 0}
+    out = open(output, 'a', encoding='utf-8') if output else sys.stdout
+    ckpt = open(checkpoint, 'a', encoding='utf-8') if checkpoint else None
+
+    def record(pdf_path: str, result: Dict[str, Any]) -> None:
+        out.write(json.dumps({'pdf_path': pdf_path, 'result': result}, ensure_ascii=False) + '\n')
+        out.flush()
+        if ckpt:
+            # O checkpoint só é gravado depois que o resultado foi emitido
+            ckpt.write(json.dumps({'pdf_path': pdf_path, 'success': result.get('success', False)}) + '\n')
+            ckpt.flush()
+        stats['processed' if result.get('success') else 'failed'] += 1
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(cache_path,)) as executor:
+            pending = {}
+            # Mantém no máximo 2 jobs por processo na fila para não enumerar o lote inteiro em memória
+            max_pending = workers * 2
+
+            def drain(return_when) -> None:
+                finished, _ = wait(pending, return_when=return_when)
+                for future in finished:
+                    pdf_path = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Erro ao processar {pdf_path}: {e}")
+                        result = {'success': False, 'error': str(e)}
+                    record(pdf_path, result)
+
+            for pdf_path in iter_batch_inputs(paths, manifest):
+                if pdf_path in done:
+                    stats['skipped'] += 1
+                    continue
+                pending[executor.submit(_process_in_worker, pdf_path)] = pdf_path
+                if len(pending) >= max_pending:
+                    drain(FIRST_COMPLETED)
+
+            if pending:
+                drain(ALL_COMPLETED)
+    finally:
+        if ckpt:
+            ckpt.close()
+        if output:
+            out.close()
+
+    logger.info(f"Lote concluído: {stats['processed']} processados, "
+                f"{stats['failed']} com falha, {stats['skipped']} já processados")
+    return stats
 
 def main():
     """Função principal para execução via linha de comando"""
     parser = argparse.ArgumentParser(description='Extrator de dados do CNIS - Versão Simplificada')
-    parser.add_argument('pdf_path', help='Caminho para o arquivo PDF do CNIS')
+    parser.add_argument('pdf_path', nargs='?',
+                        help='Caminho para o PDF do CNIS (ou texto já extraído: .txt ou .cnistext.gz)')
     parser.add_argument('--output', help='Arquivo de saída JSON (opcional)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Modo servidor: lê requisições JSON por linha e responde uma linha JSON por requisição')
+    parser.add_argument('--socket', help='Socket Unix para o modo servidor (padrão: stdin/stdout)')
+    parser.add_argument('--max-jobs', type=int, help='Máximo de extrações simultâneas no modo servidor')
+    parser.add_argument('--batch', nargs='*', metavar='PATH',
+                        help='Modo lote: arquivos PDF e/ou diretórios a processar (saída NDJSON)')
+    parser.add_argument('--manifest', help='Arquivo com um caminho de PDF por linha (modo lote)')
+    parser.add_argument('--checkpoint', help='Arquivo de checkpoint para retomar um lote interrompido')
+    parser.add_argument('--workers', type=int, help='Número de processos no modo lote (padrão: CPUs)')
+    parser.add_argument('--cache', default=os.getenv('CNIS_CACHE_PATH'),
+                        help='Banco SQLite do cache de resultados (padrão: $CNIS_CACHE_PATH)')
+    parser.add_argument('--cache-stats', action='store_true',
+                        help='Exibe os contadores do cache de resultados e encerra')
+    parser.add_argument('--engine', choices=sorted(ENGINES),
+                        help='Motor de extração de texto do PDF (padrão: $CNIS_PDF_ENGINE ou perfil do benchmark)')
+    parser.add_argument('--metrics', action='store_true',
+                        help='Inclui no resultado o bloco de métricas (tempo por etapa, contagens, memória)')
+    parser.add_argument('--profile', default=os.getenv('CNIS_PROFILE'), metavar='ARQUIVO',
+                        help='Grava o perfil cProfile de um documento neste arquivo (padrão: $CNIS_PROFILE)')
+    parser.add_argument('--time-budget', type=float, metavar='SEGUNDOS',
+                        help='Tempo máximo por documento antes do resultado parcial (padrão: $CNIS_TIME_BUDGET)')
+    parser.add_argument('--page-budget', type=int, metavar='PAGINAS',
+                        help='Páginas lidas por documento antes do resultado parcial (padrão: $CNIS_PAGE_BUDGET)')
+    parser.add_argument('--text-artifact', action='store_true',
+                        help='Lê/grava o texto extraído em PDF.cnistext.gz ao lado do PDF (padrão: $CNIS_TEXT_ARTIFACT)')
+    parser.add_argument('--preflight', action='store_true',
+                        help='Apenas verifica o PDF (estrutura, criptografia, texto) e classifica a primeira página')
+    parser.add_argument('--with-preflight', action='store_true',
+                        help='Verifica o PDF antes da extração e recusa os inválidos, sem texto ou que são '
+                             'laudos médicos (padrão: $CNIS_PREFLIGHT)')
+    parser.add_argument('--benchmark-engines', metavar='PDF',
+                        help='Mede os motores de PDF disponíveis nesta amostra e grava o mais rápido que confere')
     
     args = parser.parse_args()
     
+    if args.engine:
+        # Propaga a escolha para os processos de trabalho (lote/servidor)
+        os.environ['CNIS_PDF_ENGINE'] = args.engine
+    
+    if args.metrics:
+        os.environ['CNIS_METRICS'] = '1'
+    
+    # Orçamentos também valem para os processos de trabalho (lote/servidor)
+    if args.time_budget is not None:
+        os.environ['CNIS_TIME_BUDGET'] = str(args.time_budget)
+    if args.page_budget is not None:
+        os.environ['CNIS_PAGE_BUDGET'] = str(args.page_budget)
+    
+    if args.text_artifact:
+        os.environ['CNIS_TEXT_ARTIFACT'] = '1'
+    
+    if args.with_preflight:
+        os.environ['CNIS_PREFLIGHT'] = '1'
+    
+    if args.benchmark_engines:
+        extractor = CNISExtractorSimple()
+        report = benchmark_engines(
+            args.benchmark_engines,
+            lambda text: [extractor.extract_personal_data(text), extractor.extract_employment_data(text)]
+        )
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    
+    if args.cache_stats:
+        if not args.cache:
+            parser.error('--cache-stats requer --cache ou CNIS_CACHE_PATH')
+        print(json.dumps(build_cache(args.cache).stats(), ensure_ascii=False, indent=2))
+        return
+    
+    if args.serve:
+        run_server(args.socket, args.max_jobs, args.cache)
+        return
+    
+    if args.batch is not None or args.manifest:
+        stats = run_batch(args.batch or [], args.manifest, args.workers, args.checkpoint, args.output, args.cache)
+        sys.exit(1 if stats['failed'] else 0)
+    
+    if not args.pdf_path:
+        parser.error('pdf_path é obrigatório fora do modo servidor')
+    
     # Verifica se o arquivo existe
     if not Path(args.pdf_path).exists():
-        print(f"Erro: Arquivo não encontrado - {args.pdf_path}")
+        print(f"Erro: Arquivo não encontrado - {args.pdf_path}", file=sys.stderr)
         sys.exit(1)
     
-    # Processa o CNIS
-    extractor = CNISExtractorSimple()
-    result = extractor.process_cnis(args.pdf_path)
+    # Processa o CNIS; qualquer saída das bibliotecas vai para o stderr,
+    # deixando no stdout apenas o JSON do resultado
+    with redirect_stdout(sys.stderr):
+        if args.preflight:
+            result = preflight_pdf(args.pdf_path)
+        else:
+            extractor = CNISExtractorSimple(cache=build_cache(args.cache))
+            if args.profile:
+                result = profile_call(extractor.process_cnis, args.pdf_path, output=args.profile)
+            else:
+                result = extractor.process_cnis(args.pdf_path)
     
     # Saída
     if args.output:
         with open(args.output, 'w', encoding='utf-8') as f:
             json.dump(result, f, ensure_ascii=False, indent=2)
-        print(f"Resultado salvo em: {args.output}")
+        print(f"Resultado salvo em: {args.output}", file=sys.stderr)
     else:
         print(json.dumps(result, ensure_ascii=False, indent=2))
 